@@ -0,0 +1,3 @@
+"""
+Micro-benchmarks on hot paths
+"""
@@ -0,0 +1,29 @@
+"""
+Micro-benchmark on the offline conversion between BV ID and AV ID
+
+run with 'python -m benchmarks.bench_bvid' in the root of repository
+"""
+import random
+import timeit
+
+from bili_jeans.core.utils.bvid import aid_to_bvid, bvid_to_aid, MAX_AID
+
+
+NUMBER = 1_000_000
+
+
+def main() -> None:
+    rand = random.Random(0)
+    aids = [rand.randrange(1, MAX_AID) for _ in range(NUMBER)]
+    bvids = [aid_to_bvid(aid) for aid in aids]
+
+    for name, func, values in (
+        ('aid_to_bvid', aid_to_bvid, aids),
+        ('bvid_to_aid', bvid_to_aid, bvids)
+    ):
+        elapsed = timeit.timeit(lambda: [func(value) for value in values], number=1)
+        print(f'{name:<16}{NUMBER} conversions in {elapsed:.3f} s, {NUMBER / elapsed / 1e6:.2f} M/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+End-to-end benchmark suite, downloading from the local mock server of 'tests.mock_server'
+
+each round of scenario runs in a fresh process, so its peak RSS is its own,
+the mock server runs there in another thread with its own event loop, and its RSS is included
+mux time is measured only when ffmpeg is installed, otherwise muxing is skipped
+
+run in the root of repository, and compare the results between commits:
+    python -m benchmarks.bench_e2e run --output base.json
+    python -m benchmarks.bench_e2e run --output head.json
+    python -m benchmarks.bench_e2e compare base.json head.json
+'compare' exits with 1 when any metric regresses beyond the threshold
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+from unittest.mock import patch
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+from bili_jeans.cli.download import run
+from bili_jeans.core.loop import LOOP_AUTO, LOOP_NAMES, LoopName, run_coroutine
+from bili_jeans.core.muxer import mux_streams
+from bili_jeans.core.utils import aid_to_bvid
+from tests.mock_server import MockBilibiliServer
+
+
+class Scenario(NamedTuple):
+    aid: int
+    pages: int = 1
+    qn: Optional[int] = None            # quality number of the additional video stream, to download
+    subtitles: int = 0                  # subtitles of each page
+    subtitle_lines: int = 100
+    concurrency: int = 1
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    'single_8k': Scenario(aid=170001, qn=127),
+    'playlist_200p': Scenario(aid=170002, pages=200, concurrency=8),
+    'subtitle_heavy': Scenario(aid=170003, subtitles=20, subtitle_lines=2000)
+}
+
+API_ROUTES = ('web_view', 'ugc_view', 'ugc_play', 'ugc_player')
+
+HIGHER_IS_BETTER = 'higher'
+LOWER_IS_BETTER = 'lower'
+METRICS = {
+    'pages_per_second': HIGHER_IS_BETTER,
+    'bytes_per_second': HIGHER_IS_BETTER,
+    'peak_rss_mib': LOWER_IS_BETTER,
+    'api_calls_per_page': LOWER_IS_BETTER,
+    'mux_seconds': LOWER_IS_BETTER
+}
+
+
+def measure_scenario(name: str, scale: float, loop: LoopName) -> Dict[str, Any]:
+    """
+    download the scenario once in this process
+    """
+    scenario = SCENARIOS[name]
+    bvid = aid_to_bvid(scenario.aid)
+    server = MockBilibiliServer(media_scale=scale, subtitle_lines=scenario.subtitle_lines)
+    server.add_video(bvid, pages=scenario.pages, qn=scenario.qn, subtitles=scenario.subtitles)
+    server_loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=server_loop.run_forever, daemon=True)
+    server_thread.start()
+    asyncio.run_coroutine_threadsafe(server.start(), server_loop).result()
+
+    enable_mux = shutil.which('ffmpeg') is not None
+    mux_elapsed: List[float] = []
+
+    async def _timed_mux(*args: Any, **kwargs: Any) -> None:
+        start = time.perf_counter()
+        try:
+            await mux_streams(*args, **kwargs)
+        finally:
+            mux_elapsed.append(time.perf_counter() - start)
+
+    try:
+        with tempfile.TemporaryDirectory() as directory, server.patch_urls(), \
+                patch('bili_jeans.cli.download.mux_streams', _timed_mux):
+            start = time.perf_counter()
+            run_coroutine(
+                run(
+                    url=server.view_url(bvid),
+                    directory=directory,
+                    qn=scenario.qn,
+                    enable_subtitle=scenario.subtitles > 0,
+                    skip_mux=not enable_mux,
+                    concurrency=scenario.concurrency
+                ),
+                loop=loop
+            )
+            elapsed = time.perf_counter() - start
+            size = sum(file_p.stat().st_size for file_p in Path(directory).rglob('*') if file_p.is_file())
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), server_loop).result()
+        server_loop.call_soon_threadsafe(server_loop.stop)
+        server_thread.join()
+        server_loop.close()
+
+    return {
+        'elapsed': elapsed,
+        'bytes': size,
+        'pages_per_second': scenario.pages / elapsed,
+        'bytes_per_second': size / elapsed,
+        # kibibytes on Linux
+        'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None,
+        'api_calls_per_page': sum(server.requests[route] for route in API_ROUTES) / scenario.pages,
+        'mux_seconds': sum(mux_elapsed) if enable_mux else None
+    }
+
+
+def run_suite(names: List[str], scale: float, rounds: int, loop: LoopName) -> Dict[str, Any]:
+    """
+    median of each metric over the rounds, each round in a fresh process
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for name in names:
+        samples = []
+        for _ in range(rounds):
+            completed = subprocess.run(
+                [
+                    sys.executable, '-m', 'benchmarks.bench_e2e', 'scenario', name,
+                    '--scale', str(scale), '--loop', loop
+                ],
+                stdout=subprocess.PIPE,
+                check=True
+            )
+            samples.append(json.loads(completed.stdout.splitlines()[-1]))
+        results[name] = {
+            key: statistics.median(values) if None not in values else None
+            for key in samples[0]
+            for values in [[sample[key] for sample in samples]]
+        }
+        print(
+            f'{name:<16}{results[name]["pages_per_second"]:>9.2f} pages/s'
+            f'{results[name]["bytes_per_second"] / 1024 ** 2:>9.1f} MiB/s'
+            f'{_format(results[name]["peak_rss_mib"]):>9} MiB peak RSS'
+            f'{results[name]["api_calls_per_page"]:>7.1f} API calls/page'
+            f'{_format(results[name]["mux_seconds"]):>9} s mux',
+            file=sys.stderr
+        )
+    return {
+        'commit': _get_commit(),
+        'created_at': time.time(),
+        'python': platform.python_version(),
+        'loop': loop,
+        'scale': scale,
+        'rounds': rounds,
+        'scenarios': results
+    }
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    print the relative change of each metric, return the regressions
+    """
+    regressions = []
+    for name, head_metrics in head['scenarios'].items():
+        base_metrics = base['scenarios'].get(name)
+        if base_metrics is None:
+            continue
+        for metric, direction in METRICS.items():
+            base_value, head_value = base_metrics.get(metric), head_metrics.get(metric)
+            if base_value is None or head_value is None or base_value == 0:
+                continue
+            change = (head_value - base_value) / base_value
+            regressed = change < -threshold if direction == HIGHER_IS_BETTER else change > threshold
+            print(
+                f'{name:<16}{metric:<20}{base_value:>14.3f}{head_value:>14.3f}{change:>+9.1%}'
+                f'{"  REGRESSION" if regressed else ""}'
+            )
+            if regressed:
+                regressions.append(f'{name}.{metric}')
+    return regressions
+
+
+def _format(value: Optional[float]) -> str:
+    return '-' if value is None else f'{value:.1f}'
+
+
+def _get_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE, check=True, text=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], stdout=subprocess.PIPE, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if dirty else commit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the scenarios, and store the results as JSON')
+    run_parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    run_parser.add_argument('--output', type=str, default=None, help='JSON file, default to stdout')
+    run_parser.add_argument('--rounds', type=int, default=3)
+
+    scenario_parser = subparsers.add_parser('scenario', help='run one round of the scenario in this process')
+    scenario_parser.add_argument('name', choices=list(SCENARIOS))
+
+    for sub_parser in (run_parser, scenario_parser):
+        sub_parser.add_argument(
+            '--scale', type=float, default=0.01, help='scale of media size, 1 for the real size of streams'
+        )
+        sub_parser.add_argument('--loop', choices=LOOP_NAMES, default=LOOP_AUTO)
+
+    compare_parser = subparsers.add_parser('compare', help='flag the regressions of head from base')
+    compare_parser.add_argument('base', type=str)
+    compare_parser.add_argument('head', type=str)
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='tolerated relative change')
+    args = parser.parse_args()
+
+    if args.command == 'scenario':
+        print(json.dumps(measure_scenario(args.name, args.scale, args.loop)))
+    elif args.command == 'run':
+        content = json.dumps(run_suite(args.scenarios, args.scale, args.rounds, args.loop), indent=2)
+        if args.output is None:
+            print(content)
+        else:
+            Path(args.output).write_text(content)
+    else:
+        base, head = (json.loads(Path(file).read_text()) for file in (args.base, args.head))
+        print(f'{base["commit"]} -> {head["commit"]}, threshold {args.threshold:.0%}')
+        regressions = compare(base, head, args.threshold)
+        if regressions:
+            print(f'Regressions: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
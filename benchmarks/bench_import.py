@@ -0,0 +1,65 @@
+"""
+Benchmark on the import time of CLI, by 'python -X importtime'
+
+run with 'python -m benchmarks.bench_import' in the root of repository,
+exit with 1 when the median exceeds '--max-ms'
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+
+STATEMENTS = (
+    'import bili_jeans.cli',
+    'import bili_jeans.cli.download',
+    'import bili_jeans.cli.daemon'
+)
+
+
+def measure(statement: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """
+    return cumulative milliseconds of the top-level 'bili_jeans' imports, and the slowest modules
+    the nested imports are indented by two spaces per level
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    total = 0.0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(cumulative) / 1000, name.strip()))
+        if name.startswith(' bili_jeans'):
+            total += int(cumulative) / 1000
+    return total, sorted(modules, reverse=True)[:5]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None, help='threshold on median of the first statement')
+    args = parser.parse_args()
+
+    medians = []
+    for statement in STATEMENTS:
+        results = [measure(statement) for _ in range(args.rounds)]
+        median = statistics.median(total for total, _ in results)
+        medians.append(median)
+        print(f'{statement:<52}{median:>10.1f} ms')
+        for cumulative, name in results[-1][1]:
+            print(f'    {name:<48}{cumulative:>10.1f} ms')
+
+    if args.max_ms is not None and medians[0] > args.max_ms:
+        print(f'Import time regression: {medians[0]:.1f} ms > {args.max_ms:.1f} ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
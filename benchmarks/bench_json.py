@@ -0,0 +1,57 @@
+"""
+Micro-benchmark on decoding API responses
+
+run with 'python -m benchmarks.bench_json' in the root of repository
+"""
+import json
+from pathlib import Path
+import timeit
+from typing import Callable, Dict, List, Type
+
+from pydantic import BaseModel
+
+from bili_jeans.core.schemes import GetUGCPlayResponse, GetUGCPlayerResponse, GetUGCViewResponse
+from bili_jeans.core.utils.json_codec import orjson, validate_json
+
+
+DATA_DIR_P = Path(__file__).parent.parent.joinpath('tests', 'data')
+FIXTURES: Dict[str, Type[BaseModel]] = {
+    'ugc_play': GetUGCPlayResponse,
+    'ugc_player': GetUGCPlayerResponse,
+    'ugc_view': GetUGCViewResponse
+}
+NUMBER = 200
+
+
+def _decode_then_validate(model_class: Type[BaseModel], content: bytes) -> BaseModel:
+    return model_class.model_validate(json.loads(content.decode('utf-8')))
+
+
+def _validate_json_bytes(model_class: Type[BaseModel], content: bytes) -> BaseModel:
+    return model_class.model_validate_json(content)
+
+
+def main() -> None:
+    approaches: Dict[str, Callable[[Type[BaseModel], bytes], BaseModel]] = {
+        'json.loads + model_validate': _decode_then_validate,
+        'model_validate_json': _validate_json_bytes,
+        'validate_json': validate_json
+    }
+    print(f'orjson: {"installed" if orjson is not None else "not installed"}')
+    for dirname, model_class in FIXTURES.items():
+        contents: List[bytes] = [
+            file_p.read_bytes() for file_p in sorted(DATA_DIR_P.joinpath(dirname).glob('*.json'))
+        ]
+        print(f'{dirname}: {len(contents)} fixtures, {sum(map(len, contents))} bytes, {NUMBER} rounds')
+        baseline = None
+        for name, approach in approaches.items():
+            elapsed = timeit.timeit(
+                lambda: [approach(model_class, content) for content in contents],
+                number=NUMBER
+            )
+            baseline = baseline or elapsed
+            print(f'    {name:<32}{elapsed * 1000 / NUMBER:>10.3f} ms/round{baseline / elapsed:>8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
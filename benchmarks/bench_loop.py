@@ -0,0 +1,119 @@
+"""
+Benchmark on event loops, downloading from the local mock CDN of 'tests.mock_server'
+
+the CDN runs in another process, so only the client side is measured on each loop,
+run with 'python -m benchmarks.bench_loop' in the root of repository
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+import aiohttp
+
+from bili_jeans.core.constants import CHUNK_SIZE
+from bili_jeans.core.http import shared_client_session
+from bili_jeans.core.loop import get_loop_factory, LOOP_ASYNCIO, LOOP_UVLOOP, LoopName, run_coroutine
+
+
+HOST = '127.0.0.1'
+
+
+async def _wait_serving(port: int) -> None:
+    async with aiohttp.ClientSession() as session:
+        for _ in range(100):
+            try:
+                async with session.get(f'http://{HOST}:{port}/cover/ping.jpg') as resp:
+                    await resp.read()
+                    return
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError('Mock CDN is not serving')
+
+
+async def _download(port: int, requests: int, concurrency: int, size: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _get(session: aiohttp.ClientSession, idx: int) -> int:
+        async with semaphore:
+            received = 0
+            async with session.get(f'http://{HOST}:{port}/media/BV1/1/{idx}-7-{size}.m4s') as resp:
+                async for chunk_data in resp.content.iter_chunked(CHUNK_SIZE):
+                    received += len(chunk_data)
+            return received
+
+    async with shared_client_session(limit=concurrency) as session:
+        sizes = await asyncio.gather(*[_get(session, idx) for idx in range(requests)])
+    return sum(sizes)
+
+
+async def _switch(tasks: int, rounds: int) -> None:
+    """
+    per-callback overhead, by tasks yielding to each other
+    """
+    async def _yield() -> None:
+        for _ in range(rounds):
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*[_yield() for _ in range(tasks)])
+
+
+def measure(
+    loop: LoopName,
+    port: int,
+    requests: int,
+    concurrency: int,
+    size: int
+) -> Tuple[float, float, float]:
+    """
+    return seconds of downloading, its MiB per second, and seconds of task switches
+    """
+    start = time.perf_counter()
+    received = run_coroutine(_download(port, requests, concurrency, size), loop=loop)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    run_coroutine(_switch(1000, 100), loop=loop)
+    switch_elapsed = time.perf_counter() - start
+    return elapsed, received / elapsed / 1024 ** 2, switch_elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=18737)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--size', type=int, default=1024 ** 2, help='bytes of each response')
+    args = parser.parse_args()
+
+    loops: List[LoopName] = [LOOP_ASYNCIO]
+    try:
+        get_loop_factory(LOOP_UVLOOP)
+        loops.append(LOOP_UVLOOP)
+    except ValueError:
+        print('uvloop is not installed, only the default loop is measured')
+
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'tests.mock_server', '--port', str(args.port)],
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(_wait_serving(args.port))
+        print(f'{args.requests} requests of {args.size} bytes, {args.concurrency} concurrently')
+        for loop in loops:
+            elapsed, throughput, switch_elapsed = measure(
+                loop, args.port, args.requests, args.concurrency, args.size
+            )
+            print(
+                f'{loop:<10}download {elapsed:>7.3f} s {throughput:>9.1f} MiB/s'
+                f'    100k task switches {switch_elapsed:>7.3f} s'
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,21 @@
 """
 Command-Line interface
+
+the heavy modules (e.g. aiohttp, pydantic and prompt_toolkit) are imported
+by the command which needs them, so that '--help' and the light commands start fast
 """
-import asyncio
 import os
-from typing import Any, List, Optional
+from typing import Any, Coroutine, Dict, List, Optional, TextIO, Tuple, TYPE_CHECKING
 
 import click
 from click import Context, Parameter
 
-from .download import run as run_download
-from ..core.constants import BitRateId, CodecId, QualityNumber
+from ..core.constants import BitRateId, CodecId, QualityNumber, RESOURCE_KINDS
 from ..core.log import config_logging, LOG_MODE_CLI
 
+if TYPE_CHECKING:
+    from ..core.selection import StreamPolicy
+
 
 class IntListParamType(click.ParamType):
 
@@ -38,10 +42,143 @@ class IntListParamType(click.ParamType):
 INT_LIST = IntListParamType()
 
 
+class StreamPolicyParamType(click.ParamType):
+
+    name = 'stream_policy'
+
+    def convert(
+        self,
+        value: Any,
+        param: Optional[Parameter],
+        ctx: Optional[Context]
+    ) -> Optional['StreamPolicy']:
+        from ..core.selection import StreamPolicy
+
+        if not value or isinstance(value, StreamPolicy):
+            return value
+        try:
+            return StreamPolicy.load(value)
+        except (OSError, ValueError) as e:
+            self.fail(
+                f'"{value}" is not a valid stream policy JSON or file: {e}',
+                param,
+                ctx
+            )
+
+
+STREAM_POLICY = StreamPolicyParamType()
+
+
+class ByteSizeParamType(click.ParamType):
+
+    name = 'byte_size'
+
+    units = {
+        '': 1,
+        'B': 1,
+        'K': 1024,
+        'M': 1024 ** 2,
+        'G': 1024 ** 3,
+        'T': 1024 ** 4
+    }
+
+    def convert(
+        self,
+        value: Any,
+        param: Optional[Parameter],
+        ctx: Optional[Context]
+    ) -> Optional[int]:
+        if value is None or isinstance(value, int):
+            return value
+        text = value.strip().upper().removesuffix('IB').removesuffix('B')
+        unit = text[-1:] if text[-1:].isalpha() else ''
+        try:
+            size = int(float(text[:len(text) - len(unit)]) * self.units[unit])
+        except (KeyError, ValueError):
+            size = -1
+        if size < 0:
+            self.fail(
+                f'"{value}" is not a valid byte size, e.g. 500M, 10G',
+                param,
+                ctx
+            )
+        return size
+
+
+BYTE_SIZE = ByteSizeParamType()
+
+
+class ChunkSizeParamType(click.ParamType):
+
+    name = 'chunk_size'
+
+    def convert(
+        self,
+        value: Any,
+        param: Optional[Parameter],
+        ctx: Optional[Context]
+    ) -> Tuple[str, int]:
+        if isinstance(value, tuple):
+            return value
+        kind, sep, size = value.partition('=')
+        kind = kind.strip().lower()
+        if not sep or kind not in RESOURCE_KINDS:
+            self.fail(
+                f'"{value}" is not a valid chunk size, e.g. video=4M, '
+                f'kind is one of {", ".join(RESOURCE_KINDS)}',
+                param,
+                ctx
+            )
+        chunk_size = BYTE_SIZE.convert(size, param, ctx)
+        if not chunk_size:
+            self.fail(f'Chunk size of {kind} should be positive', param, ctx)
+        return kind, chunk_size
+
+
+CHUNK_SIZE = ChunkSizeParamType()
+
+
+def _get_loop_options() -> Dict[str, Any]:
+    """
+    keyword arguments of 'run_coroutine' given by the global options
+    """
+    ctx = click.get_current_context(silent=True)
+    return dict((ctx.find_root().obj if ctx is not None else None) or {})
+
+
+def _run_coroutine(coroutine: Coroutine) -> Any:
+    from ..core.loop import run_coroutine  # the event loop isn't needed by '--help'
+
+    return run_coroutine(coroutine, **_get_loop_options())
+
+
+def _run_command_coroutine(coroutine: Coroutine) -> Any:
+    """
+    run the coroutine of a command, reporting the invalid input (e.g. URL) as an error of the command
+    """
+    try:
+        return _run_coroutine(coroutine)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+
 @click.group()
-def cli():
+@click.option(
+    '--loop',
+    type=click.Choice(['auto', 'asyncio', 'uvloop']),
+    default='auto',
+    help='Event loop, "auto" picks uvloop when it is installed'
+)
+@click.option(
+    '--executor-workers',
+    type=click.IntRange(min=1),
+    default=None,
+    help='Max threads of the default executor of event loop'
+)
+@click.pass_context
+def cli(ctx: Context, loop: str = 'auto', executor_workers: Optional[int] = None):
     config_logging(mode=LOG_MODE_CLI)
-    pass
+    ctx.obj = {'loop': loop, 'executor_workers': executor_workers}
 
 
 @cli.command(name='download')
@@ -64,6 +201,13 @@ def cli():
     default=None,
     help='Selected pages'
 )
+@click.option(
+    '--collection',
+    is_flag=True,
+    default=False,
+    help='Expand all episodes of the UGC season which video belongs to, '
+         'and select episodes by "--pages"'
+)
 @click.option(
     '-q',
     '--quality-number',
@@ -110,18 +254,62 @@ def cli():
     default=False,
     help='Prefer higher bit rate or not'
 )
+@click.option(
+    '--stream-policy',
+    default=None,
+    type=STREAM_POLICY,
+    help='JSON, or path of JSON file, of policy on choosing video and audio jointly, '
+         'which overrides the options on quality, codec and bit rate'
+)
+@click.option(
+    '--budget',
+    default=None,
+    type=BYTE_SIZE,
+    help='Storage budget of selected pages, e.g. 10G, '
+         'streams are downgraded by estimated size to fit it'
+)
 @click.option(
     '--enable-danmaku',
     is_flag=True,
     default=False,
     help='Download danmaku of video'
 )
+@click.option(
+    '--compress-danmaku',
+    is_flag=True,
+    default=False,
+    help='Validate danmaku and store it as seekable gzip'
+)
+@click.option(
+    '--segmented-danmaku',
+    is_flag=True,
+    default=False,
+    help='Download all danmaku from segmented protobuf API'
+)
 @click.option(
     '--enable-cover',
     is_flag=True,
     default=False,
     help='Download cover of video'
 )
+@click.option(
+    '--dedup-cover',
+    is_flag=True,
+    default=False,
+    help='Store covers once by content and link them to pages'
+)
+@click.option(
+    '--dedup-media',
+    is_flag=True,
+    default=False,
+    help='Store video and audio streams once by content and link them to pages, requires "--skip-mux"'
+)
+@click.option(
+    '--log-digests',
+    is_flag=True,
+    default=False,
+    help='Record digests of the downloaded streams in the log under directory, for scrubbing'
+)
 @click.option(
     '--enable-subtitle',
     is_flag=True,
@@ -140,6 +328,48 @@ def cli():
     default=False,
     help='Preserve original video and audio files'
 )
+@click.option(
+    '--concurrency',
+    type=click.IntRange(min=1),
+    default=1,
+    help='Count of pages downloaded concurrently'
+)
+@click.option(
+    '--processes',
+    type=click.IntRange(min=1),
+    default=1,
+    help='Count of worker processes sharing the pages, '
+         'each of them downloads "--concurrency" pages concurrently'
+)
+@click.option(
+    '--memory-budget',
+    default=None,
+    type=BYTE_SIZE,
+    help='Max bytes of streams buffered in flight by each process, e.g. 64M, '
+         'downloads pause when the disk falls behind, '
+         'the parts uploaded to "--sink" are limited by the sink instead'
+)
+@click.option(
+    '--chunk-size',
+    'chunk_sizes',
+    type=CHUNK_SIZE,
+    multiple=True,
+    help='Max size of each read of a kind of resource, e.g. video=4M, can be repeated, 1M by default'
+)
+@click.option(
+    '--sink',
+    type=str,
+    default=None,
+    help='Storage of the downloaded files, e.g. s3://bucket/prefix, configured by AWS_ENDPOINT_URL, '
+         'AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY, requires "--skip-mux", local directory by default'
+)
+@click.option(
+    '--enqueue',
+    type=str,
+    default=None,
+    help='Put the selected pages to the work queue for workers instead of downloading, '
+         'e.g. redis://host:6379/0, or path of SQLite file'
+)
 @click.option(
     '-i',
     '--interactive',
@@ -157,43 +387,456 @@ def download(
     url: str,
     directory: str,
     pages: Optional[List[int]] = None,
+    collection: bool = False,
     quality_number: Optional[int] = None,
     reverse_qn: bool = False,
     codec_id: Optional[int] = None,
     reverse_codec: bool = False,
     bit_rate_id: Optional[int] = None,
     reverse_bit_rate: bool = False,
+    stream_policy: Optional['StreamPolicy'] = None,
+    budget: Optional[int] = None,
     enable_danmaku: bool = False,
+    compress_danmaku: bool = False,
+    segmented_danmaku: bool = False,
     enable_cover: bool = False,
+    dedup_cover: bool = False,
+    dedup_media: bool = False,
+    log_digests: bool = False,
     enable_subtitle: bool = False,
     skip_mux: bool = False,
     preserve_original: bool = False,
+    concurrency: int = 1,
+    processes: int = 1,
+    memory_budget: Optional[int] = None,
+    chunk_sizes: Tuple[Tuple[str, int], ...] = (),
+    sink: Optional[str] = None,
+    enqueue: Optional[str] = None,
     interactive: bool = False,
     sess_data: Optional[str] = None
 ) -> None:
+    from .download import run as run_download
+
     if interactive:
-        asyncio.run(run_download(
+        _run_command_coroutine(run_download(
             url=url,
             directory=directory,
+            collection=collection,
             sess_data=sess_data,
             interactive=True
         ))
         return None
 
-    asyncio.run(run_download(
+    _run_command_coroutine(run_download(
         url=url,
         directory=directory,
         page_indexes=pages,
+        collection=collection,
         qn=quality_number,
         reverse_qn=reverse_qn,
         codec_id=codec_id,
         reverse_codec=reverse_codec,
         bit_rate_id=bit_rate_id,
         reverse_bit_rate=reverse_bit_rate,
+        stream_policy=stream_policy,
+        budget=budget,
         enable_danmaku=enable_danmaku,
+        compress_danmaku=compress_danmaku,
+        segmented_danmaku=segmented_danmaku,
         enable_cover=enable_cover,
+        dedup_cover=dedup_cover,
+        dedup_media=dedup_media,
+        log_digests=log_digests,
         enable_subtitle=enable_subtitle,
         skip_mux=skip_mux,
         preserve_original=preserve_original,
+        concurrency=concurrency,
+        processes=processes,
+        loop_options=_get_loop_options(),
+        memory_budget=memory_budget,
+        chunk_sizes=dict(chunk_sizes),
+        sink=sink,
+        enqueue=enqueue,
+        sess_data=sess_data
+    ))
+
+
+@cli.command(name='plan')
+@click.argument(
+    'URL',
+    type=str,
+    required=True
+)
+@click.option(
+    '-o',
+    '--output',
+    type=str,
+    default=None,
+    help='Path of JSON file where storage plan would be exported'
+)
+@click.option(
+    '-p',
+    '--pages',
+    type=INT_LIST,
+    default=None,
+    help='Selected pages'
+)
+@click.option(
+    '--collection',
+    is_flag=True,
+    default=False,
+    help='Expand all episodes of the UGC season which video belongs to, '
+         'and select episodes by "--pages"'
+)
+@click.option(
+    '--stream-policy',
+    default=None,
+    type=STREAM_POLICY,
+    help='JSON, or path of JSON file, of policy on choosing video and audio jointly'
+)
+@click.option(
+    '--budget',
+    default=None,
+    type=BYTE_SIZE,
+    help='Storage budget of selected pages, e.g. 10G'
+)
+@click.option(
+    '--sess-data',
+    default=None,
+    type=str,
+    help='Session data as personal certification'
+)
+def plan(
+    url: str,
+    output: Optional[str] = None,
+    pages: Optional[List[int]] = None,
+    collection: bool = False,
+    stream_policy: Optional['StreamPolicy'] = None,
+    budget: Optional[int] = None,
+    sess_data: Optional[str] = None
+) -> None:
+    from .download import run_plan
+
+    _run_command_coroutine(run_plan(
+        url=url,
+        output=output,
+        page_indexes=pages,
+        collection=collection,
+        stream_policy=stream_policy,
+        budget=budget,
         sess_data=sess_data
     ))
+
+
+@cli.command(name='space')
+@click.argument(
+    'MID',
+    type=int,
+    required=True
+)
+@click.option(
+    '-d',
+    '--directory',
+    type=str,
+    default=os.getcwd(),
+    help='Directory where videos would be saved'
+)
+@click.option(
+    '--checkpoint',
+    type=str,
+    default=None,
+    help='Path of JSON file recording downloaded videos, '
+         'default to ".space_<MID>.json" in the directory'
+)
+@click.option(
+    '--stream-policy',
+    default=None,
+    type=STREAM_POLICY,
+    help='JSON, or path of JSON file, of policy on choosing video and audio jointly'
+)
+@click.option(
+    '--enable-danmaku',
+    is_flag=True,
+    default=False,
+    help='Download danmaku of videos'
+)
+@click.option(
+    '--enable-cover',
+    is_flag=True,
+    default=False,
+    help='Download cover of videos'
+)
+@click.option(
+    '--enable-subtitle',
+    is_flag=True,
+    default=False,
+    help='Download subtitle of videos'
+)
+@click.option(
+    '--skip-mux',
+    is_flag=True,
+    default=False,
+    help='Mux video and audio stream'
+)
+@click.option(
+    '--concurrency',
+    type=click.IntRange(min=1),
+    default=1,
+    help='Count of pages downloaded concurrently'
+)
+@click.option(
+    '--sess-data',
+    default=None,
+    type=str,
+    help='Session data as personal certification'
+)
+def space(
+    mid: int,
+    directory: str,
+    checkpoint: Optional[str] = None,
+    stream_policy: Optional['StreamPolicy'] = None,
+    enable_danmaku: bool = False,
+    enable_cover: bool = False,
+    enable_subtitle: bool = False,
+    skip_mux: bool = False,
+    concurrency: int = 1,
+    sess_data: Optional[str] = None
+) -> None:
+    from .download import run_space
+
+    _run_coroutine(run_space(
+        mid=mid,
+        directory=directory,
+        checkpoint=checkpoint,
+        sess_data=sess_data,
+        stream_policy=stream_policy,
+        enable_danmaku=enable_danmaku,
+        enable_cover=enable_cover,
+        enable_subtitle=enable_subtitle,
+        skip_mux=skip_mux,
+        concurrency=concurrency
+    ))
+
+
+@cli.command(name='resolve')
+@click.argument(
+    'URLS',
+    type=str,
+    nargs=-1
+)
+@click.option(
+    '-i',
+    '--input-file',
+    type=click.File('r'),
+    default=None,
+    help='File of Urls, one per line, "-" for standard input'
+)
+@click.option(
+    '-o',
+    '--output',
+    type=str,
+    default=None,
+    help='Path of JSON lines file where resource IDs would be written, print them if not given'
+)
+@click.option(
+    '--cache',
+    type=str,
+    default=None,
+    help='Path of JSON file caching short links, '
+         'default to "~/.cache/bili-jeans/short_links.json"'
+)
+@click.option(
+    '--concurrency',
+    type=click.IntRange(min=1),
+    default=32,
+    help='Count of short links requested concurrently'
+)
+def resolve(
+    urls: Tuple[str, ...],
+    input_file: Optional[TextIO] = None,
+    output: Optional[str] = None,
+    cache: Optional[str] = None,
+    concurrency: int = 32
+) -> None:
+    all_urls = list(urls)
+    if input_file is not None:
+        all_urls.extend(line.strip() for line in input_file if line.strip())
+    from .resolve import run_resolve
+
+    _run_coroutine(run_resolve(
+        urls=all_urls,
+        output=output,
+        cache=cache,
+        concurrency=concurrency
+    ))
+
+
+@cli.command(name='daemon')
+@click.option(
+    '-d',
+    '--directory',
+    type=str,
+    default=os.getcwd(),
+    help='Directory where videos would be saved'
+)
+@click.option(
+    '--db',
+    type=str,
+    default=None,
+    help='Path of SQLite file persisting jobs, default to ".jobs.sqlite3" in the directory'
+)
+@click.option(
+    '--host',
+    type=str,
+    default='127.0.0.1',
+    help='Host of HTTP API'
+)
+@click.option(
+    '--port',
+    type=int,
+    default=8737,
+    help='Port of HTTP API'
+)
+@click.option(
+    '--unix-socket',
+    type=str,
+    default=None,
+    help='Path of Unix socket serving HTTP API, instead of host and port'
+)
+@click.option(
+    '--workers',
+    type=click.IntRange(min=1),
+    default=2,
+    help='Count of jobs running concurrently'
+)
+@click.option(
+    '--sess-data',
+    default=None,
+    type=str,
+    help='Session data as personal certification, for the jobs without their own'
+)
+def daemon(
+    directory: str,
+    db: Optional[str] = None,
+    host: str = '127.0.0.1',
+    port: int = 8737,
+    unix_socket: Optional[str] = None,
+    workers: int = 2,
+    sess_data: Optional[str] = None
+) -> None:
+    from .daemon import run_daemon
+
+    try:
+        _run_coroutine(run_daemon(
+            directory=directory,
+            db=db,
+            host=host,
+            port=port,
+            unix_socket=unix_socket,
+            workers=workers,
+            sess_data=sess_data
+        ))
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command(name='worker')
+@click.option(
+    '--queue',
+    type=str,
+    required=True,
+    help='Work queue shared by workers, e.g. redis://host:6379/0, or path of SQLite file'
+)
+@click.option(
+    '-d',
+    '--directory',
+    type=str,
+    default=os.getcwd(),
+    help='Directory where videos would be saved'
+)
+@click.option(
+    '--worker-id',
+    type=str,
+    default=None,
+    help='ID of this worker, default to host name and process ID'
+)
+@click.option(
+    '--concurrency',
+    type=click.IntRange(min=1),
+    default=1,
+    help='Count of pages downloaded concurrently'
+)
+@click.option(
+    '--lease',
+    type=click.FloatRange(min=1),
+    default=60,
+    help='Seconds of lease on a page, which is renewed by heartbeat while downloading'
+)
+@click.option(
+    '--max-attempts',
+    type=click.IntRange(min=1),
+    default=3,
+    help='Times of attempts on a page before it fails finally'
+)
+@click.option(
+    '--idle-exit',
+    is_flag=True,
+    default=False,
+    help='Exit when no page is queued or leased'
+)
+@click.option(
+    '--dedup-cover',
+    is_flag=True,
+    default=False,
+    help='Store covers once by content and link them to pages'
+)
+@click.option(
+    '--dedup-media',
+    is_flag=True,
+    default=False,
+    help='Store video and audio streams once by content and link them to pages, '
+         'the pages should be enqueued with "--skip-mux", otherwise the store keeps the raw streams besides muxed ones'
+)
+@click.option(
+    '--log-digests',
+    is_flag=True,
+    default=False,
+    help='Record digests of the downloaded streams in the log under directory, for scrubbing'
+)
+@click.option(
+    '--sess-data',
+    default=None,
+    type=str,
+    help='Session data as personal certification'
+)
+def worker(
+    queue: str,
+    directory: str,
+    worker_id: Optional[str] = None,
+    concurrency: int = 1,
+    lease: float = 60,
+    max_attempts: int = 3,
+    idle_exit: bool = False,
+    dedup_cover: bool = False,
+    dedup_media: bool = False,
+    log_digests: bool = False,
+    sess_data: Optional[str] = None
+) -> None:
+    from .worker import run_worker
+
+    try:
+        _run_coroutine(run_worker(
+            queue=queue,
+            directory=directory,
+            worker_id=worker_id,
+            concurrency=concurrency,
+            lease_seconds=lease,
+            max_attempts=max_attempts,
+            idle_exit=idle_exit,
+            dedup_cover=dedup_cover,
+            dedup_media=dedup_media,
+            log_digests=log_digests,
+            sess_data=sess_data
+        ))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,237 @@
+"""
+bili-jeans daemon
+
+one event loop with a shared session pool serves the jobs,
+which are submitted by local HTTP API, over TCP or Unix socket
+
+POST    /jobs           submit one job {"url": ..., "priority": 0, "options": {...}}, or a list of them
+GET     /jobs           list jobs, filtered by query 'status', paged by 'limit' and 'offset'
+GET     /jobs/{id}      query one job
+DELETE  /jobs/{id}      cancel a queued job
+GET     /status         count of jobs by status
+"""
+import asyncio
+import inspect
+import logging
+from pathlib import Path
+from typing import Any, cast, Dict, get_args, get_type_hints, List, Optional, Tuple, Type
+
+from aiohttp import web
+from pydantic import BaseModel, ConfigDict, create_model, ValidationError
+
+from .download import run
+from ..core.http import shared_client_session
+from ..core.jobs import Job, JobStatus, JobStore
+
+
+__all__ = ['create_app', 'run_daemon']
+
+
+logger = logging.getLogger(__name__)
+
+
+DAEMON_DB_FILENAME = '.jobs.sqlite3'
+# options of job are the keyword arguments of download run, except these ones,
+# which are given by the daemon, or decide where and by which processes it writes
+DAEMON_RESERVED_OPTIONS = (
+    'url',
+    'directory',
+    'interactive',
+    'sess_data',
+    'sink',
+    'enqueue',
+    'processes',
+    'loop_options'
+)
+# the jobs stored by the previous versions may contain them, which aren't responded
+DAEMON_SECRET_OPTIONS = ('sess_data',)
+DAEMON_REDACTED_VALUE = '***'
+JOB_OPTION_NAMES = tuple(
+    name for name in inspect.signature(run).parameters if name not in DAEMON_RESERVED_OPTIONS
+)
+
+
+def _create_job_options_model() -> Type[BaseModel]:
+    """
+    model of job options by the signature of download run,
+    which validates the types of options on submitting, rather than failing the job when it runs
+    """
+    type_hints = get_type_hints(run)
+    parameters = inspect.signature(run).parameters
+    fields: Dict[str, Any] = {
+        name: (type_hints[name], parameters[name].default) for name in JOB_OPTION_NAMES
+    }
+    return create_model('JobOptions', __config__=ConfigDict(extra='forbid'), **fields)
+
+
+JobOptions = _create_job_options_model()
+
+APP_KEY_STORE = web.AppKey('store', JobStore)
+APP_KEY_WAKEUP = web.AppKey('wakeup', asyncio.Event)
+
+
+def create_app(store: JobStore, wakeup: asyncio.Event) -> web.Application:
+    app = web.Application()
+    app[APP_KEY_STORE] = store
+    app[APP_KEY_WAKEUP] = wakeup
+    app.add_routes([
+        web.post('/jobs', _submit_jobs),
+        web.get('/jobs', _list_jobs),
+        web.get('/jobs/{job_id:\\d+}', _get_job),
+        web.delete('/jobs/{job_id:\\d+}', _cancel_job),
+        web.get('/status', _get_status)
+    ])
+    return app
+
+
+async def run_daemon(
+    directory: str,
+    db: Optional[str] = None,
+    host: str = '127.0.0.1',
+    port: int = 8737,
+    unix_socket: Optional[str] = None,
+    workers: int = 2,
+    sess_data: Optional[str] = None
+) -> None:
+    """
+    serve until being cancelled, e.g. by keyboard interrupt
+    the running jobs on exit are re-queued on the next start
+    """
+    dir_p = Path(directory)
+    assert dir_p.is_dir() is True  # given path should be a directory
+    store = JobStore(Path(db) if db is not None else dir_p.joinpath(DAEMON_DB_FILENAME))
+    wakeup = asyncio.Event()
+    runner = web.AppRunner(create_app(store, wakeup))
+    await runner.setup()
+    site: web.BaseSite
+    if unix_socket is not None:
+        site = web.UnixSite(runner, unix_socket)
+    else:
+        site = web.TCPSite(runner, host, port)
+
+    async with shared_client_session():
+        worker_tasks: List[asyncio.Task] = []
+        try:
+            await site.start()
+            logger.info(f'Daemon serving on {site.name}, jobs: {await asyncio.to_thread(store.count)}')
+            worker_tasks = [
+                asyncio.create_task(_work(store, wakeup, directory, sess_data))
+                for _ in range(max(workers, 1))
+            ]
+            await asyncio.gather(*worker_tasks)
+        finally:
+            for task in worker_tasks:
+                task.cancel()
+            await asyncio.gather(*worker_tasks, return_exceptions=True)
+            await runner.cleanup()
+            await asyncio.to_thread(store.close)
+            logger.info('Daemon stopped')
+
+
+async def _work(
+    store: JobStore,
+    wakeup: asyncio.Event,
+    directory: str,
+    sess_data: Optional[str] = None
+) -> None:
+    # the store is accessed on threads, so the others on the loop aren't blocked by the file
+    while True:
+        job = await asyncio.to_thread(store.claim)
+        if job is None:
+            wakeup.clear()
+            # a job may be submitted before clearing
+            job = await asyncio.to_thread(store.claim)
+        if job is None:
+            await wakeup.wait()
+            continue
+
+        logger.info(f'Running job {job.id_field}: {job.url}')
+        try:
+            options = {'sess_data': sess_data, **_parse_job_options(job.options)}
+            await run(url=job.url, directory=directory, **options)
+        except Exception as e:
+            logger.exception(f'Job {job.id_field} failed: {e}')
+            await asyncio.to_thread(store.finish, job.id_field, f'{type(e).__name__}: {e}')
+            continue
+        await asyncio.to_thread(store.finish, job.id_field)
+        logger.info(f'Job {job.id_field} done')
+
+
+def _parse_job_options(options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    raise ValidationError on unknown, reserved or mistyped options
+    """
+    job_options = JobOptions.model_validate(options)
+    return {name: getattr(job_options, name) for name in job_options.model_fields_set}
+
+
+def _parse_job_spec(spec: Any) -> Tuple[str, Dict[str, Any], int]:
+    if not isinstance(spec, dict) or not isinstance(spec.get('url'), str):
+        raise ValueError('Job should be an object with "url"')
+    options = spec.get('options') or {}
+    if not isinstance(options, dict):
+        raise ValueError('Job options should be an object')
+    _parse_job_options(options)
+    priority = spec.get('priority', 0)
+    if not isinstance(priority, int):
+        raise ValueError('Job priority should be an integer')
+    return spec['url'], options, priority
+
+
+def _dump_job(job: Job) -> Dict:
+    dumped = job.model_dump(by_alias=True)
+    dumped['options'] = {
+        name: DAEMON_REDACTED_VALUE if name in DAEMON_SECRET_OPTIONS else value
+        for name, value in dumped['options'].items()
+    }
+    return dumped
+
+
+async def _submit_jobs(request: web.Request) -> web.Response:
+    try:
+        body = await request.json()
+        specs = [_parse_job_spec(spec) for spec in (body if isinstance(body, list) else [body])]
+    except (ValueError, ValidationError) as e:
+        raise web.HTTPBadRequest(text=str(e))
+    jobs = await asyncio.to_thread(request.app[APP_KEY_STORE].submit_many, specs)
+    request.app[APP_KEY_WAKEUP].set()
+    return web.json_response({'jobs': [_dump_job(job) for job in jobs]}, status=201)
+
+
+async def _list_jobs(request: web.Request) -> web.Response:
+    status = request.query.get('status')
+    if status is not None and status not in get_args(JobStatus):
+        raise web.HTTPBadRequest(text=f'Unknown job status: {status}')
+    try:
+        jobs = await asyncio.to_thread(
+            request.app[APP_KEY_STORE].list,
+            cast(Optional[JobStatus], status),
+            limit=int(request.query.get('limit', 100)),
+            offset=int(request.query.get('offset', 0))
+        )
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    return web.json_response({'jobs': [_dump_job(job) for job in jobs]})
+
+
+async def _get_job(request: web.Request) -> web.Response:
+    job = await asyncio.to_thread(request.app[APP_KEY_STORE].get, int(request.match_info['job_id']))
+    if job is None:
+        raise web.HTTPNotFound()
+    return web.json_response(_dump_job(job))
+
+
+async def _cancel_job(request: web.Request) -> web.Response:
+    store = request.app[APP_KEY_STORE]
+    job_id = int(request.match_info['job_id'])
+    if await asyncio.to_thread(store.get, job_id) is None:
+        raise web.HTTPNotFound()
+    if not await asyncio.to_thread(store.cancel, job_id):
+        raise web.HTTPConflict(text='Only queued job can be cancelled')
+    job = await asyncio.to_thread(store.get, job_id)
+    assert job is not None
+    return web.json_response(_dump_job(job))
+
+
+async def _get_status(request: web.Request) -> web.Response:
+    return web.json_response({'jobs': await asyncio.to_thread(request.app[APP_KEY_STORE].count)})
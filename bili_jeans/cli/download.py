@@ -3,40 +3,51 @@ bili-jeans application
 """
 import asyncio
 import datetime
-import functools
 import json
 import logging
 from pathlib import Path
-from typing import cast, Callable, List, Optional, Tuple, Union
-
-from prompt_toolkit import prompt
-from prompt_toolkit.shortcuts import print_formatted_text
-from prompt_toolkit.formatted_text import HTML
-
-from ..core.constants import FormatNumberValue, FILE_EXT_MP4
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .page import download_page, get_page_resources, split_line_wrapper
+from ..core.constants import (
+    BitRateId,
+    CodecId,
+    FILE_EXT_MP4,
+    QualityNumber
+)
 from ..core.download import (
+    byte_budget,
+    override_chunk_sizes,
+    CoverStore,
     create_audio_task,
     create_cover_task,
     create_danmaku_task,
+    create_storage_sink,
     create_subtitle_tasks,
     create_video_task,
+    DEFAULT_MEMORY_BUDGET,
     list_cli_bit_rate_options,
     list_cli_codec_qn_filtered_options,
-    list_cli_quality_options
+    list_cli_quality_options,
+    media_store,
+    storage_sink
 )
 from ..core.factory import parse_web_view_url
+from ..core.integrity import record_digests
 from ..core.muxer import mux_streams
-from ..core.pages import get_ugc_pages
-from ..core.proxy import get_ugc_play, get_ugc_player, get_ugc_view
+from ..core.pages import get_ugc_pages, get_ugc_season_pages
+from ..core.planner import PagePlan, plan_pages, StoragePlan
+from ..core.proxy import get_ugc_view
 from ..core.schemes import (
     GetUGCPlayResponse,
-    GetUGCPlayerResponse,
     PageData,
     WebViewMetaData
 )
+from ..core.selection import StreamPolicy
+from ..core.space import iter_space_videos, SpaceCheckpoint
 
 
-__all__ = ['run']
+__all__ = ['run', 'run_plan', 'run_space']
 
 
 logger = logging.getLogger(__name__)
@@ -45,96 +56,343 @@ logger = logging.getLogger(__name__)
 SPLIT_LINE = '#' * 100
 
 
-def split_line_wrapper(
-    func: Optional[Callable] = None,
-    *,
-    split_char: str = '#',
-    length: int = 100
-) -> Callable:
-    def decorator(f: Callable) -> Callable:
-
-        @functools.wraps(f)
-        async def wrapper(*args, **kwargs):
-            split_line = split_char * length
-            logger.info(split_line)
-            result = await f(*args, **kwargs)
-            logger.info(split_line)
-            return result
-
-        return wrapper
-
-    if func is not None:
-        return decorator(func)
-
-    return decorator
-
-
 async def run(
     url: str,
     directory: str,
     page_indexes: Optional[List[int]] = None,
+    collection: bool = False,
     qn: Optional[int] = None,
     reverse_qn: bool = False,
     codec_id: Optional[int] = None,
     reverse_codec: bool = False,
     bit_rate_id: Optional[int] = None,
     reverse_bit_rate: bool = False,
+    stream_policy: Optional[StreamPolicy] = None,
+    budget: Optional[int] = None,
     enable_danmaku: bool = False,
+    compress_danmaku: bool = False,
+    segmented_danmaku: bool = False,
     enable_cover: bool = False,
+    dedup_cover: bool = False,
+    dedup_media: bool = False,
+    log_digests: bool = False,
     enable_subtitle: bool = False,
     skip_mux: bool = False,
     preserve_original: bool = False,
+    concurrency: int = 1,
+    processes: int = 1,
+    loop_options: Optional[Dict[str, Any]] = None,
+    memory_budget: Optional[int] = None,
+    chunk_sizes: Optional[Dict[str, int]] = None,
+    sink: Optional[str] = None,
+    enqueue: Optional[str] = None,
     sess_data: Optional[str] = None,
     interactive: bool = False
 ) -> None:
+    """
+    when 'processes' > 1, pages are sharded across worker processes,
+    each of them downloads 'concurrency' pages at a time,
+    on the event loop given by 'loop_options', the keyword arguments of 'run_coroutine'
+    streams buffer at most 'memory_budget' bytes in flight, in each process
+    'chunk_sizes' sets the chunk size by kind of resource, the others read in 'CHUNK_SIZE'
+    when 'log_digests' is True, digests of the streams are recorded in the log under 'directory'
+    when 'dedup_media' is True, video and audio are stored once by content and linked to pages,
+    which requires 'skip_mux'
+    'sink' is the URL of storage the files are written to, e.g. 's3://bucket/prefix', local by default,
+    the remote one keeps no local file, so muxing and deduplication aren't available
+    when 'enqueue' is given, pages are put to the work queue for workers instead
+    raises ValueError when the resource ID can't be parsed from 'url'
+    """
     view_meta = await _get_view_meta_by_url(url)
-    if view_meta is None:
-        return
     _ = await _get_view_data(view_meta.bvid, view_meta.aid, sess_data)
     if interactive:
         # get all of pages
         pages = await _get_pages(
             view_meta,
             sess_data=sess_data,
-            interactive=True
+            interactive=True,
+            collection=collection
         )
     else:
-        pages = await _get_pages(view_meta, page_indexes, sess_data)
+        pages = await _get_pages(view_meta, page_indexes, sess_data, collection=collection)
 
     dir_p = Path(directory)
     assert dir_p.is_dir() is True  # given path should be a directory
+    page_sink = create_storage_sink(sink, dir_p)
+    if not page_sink.is_local and (not skip_mux or dedup_cover or dedup_media):
+        raise ValueError(f'Muxing and deduplication need local files, which are not kept by sink {sink}')
+    if dedup_media and not skip_mux:
+        # muxing replaces the links of page, while the raw streams are kept in the store
+        raise ValueError('Deduplicated streams would be stored besides the muxed files, skip muxing with it')
+    cover_store = CoverStore(dir_p) if dedup_cover else None
+
+    page_plans: Dict[int, PagePlan] = {}
+    if budget is not None and not interactive:
+        storage_plan = await _plan_storage(
+            pages,
+            stream_policy or _get_preferred_policy(qn, codec_id, bit_rate_id),
+            budget,
+            sess_data
+        )
+        page_plans = {page_plan.cid: page_plan for page_plan in storage_plan.pages}
 
-    for page in pages:
-        if not interactive:
-            await _download_page(
+    if interactive:
+        for page in pages:
+            await _download_page_interactively(page, dir_p, sess_data)
+        logger.info('All pages downloaded')
+        return
+
+    default_stream_options = (
+        qn,
+        reverse_qn,
+        codec_id,
+        reverse_codec,
+        bit_rate_id,
+        reverse_bit_rate,
+        stream_policy
+    )
+    tasks = [
+        (
+            page,
+            _get_planned_options(page_plans[page.cid])
+            if page.cid in page_plans
+            else default_stream_options
+        )
+        for page in pages
+    ]
+
+    if enqueue is not None:
+        from .worker import enqueue_pages  # the worker imports this module
+
+        await enqueue_pages(
+            enqueue,
+            tasks,
+            enable_danmaku=enable_danmaku,
+            compress_danmaku=compress_danmaku,
+            segmented_danmaku=segmented_danmaku,
+            enable_cover=enable_cover,
+            enable_subtitle=enable_subtitle,
+            skip_mux=skip_mux,
+            preserve_original=preserve_original
+        )
+        return
+
+    if processes > 1:
+        from .pool import run_pool  # only needed by the batches sharded across processes
+
+        await run_pool(
+            tasks,
+            directory,
+            processes=processes,
+            concurrency=concurrency,
+            loop_options=loop_options,
+            dedup_cover=dedup_cover,
+            dedup_media=dedup_media,
+            log_digests=log_digests,
+            memory_budget=memory_budget or DEFAULT_MEMORY_BUDGET,
+            chunk_sizes=chunk_sizes,
+            sink=sink,
+            enable_danmaku=enable_danmaku,
+            compress_danmaku=compress_danmaku,
+            segmented_danmaku=segmented_danmaku,
+            enable_cover=enable_cover,
+            enable_subtitle=enable_subtitle,
+            skip_mux=skip_mux,
+            preserve_original=preserve_original,
+            sess_data=sess_data
+        )
+        return
+
+    # pages, e.g. episodes of a collection, are scheduled in one pipeline
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def _download(page: PageData, stream_options: Tuple) -> None:
+        async with semaphore:
+            await download_page(
                 page,
                 dir_p,
-                qn,
-                reverse_qn,
-                codec_id,
-                reverse_codec,
-                bit_rate_id,
-                reverse_bit_rate,
+                *stream_options,
                 enable_danmaku,
+                compress_danmaku,
+                segmented_danmaku,
                 enable_cover,
+                cover_store,
                 enable_subtitle,
                 skip_mux,
                 preserve_original,
                 sess_data
             )
-        else:
-            await _download_page_interactively(page, dir_p, sess_data)
+
+    async with byte_budget(memory_budget or DEFAULT_MEMORY_BUDGET):
+        with (
+            override_chunk_sizes(chunk_sizes or {}),
+            record_digests(dir_p if log_digests else None),
+            media_store(dir_p if dedup_media else None),
+            storage_sink(page_sink)
+        ):
+            await asyncio.gather(*[
+                _download(page, stream_options) for page, stream_options in tasks
+            ])
     logger.info('All pages downloaded')
 
 
+async def run_space(
+    mid: int,
+    directory: str,
+    checkpoint: Optional[str] = None,
+    sess_data: Optional[str] = None,
+    **download_options: Any
+) -> None:
+    """
+    download all of videos uploaded by the user,
+    the finished videos are recorded in checkpoint and skipped on re-run
+    'download_options' are passed to 'run' for each video
+    """
+    dir_p = Path(directory)
+    assert dir_p.is_dir() is True  # given path should be a directory
+    checkpoint_p = Path(checkpoint) if checkpoint is not None else dir_p.joinpath(f'.space_{mid}.json')
+    space_checkpoint = SpaceCheckpoint(checkpoint_p)
+    logger.info(f'Checkpoint of user {mid}: {checkpoint_p}, {len(space_checkpoint)} videos done')
+
+    count_done, count_failed = 0, 0
+    async for video in iter_space_videos(mid, sess_data):
+        if video.bvid in space_checkpoint:
+            logger.info(f'Skip the downloaded video: {video.bvid} {video.title}')
+            continue
+        logger.info(f'Downloading video {video.bvid} {video.title}...')
+        try:
+            await run(
+                url=video.view_url,
+                directory=directory,
+                sess_data=sess_data,
+                **download_options
+            )
+        except Exception as e:
+            logger.exception(f'Download video {video.bvid} failed: {e}')
+            count_failed += 1
+            continue
+        space_checkpoint.mark_done(video.bvid)
+        count_done += 1
+    logger.info(f'All videos of user {mid} processed, {count_done} downloaded, {count_failed} failed')
+
+
+async def run_plan(
+    url: str,
+    output: Optional[str] = None,
+    page_indexes: Optional[List[int]] = None,
+    collection: bool = False,
+    stream_policy: Optional[StreamPolicy] = None,
+    budget: Optional[int] = None,
+    sess_data: Optional[str] = None
+) -> StoragePlan:
+    """
+    estimate the size of pages without downloading,
+    and export the plan as JSON file when output is given
+    """
+    view_meta = await _get_view_meta_by_url(url)
+    _ = await _get_view_data(view_meta.bvid, view_meta.aid, sess_data)
+    pages = await _get_pages(view_meta, page_indexes, sess_data, collection=collection)
+    storage_plan = await _plan_storage(pages, stream_policy, budget, sess_data)
+    if output is not None:
+        Path(output).write_text(storage_plan.model_dump_json(indent=2), encoding='utf-8')
+        logger.info(f'Storage plan exported: {output}')
+    return storage_plan
+
+
+@split_line_wrapper
+async def _plan_storage(
+    pages: List[PageData],
+    stream_policy: Optional[StreamPolicy] = None,
+    budget: Optional[int] = None,
+    sess_data: Optional[str] = None
+) -> StoragePlan:
+    logger.info('Planning storage...')
+    storage_plan = await plan_pages(pages, stream_policy, budget, sess_data)
+    for page_plan in storage_plan.pages:
+        fmt_fields = [f'P{page_plan.idx}', f'{page_plan.cid}']
+        if page_plan.video is not None:
+            fmt_fields.append(
+                f'{QualityNumber.from_value(page_plan.video.quality_id).quality_name} '
+                f'{CodecId.from_value(page_plan.video.codec_id).quality_name}'
+                if QualityNumber.is_valid(page_plan.video.quality_id) and
+                page_plan.video.codec_id is not None and CodecId.is_valid(page_plan.video.codec_id)
+                else f'{page_plan.video.quality_id}'
+            )
+        if page_plan.audio is not None:
+            fmt_fields.append(
+                BitRateId.from_value(page_plan.audio.quality_id).quality_name
+                if BitRateId.is_valid(page_plan.audio.quality_id)
+                else f'{page_plan.audio.quality_id}'
+            )
+        fmt_fields.append(_format_bytes(page_plan.estimated_bytes))
+        logger.info(' | '.join(fmt_fields))
+    logger.info(f'Estimated total size: {_format_bytes(storage_plan.total_bytes)}')
+    if storage_plan.budget is not None:
+        logger.info(
+            f'Budget: {_format_bytes(storage_plan.budget)}, '
+            f'{"fits" if storage_plan.fits else "exceeded even with the smallest streams"}'
+        )
+    return storage_plan
+
+
+def _get_preferred_policy(
+    qn: Optional[int] = None,
+    codec_id: Optional[int] = None,
+    bit_rate_id: Optional[int] = None
+) -> Optional[StreamPolicy]:
+    """
+    the declared quality is an upper bound of the streams the storage plan starts from,
+    which could only be downgraded to fit the budget
+    """
+    if qn is None and codec_id is None and bit_rate_id is None:
+        return None
+    return StreamPolicy(
+        max_qn=qn,
+        codecs=[codec_id] if codec_id is not None else [],
+        max_bit_rate_id=bit_rate_id
+    )
+
+
+def _get_planned_options(
+    page_plan: PagePlan
+) -> Tuple[
+    Optional[int], bool,
+    Optional[int], bool,
+    Optional[int], bool,
+    Optional[StreamPolicy]
+]:
+    """
+    the planned streams are declared exactly,
+    which replaces the preferences and stream policy
+    """
+    return (
+        page_plan.video.quality_id if page_plan.video is not None else None,
+        False,
+        page_plan.video.codec_id if page_plan.video is not None else None,
+        False,
+        page_plan.audio.quality_id if page_plan.audio is not None else None,
+        False,
+        None
+    )
+
+
+def _format_bytes(size: int) -> str:
+    value = float(size)
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if value < 1024:
+            return f'{value:.2f} {unit}'
+        value /= 1024
+    return f'{value:.2f} TiB'
+
+
 @split_line_wrapper
-async def _get_view_meta_by_url(url: str) -> Optional[WebViewMetaData]:
+async def _get_view_meta_by_url(url: str) -> WebViewMetaData:
     logger.info('Parsing resource ID...')
     try:
         metadata = await parse_web_view_url(url)
     except ValueError as e:
         logger.info(f'Parse resource ID failed: <{str(e)}>')
-        return None
+        raise ValueError(f'Parse resource ID failed: {url}') from e
     logger.info(f'Parse resource ID succeed: {json.dumps(metadata.model_dump())}')
     return metadata
 
@@ -175,16 +433,23 @@ async def _get_pages(
     metadata: WebViewMetaData,
     page_indexes: Optional[List[int]] = None,
     sess_data: Optional[str] = None,
-    interactive: bool = False
+    interactive: bool = False,
+    collection: bool = False
 ) -> List[PageData]:
     """
     get all of pages of one streaming resource
     when interactive is True,
     'page_indexes' would be ignored
+    when collection is True,
+    pages of all episodes in its UGC season are got,
+    and 'page_indexes' selects the episodes
     """
     logger.info('Parsing pages...')
 
-    pages = await get_ugc_pages(metadata, sess_data)
+    if collection:
+        pages = await get_ugc_season_pages(metadata, sess_data)
+    else:
+        pages = await get_ugc_pages(metadata, sess_data)
     for page in pages:
         page_duration: Optional[str] = None
         if page.duration is not None:
@@ -192,6 +457,7 @@ async def _get_pages(
             minutes, seconds = divmod(remaining, 60)
             page_duration = f'{hours:02d}:{minutes:02d}:{seconds:02d}'
         fmt_fields = [
+            f'E{page.episode_idx}' if page.episode_idx is not None else None,
             f'P{page.idx}',
             f'{page.cid}',
             page.title,
@@ -204,154 +470,22 @@ async def _get_pages(
 
     selected_pages_label = 'all'
     if page_indexes is not None:
-        selected_pages_idx = list(
+        get_page_idx: Callable[[PageData], Optional[int]] = (
+            (lambda page: page.episode_idx) if collection else (lambda page: page.idx)
+        )
+        selected_pages_idx = list(dict.fromkeys(
             filter(
                 lambda page_idx: page_idx in page_indexes,
-                [page.idx for page in pages]
+                [get_page_idx(page) for page in pages]
             )
-        )
+        ))
         selected_pages_label = ', '.join(map(str, selected_pages_idx))
-        pages = [page for page in pages if page.idx in selected_pages_idx]
+        pages = [page for page in pages if get_page_idx(page) in selected_pages_idx]
 
-    logger.info(f'Selected pages: {selected_pages_label}')
+    logger.info(f'Selected {"episodes" if collection else "pages"}: {selected_pages_label}')
     return pages
 
 
-@split_line_wrapper
-async def _download_page(
-    page_data: PageData,
-    dir_path: Path,
-    qn: Optional[int] = None,
-    reverse_qn: bool = False,
-    codec_id: Optional[int] = None,
-    reverse_codec: bool = False,
-    bit_rate_id: Optional[int] = None,
-    reverse_bit_rate: bool = False,
-    enable_danmaku: bool = False,
-    enable_cover: bool = False,
-    enable_subtitle: bool = False,
-    skip_mux: bool = False,
-    preserve_original: bool = False,
-    sess_data: Optional[str] = None
-) -> None:
-    """
-    create async tasks to download various resources of one page
-    """
-    logger.info(f'Downloading page {page_data.idx}...')
-
-    ugc_play, ugc_player = await _get_page_resources(
-        page_data,
-        sess_data
-    )
-
-    video_task = create_video_task(
-        page_data,
-        ugc_play,
-        dir_path,
-        qn,
-        reverse_qn,
-        codec_id,
-        reverse_codec
-    )
-    audio_task = create_audio_task(
-        page_data,
-        ugc_play,
-        dir_path,
-        bit_rate_id,
-        reverse_bit_rate
-    )
-    danmaku_task = create_danmaku_task(page_data, dir_path) if enable_danmaku else None
-    cover_task = create_cover_task(page_data, dir_path) if enable_cover else None
-    subtitle_tasks = create_subtitle_tasks(
-        page_data, ugc_player, dir_path
-    ) if enable_subtitle else []
-
-    tasks = [video_task, audio_task, danmaku_task, cover_task, *subtitle_tasks]
-    for task in tasks:
-        if task is not None:
-            await task.run()
-
-    if not skip_mux:
-        output_file_p = dir_path.joinpath(
-            f'{page_data.bvid}/{page_data.cid}.mux{FILE_EXT_MP4}'
-        )
-        await mux_streams(
-            output_file=str(output_file_p),
-            url=page_data.page_url,
-            title=page_data.title,
-            description=page_data.description,
-            author_name=page_data.owner_name,
-            publish_date=page_data.pubdate,
-            video_file=str(video_task.file_path) if video_task else None,
-            audio_file=str(audio_task.file_path) if audio_task else None,
-            cover_file=str(cover_task.file_path) if cover_task else None,
-            overwrite=True,
-            preserve_original=preserve_original
-        )
-        if not preserve_original and output_file_p.exists():
-            output_file_p.rename(dir_path.joinpath(
-                f'{page_data.bvid}/{page_data.cid}{FILE_EXT_MP4}'
-            ))
-
-    logger.info(f'Downloaded page {page_data.idx} succeed')
-    return None
-
-
-async def _get_page_resources(
-    page_data: PageData,
-    sess_data: Optional[str] = None
-) -> Tuple[
-    Optional[GetUGCPlayResponse],
-    Optional[GetUGCPlayerResponse]
-]:
-    """
-    get the response from UGC play and UGC player
-    the response would be None when meet exception
-    """
-    get_ugc_play_coroutine = get_ugc_play(
-        cid=page_data.cid,
-        bvid=page_data.bvid,
-        aid=page_data.aid,
-        fnval=FormatNumberValue.get_dash_full_fnval(),
-        sess_data=sess_data
-    )
-    get_ugc_player_coroutine = get_ugc_player(
-        cid=page_data.cid,
-        bvid=page_data.bvid,
-        aid=page_data.aid,
-        sess_data=sess_data
-    )
-
-    ugc_play: Optional[Union[GetUGCPlayResponse, BaseException]]
-    ugc_player: Optional[Union[GetUGCPlayerResponse, BaseException]]
-    ugc_play, ugc_player = cast(
-        Tuple[
-            Union[GetUGCPlayResponse, BaseException],
-            Union[GetUGCPlayerResponse, BaseException]
-        ],
-        await asyncio.gather(
-            *[
-                get_ugc_play_coroutine,
-                get_ugc_player_coroutine
-            ], return_exceptions=True
-        )
-    )
-    if isinstance(ugc_play, BaseException):
-        logger.exception(
-            f'meet exception when request UGC play data'
-            f'for {page_data.cid} of {page_data.bvid}: {ugc_play}'
-        )
-        ugc_play = None
-    if isinstance(ugc_player, BaseException):
-        logger.exception(
-            f'meet exception when request UGC player data'
-            f'for {page_data.cid} of {page_data.bvid}: {ugc_player}'
-        )
-        ugc_player = None
-
-    return ugc_play, ugc_player
-
-
 @split_line_wrapper
 async def _download_page_interactively(
     page_data: PageData,
@@ -367,7 +501,7 @@ async def _download_page_interactively(
     if not to_download_page:
         return None
 
-    ugc_play, ugc_player = await _get_page_resources(
+    ugc_play, ugc_player = await get_page_resources(
         page_data,
         sess_data
     )
@@ -438,6 +572,8 @@ async def _download_page_interactively(
 async def _ensure_process_or_not(
     process_name: str
 ) -> bool:
+    from prompt_toolkit import prompt  # only interactive mode needs it
+
     logger.info(f'Whether {process_name} or not?')
 
     result = await asyncio.get_event_loop().run_in_executor(
@@ -483,6 +619,10 @@ async def _download_video_interactively(
 async def _get_selected_quality_options(
     options: Optional[List[Tuple[str, int]]] = None
 ) -> Optional[Tuple[str, int]]:
+    from prompt_toolkit import prompt  # only interactive mode needs it
+    from prompt_toolkit.formatted_text import HTML
+    from prompt_toolkit.shortcuts import print_formatted_text
+
     if options is None:
         logger.info('No available options')
         return None
@@ -0,0 +1,210 @@
+"""
+Download of one page
+
+shared by the download pipeline in one process, the worker processes of pool,
+and the workers of distributed queue
+"""
+import asyncio
+import functools
+import logging
+from pathlib import Path
+from typing import cast, Callable, Optional, Tuple, Union
+
+from ..core.constants import FormatNumberValue, FILE_EXT_MP4
+from ..core.download import (
+    BaseCoroutineDownloadTask,
+    CoverStore,
+    create_audio_task,
+    create_cover_task,
+    create_danmaku_task,
+    create_dash_tasks,
+    create_subtitle_tasks,
+    create_video_task
+)
+from ..core.muxer import mux_streams
+from ..core.proxy import get_ugc_play, get_ugc_player
+from ..core.schemes import GetUGCPlayResponse, GetUGCPlayerResponse, PageData
+from ..core.selection import StreamPolicy
+
+
+__all__ = ['download_page', 'get_page_resources', 'split_line_wrapper']
+
+
+logger = logging.getLogger(__name__)
+
+
+def split_line_wrapper(
+    func: Optional[Callable] = None,
+    *,
+    split_char: str = '#',
+    length: int = 100
+) -> Callable:
+    def decorator(f: Callable) -> Callable:
+
+        @functools.wraps(f)
+        async def wrapper(*args, **kwargs):
+            split_line = split_char * length
+            logger.info(split_line)
+            result = await f(*args, **kwargs)
+            logger.info(split_line)
+            return result
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+
+    return decorator
+
+
+@split_line_wrapper
+async def download_page(
+    page_data: PageData,
+    dir_path: Path,
+    qn: Optional[int] = None,
+    reverse_qn: bool = False,
+    codec_id: Optional[int] = None,
+    reverse_codec: bool = False,
+    bit_rate_id: Optional[int] = None,
+    reverse_bit_rate: bool = False,
+    stream_policy: Optional[StreamPolicy] = None,
+    enable_danmaku: bool = False,
+    compress_danmaku: bool = False,
+    segmented_danmaku: bool = False,
+    enable_cover: bool = False,
+    cover_store: Optional[CoverStore] = None,
+    enable_subtitle: bool = False,
+    skip_mux: bool = False,
+    preserve_original: bool = False,
+    sess_data: Optional[str] = None
+) -> None:
+    """
+    create async tasks to download various resources of one page
+    """
+    logger.info(f'Downloading page {page_data.idx}...')
+
+    ugc_play, ugc_player = await get_page_resources(
+        page_data,
+        sess_data
+    )
+
+    video_task: Optional[BaseCoroutineDownloadTask]
+    audio_task: Optional[BaseCoroutineDownloadTask]
+    if stream_policy is not None:
+        video_task, audio_task = create_dash_tasks(
+            page_data,
+            ugc_play,
+            dir_path,
+            stream_policy
+        )
+    else:
+        video_task = create_video_task(
+            page_data,
+            ugc_play,
+            dir_path,
+            qn,
+            reverse_qn,
+            codec_id,
+            reverse_codec
+        )
+        audio_task = create_audio_task(
+            page_data,
+            ugc_play,
+            dir_path,
+            bit_rate_id,
+            reverse_bit_rate
+        )
+    danmaku_task = create_danmaku_task(
+        page_data, dir_path, compress_danmaku, segmented_danmaku
+    ) if enable_danmaku else None
+    cover_task = create_cover_task(
+        page_data, dir_path, cover_store
+    ) if enable_cover else None
+    subtitle_tasks = create_subtitle_tasks(
+        page_data, ugc_player, dir_path
+    ) if enable_subtitle else []
+
+    tasks = [video_task, audio_task, danmaku_task, cover_task, *subtitle_tasks]
+    for task in tasks:
+        if task is not None:
+            await task.run()
+
+    if not skip_mux:
+        output_file_p = dir_path.joinpath(
+            f'{page_data.bvid}/{page_data.cid}.mux{FILE_EXT_MP4}'
+        )
+        await mux_streams(
+            output_file=str(output_file_p),
+            url=page_data.page_url,
+            title=page_data.title,
+            description=page_data.description,
+            author_name=page_data.owner_name,
+            publish_date=page_data.pubdate,
+            video_file=str(video_task.file_path) if video_task else None,
+            audio_file=str(audio_task.file_path) if audio_task else None,
+            cover_file=str(cover_task.file_path) if cover_task else None,
+            overwrite=True,
+            preserve_original=preserve_original
+        )
+        if not preserve_original and output_file_p.exists():
+            output_file_p.rename(dir_path.joinpath(
+                f'{page_data.bvid}/{page_data.cid}{FILE_EXT_MP4}'
+            ))
+
+    logger.info(f'Downloaded page {page_data.idx} succeed')
+    return None
+
+
+async def get_page_resources(
+    page_data: PageData,
+    sess_data: Optional[str] = None
+) -> Tuple[
+    Optional[GetUGCPlayResponse],
+    Optional[GetUGCPlayerResponse]
+]:
+    """
+    get the response from UGC play and UGC player
+    the response would be None when meet exception
+    """
+    get_ugc_play_coroutine = get_ugc_play(
+        cid=page_data.cid,
+        bvid=page_data.bvid,
+        aid=page_data.aid,
+        fnval=FormatNumberValue.get_dash_full_fnval(),
+        sess_data=sess_data
+    )
+    get_ugc_player_coroutine = get_ugc_player(
+        cid=page_data.cid,
+        bvid=page_data.bvid,
+        aid=page_data.aid,
+        sess_data=sess_data
+    )
+
+    ugc_play: Optional[Union[GetUGCPlayResponse, BaseException]]
+    ugc_player: Optional[Union[GetUGCPlayerResponse, BaseException]]
+    ugc_play, ugc_player = cast(
+        Tuple[
+            Union[GetUGCPlayResponse, BaseException],
+            Union[GetUGCPlayerResponse, BaseException]
+        ],
+        await asyncio.gather(
+            *[
+                get_ugc_play_coroutine,
+                get_ugc_player_coroutine
+            ], return_exceptions=True
+        )
+    )
+    if isinstance(ugc_play, BaseException):
+        logger.exception(
+            f'meet exception when request UGC play data'
+            f'for {page_data.cid} of {page_data.bvid}: {ugc_play}'
+        )
+        ugc_play = None
+    if isinstance(ugc_player, BaseException):
+        logger.exception(
+            f'meet exception when request UGC player data'
+            f'for {page_data.cid} of {page_data.bvid}: {ugc_player}'
+        )
+        ugc_player = None
+
+    return ugc_play, ugc_player
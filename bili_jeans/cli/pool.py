@@ -0,0 +1,326 @@
+"""
+Sharded execution of page downloads
+
+pages are distributed through a shared queue to worker processes,
+each of them runs its own event loop and session pool,
+and the parent aggregates their progress events, log records and the manifest
+"""
+import asyncio
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import multiprocessing
+from multiprocessing.process import BaseProcess
+import os
+from pathlib import Path
+import queue
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .page import download_page
+from ..core.download import (
+    byte_budget,
+    override_chunk_sizes,
+    CoverStore,
+    create_storage_sink,
+    DEFAULT_MEMORY_BUDGET,
+    media_store,
+    storage_sink
+)
+from ..core.http import shared_client_session
+from ..core.integrity import record_digests
+from ..core.loop import run_coroutine
+from ..core.manifest import (
+    Manifest,
+    MANIFEST_FILENAME,
+    MANIFEST_STATUS_DONE,
+    MANIFEST_STATUS_FAILED,
+    ManifestEntry
+)
+from ..core.schemes import PageData
+
+
+__all__ = ['run_pool']
+
+
+logger = logging.getLogger(__name__)
+
+
+EVENT_STARTED = 'started'
+EVENT_DONE = 'done'
+EVENT_FAILED = 'failed'
+EVENT_POLL_INTERVAL = 0.5   # unit is second, for checking whether workers are alive
+
+# event is (kind, process ID, position of task, elapsed seconds, error)
+Event = Tuple[str, int, int, float, Optional[str]]
+# task is (position, page, positional stream options of 'download_page')
+Task = Tuple[int, PageData, Tuple]
+
+
+async def run_pool(
+    tasks: Sequence[Tuple[PageData, Tuple]],
+    directory: str,
+    processes: int = 2,
+    concurrency: int = 1,
+    loop_options: Optional[Dict[str, Any]] = None,
+    dedup_cover: bool = False,
+    dedup_media: bool = False,
+    log_digests: bool = False,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    chunk_sizes: Optional[Dict[str, int]] = None,
+    sink: Optional[str] = None,
+    manifest: Optional[str] = None,
+    start_method: str = 'spawn',
+    **page_options: Any
+) -> Manifest:
+    """
+    download pages by worker processes, each of them runs 'concurrency' pages at a time,
+    on the event loop given by 'loop_options', the keyword arguments of 'run_coroutine'
+    'tasks' are pairs of page and its stream options,
+    'page_options' are the other keyword arguments of 'download_page'
+    the pages done in the manifest are skipped
+    each process buffers at most 'memory_budget' bytes of streams in flight
+    'chunk_sizes' sets the chunk size by kind of resource in each process
+    'sink' is the URL of storage the files are written to, local by default
+    """
+    dir_p = Path(directory)
+    assert dir_p.is_dir() is True  # given path should be a directory
+    page_manifest = Manifest(
+        Path(manifest) if manifest is not None else dir_p.joinpath(MANIFEST_FILENAME)
+    )
+    pending: Dict[int, PageData] = {}
+    for pos, (page, _) in enumerate(tasks):
+        if page_manifest.is_done(page.bvid, page.cid):
+            logger.info(f'Skip the downloaded page: P{page.idx} {page.cid}')
+            continue
+        pending[pos] = page
+    if not pending:
+        logger.info('All pages downloaded')
+        return page_manifest
+
+    context = multiprocessing.get_context(start_method)
+    task_queue = context.Queue()
+    event_queue = context.Queue()
+    log_queue = context.Queue()
+    for pos, (page, stream_options) in enumerate(tasks):
+        if pos in pending:
+            task_queue.put((pos, page, stream_options))
+    processes = max(min(processes, len(pending)), 1)
+    concurrency = max(concurrency, 1)
+    for _ in range(processes * concurrency):
+        task_queue.put(None)  # one sentinel for each consumer
+
+    root_logger = logging.getLogger()
+    listener = QueueListener(log_queue, *root_logger.handlers, respect_handler_level=True)
+    workers: List[BaseProcess] = [
+        context.Process(  # type: ignore[attr-defined]
+            target=_serve,
+            args=(
+                task_queue,
+                event_queue,
+                log_queue,
+                root_logger.level,
+                directory,
+                concurrency,
+                loop_options or {},
+                dedup_cover,
+                dedup_media,
+                log_digests,
+                memory_budget,
+                chunk_sizes or {},
+                sink,
+                page_options
+            ),
+            daemon=True
+        )
+        for _ in range(processes)
+    ]
+    logger.info(f'Downloading {len(pending)} pages by {processes} worker processes...')
+    listener.start()
+    try:
+        for worker in workers:
+            worker.start()
+        await _collect(event_queue, workers, pending, page_manifest)
+        for worker in workers:
+            await asyncio.to_thread(worker.join)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        listener.stop()
+
+    count_failed = len(page_manifest.list(MANIFEST_STATUS_FAILED))
+    logger.info(
+        f'All pages processed, manifest: {page_manifest.file_path}, '
+        f'{len(page_manifest) - count_failed} downloaded, {count_failed} failed'
+    )
+    return page_manifest
+
+
+async def _collect(
+    event_queue: Any,
+    workers: Sequence[BaseProcess],
+    pending: Dict[int, PageData],
+    page_manifest: Manifest
+) -> None:
+    """
+    record the finished pages until all of them are finished,
+    or all of workers exit, e.g. killed,
+    then the remaining pages are recorded as failed
+    """
+    total = len(pending)
+    running: Dict[int, int] = {}  # position of task -> process ID
+    while pending:
+        event = await asyncio.to_thread(_get_event, event_queue)
+        if event is None:
+            if any(worker.is_alive() for worker in workers):
+                continue
+            # the queue is flushed by the exited workers
+            event = _get_event(event_queue, block=False)
+            if event is None:
+                break
+        kind, pid, pos, elapsed, error = event
+        page = pending.get(pos)
+        if page is None:
+            continue
+        if kind == EVENT_STARTED:
+            running[pos] = pid
+            logger.info(f'Worker {pid} started P{page.idx} {page.cid}')
+            continue
+        running.pop(pos, None)
+        pending.pop(pos)
+        _record(page_manifest, page, kind, pid, elapsed, error)
+        logger.info(
+            f'[{total - len(pending)}/{total}] P{page.idx} {page.cid} {kind} '
+            f'by worker {pid} in {elapsed:.2f}s' + (f': {error}' if error else '')
+        )
+
+    for pos, page in pending.items():
+        _record(
+            page_manifest,
+            page,
+            EVENT_FAILED,
+            running.get(pos),
+            0.0,
+            'Worker exited unexpectedly'
+        )
+        logger.warning(f'P{page.idx} {page.cid} failed: worker exited unexpectedly')
+
+
+def _record(
+    page_manifest: Manifest,
+    page: PageData,
+    kind: str,
+    pid: Optional[int],
+    elapsed: float,
+    error: Optional[str]
+) -> None:
+    page_manifest.record(ManifestEntry(
+        bvid=page.bvid,
+        cid=page.cid,
+        idx=page.idx,
+        title=page.title,
+        status=MANIFEST_STATUS_DONE if kind == EVENT_DONE else MANIFEST_STATUS_FAILED,
+        error=error,
+        worker=pid,
+        elapsed=elapsed,
+        finished_at=time.time()
+    ))
+
+
+def _get_event(event_queue: Any, block: bool = True) -> Optional[Event]:
+    try:
+        return event_queue.get(block, EVENT_POLL_INTERVAL)
+    except queue.Empty:
+        return None
+
+
+def _serve(
+    task_queue: Any,
+    event_queue: Any,
+    log_queue: Any,
+    log_level: int,
+    directory: str,
+    concurrency: int,
+    loop_options: Dict[str, Any],
+    dedup_cover: bool,
+    dedup_media: bool,
+    log_digests: bool,
+    memory_budget: int,
+    chunk_sizes: Dict[str, int],
+    sink: Optional[str],
+    page_options: Dict[str, Any]
+) -> None:
+    """
+    entry of worker process, its log records are forwarded to the parent
+    """
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(log_level)
+
+    run_coroutine(_work(
+        task_queue,
+        event_queue,
+        directory,
+        concurrency,
+        dedup_cover,
+        dedup_media,
+        log_digests,
+        memory_budget,
+        chunk_sizes,
+        sink,
+        page_options
+    ), **loop_options)
+
+
+async def _work(
+    task_queue: Any,
+    event_queue: Any,
+    directory: str,
+    concurrency: int,
+    dedup_cover: bool,
+    dedup_media: bool,
+    log_digests: bool,
+    memory_budget: int,
+    chunk_sizes: Dict[str, int],
+    sink: Optional[str],
+    page_options: Dict[str, Any]
+) -> None:
+    dir_p = Path(directory)
+    # covers and streams are deduplicated in each process, through the indexes shared by them
+    cover_store = CoverStore(dir_p) if dedup_cover else None
+    pid = os.getpid()
+
+    async def _consume() -> None:
+        while True:
+            task: Optional[Task] = await asyncio.to_thread(task_queue.get)
+            if task is None:
+                return
+            pos, page, stream_options = task
+            event_queue.put((EVENT_STARTED, pid, pos, 0.0, None))
+            start = time.monotonic()
+            try:
+                await download_page(
+                    page,
+                    dir_p,
+                    *stream_options,
+                    cover_store=cover_store,
+                    **page_options
+                )
+            except Exception as e:
+                logger.exception(f'Download P{page.idx} {page.cid} failed: {e}')
+                event_queue.put(
+                    (EVENT_FAILED, pid, pos, time.monotonic() - start, f'{type(e).__name__}: {e}')
+                )
+                continue
+            event_queue.put((EVENT_DONE, pid, pos, time.monotonic() - start, None))
+
+    async with shared_client_session(), byte_budget(memory_budget):
+        with (
+            override_chunk_sizes(chunk_sizes),
+            record_digests(dir_p if log_digests else None),
+            media_store(dir_p if dedup_media else None),
+            storage_sink(create_storage_sink(sink, dir_p))
+        ):
+            await asyncio.gather(*[_consume() for _ in range(concurrency)])
@@ -0,0 +1,51 @@
+"""
+bili-jeans URL resolution
+"""
+import json
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+import click
+
+from ..core.factory import resolve_web_view_urls, ShortLinkCache
+
+
+__all__ = ['run_resolve']
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_SHORT_LINK_CACHE_PATH = Path.home().joinpath('.cache', 'bili-jeans', 'short_links.json')
+
+
+async def run_resolve(
+    urls: List[str],
+    output: Optional[str] = None,
+    cache: Optional[str] = None,
+    concurrency: int = 32
+) -> None:
+    """
+    write the resource ID of each Url as a JSON line to output, or print them,
+    'bvid' and 'aid' are null when the Url is unresolvable
+    """
+    short_link_cache = ShortLinkCache(Path(cache) if cache is not None else DEFAULT_SHORT_LINK_CACHE_PATH)
+    results = await resolve_web_view_urls(urls, short_link_cache, concurrency)
+    lines = [
+        json.dumps({
+            'url': url,
+            'bvid': metadata.bvid if metadata is not None else None,
+            'aid': metadata.aid if metadata is not None else None
+        }, ensure_ascii=False)
+        for url, metadata in zip(urls, results)
+    ]
+    if output is not None:
+        Path(output).write_text(''.join(f'{line}\n' for line in lines), encoding='utf-8')
+    else:
+        for line in lines:
+            click.echo(line)
+    logger.info(
+        f'{sum(metadata is not None for metadata in results)} of {len(urls)} Urls resolved, '
+        f'{len(short_link_cache)} short links cached'
+    )
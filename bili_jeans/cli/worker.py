@@ -0,0 +1,205 @@
+"""
+bili-jeans worker on the shared work queue
+
+pages are enqueued by 'download --enqueue', and leased by the workers on any node,
+each worker keeps its leases by heartbeat, and records the pages in its own manifest,
+so the workers sharing a file system should not share the directory or manifest
+"""
+import asyncio
+import logging
+import os
+from pathlib import Path
+import socket
+import time
+from typing import Any, Optional, Sequence, Tuple
+
+from .page import download_page
+from ..core.download import byte_budget, CoverStore, media_store
+from ..core.http import shared_client_session
+from ..core.integrity import record_digests
+from ..core.manifest import (
+    Manifest,
+    MANIFEST_FILENAME,
+    MANIFEST_STATUS_DONE,
+    MANIFEST_STATUS_FAILED,
+    ManifestEntry,
+    ManifestStatus
+)
+from ..core.schemes import PageData
+from ..core.work_queue import (
+    BaseWorkQueue,
+    DEFAULT_MAX_ATTEMPTS,
+    open_work_queue,
+    STREAM_OPTION_NAMES,
+    WORK_STATUS_LEASED,
+    WORK_STATUS_QUEUED,
+    WorkItem
+)
+
+
+__all__ = ['enqueue_pages', 'run_worker']
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_LEASE_SECONDS = 60.0
+DEFAULT_POLL_INTERVAL = 5.0     # unit is second, for waiting on empty queue
+
+
+async def enqueue_pages(
+    queue: str,
+    tasks: Sequence[Tuple[PageData, Tuple]],
+    **page_options: Any
+) -> int:
+    """
+    put pairs of page and its stream options to the work queue,
+    'page_options' are the other keyword arguments of 'download_page' except session data,
+    which is given by each worker
+    return count of the new items, the pages already in queue are kept as is
+    """
+    work_queue = open_work_queue(queue)
+    count_new = 0
+    try:
+        for page, stream_options in tasks:
+            item = WorkItem(
+                key=Manifest.get_key(page.bvid, page.cid),
+                page=page,
+                options=page_options,
+                **dict(zip(STREAM_OPTION_NAMES, stream_options))
+            )
+            if await work_queue.put(item):
+                count_new += 1
+            else:
+                logger.info(f'Skip the enqueued page: P{page.idx} {page.cid}')
+        logger.info(f'Enqueued {count_new} pages, queue: {await work_queue.count()}')
+    finally:
+        await work_queue.close()
+    return count_new
+
+
+async def run_worker(
+    queue: str,
+    directory: str,
+    worker_id: Optional[str] = None,
+    concurrency: int = 1,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    idle_exit: bool = False,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    dedup_cover: bool = False,
+    dedup_media: bool = False,
+    log_digests: bool = False,
+    manifest: Optional[str] = None,
+    sess_data: Optional[str] = None
+) -> Manifest:
+    """
+    lease and download pages until being cancelled,
+    or until no page is queued or leased when 'idle_exit' is True
+    """
+    dir_p = Path(directory)
+    assert dir_p.is_dir() is True  # given path should be a directory
+    worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+    page_manifest = Manifest(
+        Path(manifest) if manifest is not None else dir_p.joinpath(MANIFEST_FILENAME)
+    )
+    cover_store = CoverStore(dir_p) if dedup_cover else None
+    work_queue = open_work_queue(queue)
+
+    async def _process(item: WorkItem) -> None:
+        page = item.page
+        if page_manifest.is_done(page.bvid, page.cid):
+            # downloaded before, e.g. exited before completing it
+            await work_queue.complete(item.key, worker_id)
+            logger.info(f'Skip the downloaded page: P{page.idx} {page.cid}')
+            return
+
+        logger.info(f'Leased P{page.idx} {page.cid} of {page.bvid}, attempt {item.attempts}')
+        heartbeat_task = asyncio.create_task(
+            _keep_lease(work_queue, item.key, worker_id, lease_seconds)
+        )
+        start = time.monotonic()
+        try:
+            await download_page(
+                page,
+                dir_p,
+                *item.stream_options,
+                cover_store=cover_store,
+                sess_data=sess_data,
+                **item.options
+            )
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            logger.exception(f'Download P{page.idx} {page.cid} failed: {error}')
+            if await work_queue.fail(item.key, worker_id, error, max_attempts):
+                _record(page_manifest, item, MANIFEST_STATUS_FAILED, worker_id, start, error)
+            return
+        finally:
+            heartbeat_task.cancel()
+
+        # this node has the files, whichever completion is the first
+        _record(page_manifest, item, MANIFEST_STATUS_DONE, worker_id, start)
+        if not await work_queue.complete(item.key, worker_id):
+            logger.info(f'P{page.idx} {page.cid} was completed by another worker')
+        logger.info(f'P{page.idx} {page.cid} done in {time.monotonic() - start:.2f}s')
+
+    async def _consume() -> None:
+        while True:
+            item = await work_queue.lease(worker_id, lease_seconds, max_attempts)
+            if item is not None:
+                await _process(item)
+                continue
+            if idle_exit:
+                counts = await work_queue.count()
+                if not counts.get(WORK_STATUS_QUEUED) and not counts.get(WORK_STATUS_LEASED):
+                    return
+            await asyncio.sleep(poll_interval)
+
+    logger.info(f'Worker {worker_id} serving on {queue}')
+    try:
+        async with shared_client_session(), byte_budget():
+            with (
+                record_digests(dir_p if log_digests else None),
+                media_store(dir_p if dedup_media else None)
+            ):
+                await asyncio.gather(*[_consume() for _ in range(max(concurrency, 1))])
+    finally:
+        await work_queue.close()
+    logger.info(f'Worker {worker_id} stopped, manifest: {page_manifest.file_path}')
+    return page_manifest
+
+
+async def _keep_lease(
+    work_queue: BaseWorkQueue,
+    key: str,
+    worker_id: str,
+    lease_seconds: float
+) -> None:
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        if not await work_queue.heartbeat(key, worker_id, lease_seconds):
+            # keep downloading, the completion is idempotent
+            logger.warning(f'Lease of {key} is lost')
+            return
+
+
+def _record(
+    page_manifest: Manifest,
+    item: WorkItem,
+    status: ManifestStatus,
+    worker_id: str,
+    start: float,
+    error: Optional[str] = None
+) -> None:
+    page_manifest.record(ManifestEntry(
+        bvid=item.page.bvid,
+        cid=item.page.cid,
+        idx=item.page.idx,
+        title=item.page.title,
+        status=status,
+        error=error,
+        worker=os.getpid(),
+        node=worker_id,
+        elapsed=time.monotonic() - start,
+        finished_at=time.time()
+    ))
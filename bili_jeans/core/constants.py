@@ -3,7 +3,7 @@ Constants
 """
 from enum import Enum, IntEnum
 from functools import reduce
-from typing import NamedTuple, Type
+from typing import Dict, Iterable, List, NamedTuple, Type
 
 
 ###############################
@@ -32,6 +32,11 @@ URL_WEB_UGC_PLAY = 'https://api.bilibili.com/x/player/wbi/playurl'
 URL_WEB_UGC_PLAYER = 'https://api.bilibili.com/x/player/wbi/v2'
 URL_WEB_UGC_VIEW = 'https://api.bilibili.com/x/web-interface/view'
 URL_WEB_DANMAKU = 'https://api.bilibili.com/x/v1/dm/list.so'
+URL_WEB_DANMAKU_SEGMENT = 'https://api.bilibili.com/x/v2/dm/web/seg.so'
+URL_WEB_NAV = 'https://api.bilibili.com/x/web-interface/nav'
+URL_WEB_SPACE_VIDEOS = 'https://api.bilibili.com/x/space/wbi/arc/search'
+# duration of each protobuf danmaku segment, unit is second
+DANMAKU_SEGMENT_DURATION = 6 * 60
 
 
 URL_WEB_HOST = 'https://www.bilibili.com'
@@ -59,13 +64,39 @@ class QualityItem(NamedTuple):
 
 
 class QualityId(QualityItem, Enum):
+    """
+    lookup table of quality ID of each subclass is built once it's defined, at module import
+    """
 
     @classmethod
     def from_value(cls: Type['QualityId'], value: int) -> 'QualityId':
-        for item in cls:
-            if item.quality_id == value:
-                return item
-        raise ValueError(f'Invalid given {cls.__name__}: {value}')
+        try:
+            return cls._get_id_index()[value]
+        except (KeyError, TypeError):
+            raise ValueError(f'Invalid given {cls.__name__}: {value}') from None
+
+    @classmethod
+    def from_values(cls: Type['QualityId'], values: Iterable[int]) -> List['QualityId']:
+        index = cls._get_id_index()
+        result = []
+        for value in values:
+            item = index.get(value)
+            if item is None:
+                raise ValueError(f'Invalid given {cls.__name__}: {value}')
+            result.append(item)
+        return result
+
+    @classmethod
+    def is_valid(cls: Type['QualityId'], value: int) -> bool:
+        return value in cls._get_id_index()
+
+    @classmethod
+    def _get_id_index(cls: Type['QualityId']) -> Dict[int, 'QualityId']:
+        return _QUALITY_ID_INDEXES[cls]
+
+
+# quality class -> {quality ID: quality item}
+_QUALITY_ID_INDEXES: Dict[Type[QualityId], Dict[int, QualityId]] = {}
 
 
 ########################
@@ -279,9 +310,34 @@ class BitRateId(QualityId):
     )
 
 
-CHUNK_SIZE: int = int(1024 * 1024)
+_QUALITY_ID_INDEXES.update({
+    quality_class: {item.quality_id: item for item in quality_class}
+    for quality_class in (QualityNumber, CodecId, BitRateId)
+})
 
 
+CHUNK_SIZE: int = int(1024 * 1024)
+# resources whose 'Content-Length' is within it are read at once instead of in streaming
+SMALL_RESOURCE_SIZE: int = int(256 * 1024)
+
+RESOURCE_KIND_AUDIO = 'audio'
+RESOURCE_KIND_COVER = 'cover'
+RESOURCE_KIND_DANMAKU = 'danmaku'
+RESOURCE_KIND_SUBTITLE = 'subtitle'
+RESOURCE_KIND_VIDEO = 'video'
+RESOURCE_KINDS = (
+    RESOURCE_KIND_AUDIO,
+    RESOURCE_KIND_COVER,
+    RESOURCE_KIND_DANMAKU,
+    RESOURCE_KIND_SUBTITLE,
+    RESOURCE_KIND_VIDEO
+)
+# uncompressed size of each independent frame in seekable compressed file
+FRAME_SIZE: int = int(256 * 1024)
+
+
+FILE_EXT_GZ = '.gz'
+FILE_EXT_IDX = '.idx'
 FILE_EXT_JPG = '.jpg'
 FILE_EXT_JSON = '.json'
 FILE_EXT_M4A = '.m4a'
@@ -1,12 +1,29 @@
 """
 Download components
 """
+from .byte_budget import (  # noqa: F401
+    byte_budget,
+    ByteBudget,
+    DEFAULT_MEMORY_BUDGET
+)
+from .chunk_size import override_chunk_sizes  # noqa: F401
+from .cover_store import CoverStore  # noqa: F401
+from .download_task import BaseCoroutineDownloadTask  # noqa: F401
+from .media_store import media_store, MediaStore  # noqa: F401
+from .storage_sink import (  # noqa: F401
+    create_storage_sink,
+    FileSystemSink,
+    S3Sink,
+    storage_sink,
+    StorageSink
+)
 from .ugc_audio import (  # noqa: F401
     create_audio_task,
     list_cli_bit_rate_options
 )
 from .ugc_cover import create_cover_task  # noqa: F401
 from .ugc_danmaku import create_danmaku_task  # noqa: F401
+from .ugc_dash import create_dash_tasks  # noqa: F401
 from .ugc_subtitle import create_subtitle_tasks  # noqa: F401
 from .ugc_video import (  # noqa: F401
     create_video_task,
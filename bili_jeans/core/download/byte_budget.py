@@ -0,0 +1,133 @@
+"""
+Global budget of the bytes buffered in flight
+
+each chunk of stream reserves its size once read, and releases it after being written,
+so the readers pause when the writers lag, the unread data is left in socket buffers,
+and TCP flow control slows down the server
+within 'byte_budget', the streams in current context share the same budget,
+otherwise they are unlimited as before
+"""
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Optional, Tuple
+
+
+__all__ = ['byte_budget', 'ByteBudget', 'DEFAULT_MEMORY_BUDGET', 'reserve_bytes']
+
+
+DEFAULT_MEMORY_BUDGET: int = 64 * 1024 * 1024
+
+_BYTE_BUDGET: ContextVar[Optional['ByteBudget']] = ContextVar(
+    'byte_budget',
+    default=None
+)
+
+
+class ByteBudget(object):
+    """
+    the reservations are granted in FIFO order,
+    one larger than the limit is granted as the limit, when nothing else is reserved
+    """
+
+    def __init__(self, limit: int) -> None:
+        if limit <= 0:
+            raise ValueError(f'Byte budget should be positive: {limit}')
+        self._limit = limit
+        self._in_use = 0
+        self._peak = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @property
+    def peak(self) -> int:
+        """
+        max bytes reserved at the same time
+        """
+        return self._peak
+
+    async def acquire(self, size: int) -> int:
+        """
+        wait until 'size' bytes are available,
+        return the reserved size, which should be released later
+        """
+        size = min(size, self._limit)
+        if not self._waiters and self._in_use + size <= self._limit:
+            self._grant(size)
+            return size
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (size, future)
+        self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # skipped already by waking, if the budget is released before the cancellation is delivered
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._wake()
+            else:
+                # granted just before being cancelled
+                self.release(size)
+            raise
+        return size
+
+    def release(self, size: int) -> None:
+        self._in_use -= size
+        self._wake()
+
+    def _grant(self, size: int) -> None:
+        self._in_use += size
+        self._peak = max(self._peak, self._in_use)
+
+    def _wake(self) -> None:
+        while self._waiters:
+            size, future = self._waiters[0]
+            if future.done():
+                # cancelled, but not removed by its waiter yet
+                self._waiters.popleft()
+                continue
+            if self._in_use + size > self._limit:
+                return
+            self._waiters.popleft()
+            self._grant(size)
+            future.set_result(None)
+
+
+@asynccontextmanager
+async def byte_budget(limit: Optional[int] = DEFAULT_MEMORY_BUDGET) -> AsyncIterator[Optional[ByteBudget]]:
+    """
+    share the budget of 'limit' bytes in current context, unlimited if None
+    """
+    budget = ByteBudget(limit) if limit is not None else None
+    token = _BYTE_BUDGET.set(budget)
+    try:
+        yield budget
+    finally:
+        _BYTE_BUDGET.reset(token)
+
+
+@asynccontextmanager
+async def reserve_bytes(size: int) -> AsyncIterator[None]:
+    """
+    hold 'size' bytes of the budget in current context, if any
+    """
+    budget = _BYTE_BUDGET.get()
+    if budget is None:
+        yield
+        return
+
+    reserved = await budget.acquire(size)
+    try:
+        yield
+    finally:
+        budget.release(reserved)
@@ -0,0 +1,51 @@
+"""
+Chunk size of stream reads by kind of resource
+
+a read of stream returns at most the chunk size, 'CHUNK_SIZE' by default,
+though aiohttp returns only the data already received, which is far smaller usually
+within 'override_chunk_sizes', the given kinds of resource use their own chunk size instead
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Mapping, Optional
+
+from ..constants import CHUNK_SIZE, RESOURCE_KINDS, SMALL_RESOURCE_SIZE
+
+
+__all__ = ['get_chunk_size', 'is_small_resource', 'override_chunk_sizes']
+
+
+_CHUNK_SIZES: ContextVar[Dict[str, int]] = ContextVar(
+    'chunk_sizes',
+    default={}
+)
+
+
+@contextmanager
+def override_chunk_sizes(overrides: Mapping[str, int]) -> Iterator[Dict[str, int]]:
+    """
+    fix the chunk size of given kinds of resource in current context
+    """
+    for kind, size in overrides.items():
+        if kind not in RESOURCE_KINDS:
+            raise ValueError(f'Unknown resource kind: {kind}')
+        if size <= 0:
+            raise ValueError(f'Chunk size of {kind} should be positive: {size}')
+    sizes = {**_CHUNK_SIZES.get(), **overrides}
+    token = _CHUNK_SIZES.set(sizes)
+    try:
+        yield sizes
+    finally:
+        _CHUNK_SIZES.reset(token)
+
+
+def get_chunk_size(kind: Optional[str]) -> int:
+    chunk_size = _CHUNK_SIZES.get().get(kind) if kind is not None else None
+    return chunk_size if chunk_size is not None else CHUNK_SIZE
+
+
+def is_small_resource(content_length: Optional[int]) -> bool:
+    """
+    without 'Content-Length', e.g. chunked transfer encoding, the size is unknown
+    """
+    return content_length is not None and content_length <= SMALL_RESOURCE_SIZE
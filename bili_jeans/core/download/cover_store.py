@@ -0,0 +1,108 @@
+"""
+Content-addressed store of cover images
+
+pages of one video share the same cover,
+so every cover is downloaded once by URL, stored once by content hash,
+and exported to each page's location as hard link
+"""
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Set
+import uuid
+
+import aiofile
+
+from .media_store import materialize
+from .store_index import StoreIndex
+from ..constants import FILE_EXT_JPG, HEADERS
+from ..http import client_session
+
+
+logger = logging.getLogger(__name__)
+
+
+COVER_STORE_DIRNAME = '.covers'
+COVER_STORE_INDEX_FILENAME = 'index.jsonl'
+COVER_STORE_OBJECTS_DIRNAME = 'objects'
+
+
+class CoverStore(object):
+    """
+    layout under the given directory,
+    .covers/index.jsonl                     URL -> digest, ETag and Last-Modified
+    .covers/objects/<digest[:2]>/<digest>.jpg   cover content
+    in a run, each URL is requested at most once,
+    the following runs refresh them by conditional GET
+    the index is shared by the processes on the directory, see 'StoreIndex'
+    """
+
+    def __init__(self, dir_path: Path) -> None:
+        self._root_p = dir_path.joinpath(COVER_STORE_DIRNAME)
+        self._index = StoreIndex(self._root_p.joinpath(COVER_STORE_INDEX_FILENAME))
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refreshed_urls: Set[str] = set()
+
+    async def export(self, url: str, file_p: Path) -> None:
+        """
+        materialize the cover of URL to the given path
+        """
+        object_p = await self.fetch(url)
+        materialize(object_p, file_p)
+
+    async def fetch(self, url: str) -> Path:
+        """
+        return the path of stored cover content
+        """
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            entry = self._index.load().get(url)
+            object_p = self._get_object_path(entry['digest']) if entry is not None else None
+            if url in self._refreshed_urls and object_p is not None:
+                return object_p
+
+            headers = dict(HEADERS)
+            if entry is not None and object_p is not None and object_p.exists():
+                if entry.get('etag'):
+                    headers.update({'If-None-Match': entry['etag']})
+                if entry.get('last_modified'):
+                    headers.update({'If-Modified-Since': entry['last_modified']})
+
+            async with client_session() as session:
+                async with session.get(url, headers=headers) as resp:
+                    if resp.status == 304 and object_p is not None:
+                        logger.info(f'Cover not modified: {url}')
+                        self._refreshed_urls.add(url)
+                        return object_p
+                    resp.raise_for_status()
+                    content = await resp.read()
+                    etag = resp.headers.get('ETag')
+                    last_modified = resp.headers.get('Last-Modified')
+
+            digest = hashlib.sha256(content).hexdigest()
+            object_p = self._get_object_path(digest)
+            if not object_p.exists():
+                await self._write_atomically(object_p, content)
+            self._index.append(url, {
+                'digest': digest,
+                'etag': etag,
+                'last_modified': last_modified
+            })
+            self._refreshed_urls.add(url)
+            return object_p
+
+    def _get_object_path(self, digest: str) -> Path:
+        return self._root_p.joinpath(
+            COVER_STORE_OBJECTS_DIRNAME,
+            digest[:2],
+            f'{digest}{FILE_EXT_JPG}'
+        )
+
+    @staticmethod
+    async def _write_atomically(file_p: Path, content: bytes) -> None:
+        file_p.parent.mkdir(parents=True, exist_ok=True)
+        tmp_p = file_p.with_name(f'{file_p.name}.{uuid.uuid4().hex}.tmp')
+        async with aiofile.async_open(str(tmp_p), 'wb') as afp:
+            await afp.write(content)
+        tmp_p.replace(file_p)
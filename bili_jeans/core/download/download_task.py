@@ -2,55 +2,153 @@
 Download resources to local
 """
 from abc import ABC, abstractmethod
+import asyncio
 from pathlib import Path
+from typing import cast, List, Optional, Tuple
+from xml.etree.ElementTree import Element, XMLPullParser
 
-import aiofile
 import aiohttp
 
-from ..constants import CHUNK_SIZE, HEADERS
-from ..utils import convert_to_srt
+from .byte_budget import reserve_bytes
+from .chunk_size import get_chunk_size, is_small_resource
+from .cover_store import CoverStore
+from .media_store import get_media_store
+from .storage_sink import get_storage_sink, SinkWriter
+from ..constants import (
+    FILE_EXT_IDX,
+    FRAME_SIZE,
+    HEADERS,
+    RESOURCE_KIND_AUDIO,
+    RESOURCE_KIND_COVER,
+    RESOURCE_KIND_DANMAKU,
+    RESOURCE_KIND_SUBTITLE,
+    RESOURCE_KIND_VIDEO
+)
+from ..http import client_session
+from ..integrity import get_digest_log, StreamDigest, validate_mp4_boxes
+from ..utils import (
+    ContentDecoder,
+    convert_to_srt,
+    convert_to_xml,
+    decode_danmaku_segment,
+    SeekableGzipEncoder
+)
 
 
 class BaseCoroutineDownloadTask(ABC):
+    """
+    'kind' of resource decides the chunk size of streaming,
+    and whether the stream is validated as MP4
+    the files are written to the storage sink of current context, the local filesystem by default
+    """
 
     def __init__(
         self,
         url: str,
         file: str,
-        is_stream: bool = True
+        is_stream: bool = True,
+        kind: Optional[str] = None
     ) -> None:
         self._url = url
         self._file = file
         self._file_p = Path(file)
         self._is_stream = is_stream
+        self._kind = kind
+        self._digest: Optional[StreamDigest] = None
 
     async def run(self) -> None:
-        if self._is_stream:
-            await self.download_stream()
-        else:
+        if not self._is_stream:
             await self.download()
+            return
+        store = get_media_store()
+        if (
+            store is not None
+            and get_storage_sink().is_local
+            and self._kind in (RESOURCE_KIND_AUDIO, RESOURCE_KIND_VIDEO)
+        ):
+            await store.export(self)
+        else:
+            await self.download_stream()
 
     async def download(self) -> None:
         content = await self._request()
         content = self.post_process_content(content)
-        self._file_p.parent.mkdir(parents=True, exist_ok=True)
-        async with aiofile.async_open(self._file, 'wb') as afp:
-            await afp.write(content)
+        async with get_storage_sink().open(self._file_p) as writer:
+            await writer.write(content)
 
     async def download_stream(self) -> None:
-        async with aiohttp.ClientSession() as session:
+        digest_log = get_digest_log()
+        self._digest = await self.download_stream_to(self._file_p, hashing=digest_log is not None)
+        if digest_log is not None:
+            digest_log.record(self._file_p, self._digest, self._url)
+
+    async def download_stream_to(self, file_p: Path, hashing: bool = True) -> StreamDigest:
+        """
+        download the stream to the given file, and return its verified digest
+        without 'hashing', the digest only counts the bytes for verifying the size
+        """
+        async with client_session() as session:
             async with session.get(
                 self._url,
                 headers=HEADERS
             ) as resp:
-                self._file_p.parent.mkdir(parents=True, exist_ok=True)
+                content_length = resp.content_length
+                digest = StreamDigest(hashing)
+                sink = get_storage_sink()
+                try:
+                    async with sink.open(file_p) as writer:
+                        if is_small_resource(content_length):
+                            await self._write_at_once(resp, writer, digest, cast(int, content_length))
+                        else:
+                            await self._write_chunked(resp, writer, digest, content_length)
+                        # before the writer is closed, so the incomplete stream isn't published
+                        self._verify_size(resp, digest)
+                    if sink.is_local and self._kind in (RESOURCE_KIND_AUDIO, RESOURCE_KIND_VIDEO):
+                        await asyncio.to_thread(validate_mp4_boxes, file_p)
+                except BaseException:
+                    # don't leave the broken file for muxing
+                    if sink.is_local:
+                        file_p.unlink(missing_ok=True)
+                    raise
+        return digest
+
+    @staticmethod
+    def _verify_size(resp: aiohttp.ClientResponse, digest: StreamDigest) -> None:
+        if 'Content-Encoding' not in resp.headers:
+            # otherwise 'Content-Length' is the size before decoding
+            digest.verify_size(resp.content_length)
+
+    async def _write_at_once(
+        self,
+        resp: aiohttp.ClientResponse,
+        writer: SinkWriter,
+        digest: StreamDigest,
+        content_length: int
+    ) -> None:
+        async with reserve_bytes(content_length):
+            content = await resp.read()
+            digest.update(content)
+            await writer.write(content)
 
-                async with aiofile.async_open(self._file, 'wb') as afp:
-                    async for chunk_data in resp.content.iter_chunked(CHUNK_SIZE):
-                        await afp.write(chunk_data)  # type: ignore[attr-defined]
+    async def _write_chunked(
+        self,
+        resp: aiohttp.ClientResponse,
+        writer: SinkWriter,
+        digest: StreamDigest,
+        content_length: Optional[int]
+    ) -> None:
+        chunk_size = get_chunk_size(self._kind)
+        while True:
+            chunk_data = await resp.content.read(chunk_size)
+            if not chunk_data:
+                break
+            # the chunk is held until being written, and the next one isn't read before it's reserved
+            async with reserve_bytes(len(chunk_data)):
+                digest.update(chunk_data)
+                await writer.write(chunk_data)
 
     async def _request(self) -> bytes:
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             async with session.get(
                 self._url,
                 headers=HEADERS
@@ -61,19 +159,32 @@ class BaseCoroutineDownloadTask(ABC):
     def post_process_content(self, content: bytes) -> bytes:
         pass
 
+    @property
+    def url(self) -> str:
+        return self._url
+
     @property
     def file_path(self) -> Path:
         return self._file_p
 
+    @property
+    def digest(self) -> Optional[StreamDigest]:
+        """
+        digest of the downloaded stream, None before being downloaded in streaming
+        it's hashed only when digests are recorded, otherwise it only counts the bytes
+        """
+        return self._digest
+
 
 class StreamDownloadTask(BaseCoroutineDownloadTask):
 
     def __init__(
         self,
         url: str,
-        file: str
+        file: str,
+        kind: Optional[str] = None
     ) -> None:
-        super().__init__(url, file, is_stream=True)
+        super().__init__(url, file, is_stream=True, kind=kind)
 
     def post_process_content(self, content: bytes) -> bytes:
         return content
@@ -86,7 +197,164 @@ class SRTSubtitleDownloadTask(BaseCoroutineDownloadTask):
         url: str,
         file: str
     ) -> None:
-        super().__init__(url, file, is_stream=False)
+        super().__init__(url, file, is_stream=False, kind=RESOURCE_KIND_SUBTITLE)
 
     def post_process_content(self, content: bytes) -> bytes:
         return convert_to_srt(content)
+
+
+class DanmakuDownloadTask(BaseCoroutineDownloadTask):
+    """
+    danmaku XML is responded with compressed body,
+    which is decoded in streaming for validating its completeness and well-formedness
+    when 'compress' is True, the content is stored as seekable gzip with a frame index
+    """
+
+    def __init__(
+        self,
+        url: str,
+        file: str,
+        compress: bool = False
+    ) -> None:
+        super().__init__(url, file, is_stream=True, kind=RESOURCE_KIND_DANMAKU)
+        self._compress = compress
+
+    async def download_stream(self) -> None:
+        # keep the raw body, for checking it against the declared 'Content-Encoding'
+        async with aiohttp.ClientSession(auto_decompress=False) as session:
+            async with session.get(
+                self._url,
+                headers=HEADERS
+            ) as resp:
+                decoder = ContentDecoder(resp.headers.get('Content-Encoding'))
+                parser: XMLPullParser = XMLPullParser(events=('end',))
+                encoder: Optional[SeekableGzipEncoder] = (
+                    SeekableGzipEncoder(FRAME_SIZE) if self._compress else None
+                )
+                sink = get_storage_sink()
+                idx_file_p = Path(f'{self._file}{FILE_EXT_IDX}')
+
+                try:
+                    async with sink.open(self._file_p) as afp:
+                        chunk_size = get_chunk_size(self._kind)
+                        async for chunk_data in resp.content.iter_chunked(chunk_size):
+                            content = decoder.decompress(chunk_data)
+                            await self._write(afp, parser, encoder, content)
+                        await self._write(afp, parser, encoder, decoder.flush())
+                        if encoder is not None:
+                            await afp.write(encoder.flush())
+                        # raise ParseError if the XML document is incomplete or malformed
+                        parser.close()
+
+                    if encoder is not None:
+                        async with sink.open(idx_file_p) as afp:
+                            await afp.write(encoder.dump_index())
+                except BaseException:
+                    # don't leave the broken file, or the compressed one without its index
+                    if sink.is_local:
+                        self._file_p.unlink(missing_ok=True)
+                        idx_file_p.unlink(missing_ok=True)
+                    raise
+
+    @staticmethod
+    async def _write(
+        afp: SinkWriter,
+        parser: XMLPullParser,
+        encoder: Optional[SeekableGzipEncoder],
+        content: bytes
+    ) -> None:
+        if not content:
+            return
+        parser.feed(content)
+        # only well-formedness matters, release the parsed elements
+        for event in parser.read_events():
+            _, element = cast(Tuple[str, Element], event)
+            element.clear()
+        if encoder is not None:
+            content = encoder.feed(content)
+        if content:
+            await afp.write(content)
+
+    def post_process_content(self, content: bytes) -> bytes:
+        return content
+
+
+class SegmentedDanmakuDownloadTask(BaseCoroutineDownloadTask):
+    """
+    fetch all of protobuf danmaku segments concurrently,
+    and store them as the same XML format of legacy danmaku API
+    """
+
+    def __init__(
+        self,
+        cid: int,
+        urls: List[str],
+        file: str,
+        compress: bool = False
+    ) -> None:
+        super().__init__(urls[0] if urls else '', file, is_stream=False, kind=RESOURCE_KIND_DANMAKU)
+        self._cid = cid
+        self._urls = urls
+        self._compress = compress
+
+    async def download(self) -> None:
+        content = await self._request()
+        content = self.post_process_content(content)
+        sink = get_storage_sink()
+        if not self._compress:
+            async with sink.open(self._file_p) as afp:
+                await afp.write(content)
+            return
+
+        encoder = SeekableGzipEncoder(FRAME_SIZE)
+        async with sink.open(self._file_p) as afp:
+            await afp.write(encoder.feed(content) + encoder.flush())
+        async with sink.open(Path(f'{self._file}{FILE_EXT_IDX}')) as afp:
+            await afp.write(encoder.dump_index())
+
+    async def _request(self) -> bytes:
+        async with client_session() as session:
+            segments = await asyncio.gather(*[
+                self._request_segment(session, url) for url in self._urls
+            ])
+        return convert_to_xml(
+            self._cid,
+            [elem for segment in segments for elem in decode_danmaku_segment(segment)]
+        )
+
+    @staticmethod
+    async def _request_segment(
+        session: aiohttp.ClientSession,
+        url: str
+    ) -> bytes:
+        async with session.get(
+            url,
+            headers=HEADERS
+        ) as resp:
+            resp.raise_for_status()
+            return await resp.read()
+
+    def post_process_content(self, content: bytes) -> bytes:
+        return content
+
+
+class CoverDownloadTask(BaseCoroutineDownloadTask):
+    """
+    get cover from the content-addressed store,
+    and link it to the given file
+    """
+
+    def __init__(
+        self,
+        url: str,
+        file: str,
+        cover_store: CoverStore
+    ) -> None:
+        super().__init__(url, file, is_stream=False, kind=RESOURCE_KIND_COVER)
+        self._cover_store = cover_store
+
+    async def download(self) -> None:
+        await self._cover_store.export(self._url, self._file_p)
+
+    def post_process_content(self, content: bytes) -> bytes:
+        return content
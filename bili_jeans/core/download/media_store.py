@@ -0,0 +1,173 @@
+"""
+Content-addressed store of video and audio streams
+
+re-uploads and overlapping collections refer to the same stream under different pages,
+so every stream is stored once by its SHA-256, and materialized to each page's location as link
+identical streams are detected before downloading, by the path of URL and the size stored for it
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+import fcntl
+import logging
+import os
+from pathlib import Path
+import shutil
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+from urllib.parse import urlparse
+import uuid
+
+from .store_index import StoreIndex
+from ..integrity import get_digest_log, record_digests
+
+if TYPE_CHECKING:
+    from .download_task import BaseCoroutineDownloadTask
+
+
+__all__ = ['get_media_store', 'materialize', 'MediaStore', 'media_store']
+
+
+logger = logging.getLogger(__name__)
+
+
+MEDIA_STORE_DIRNAME = '.media'
+MEDIA_STORE_INDEX_FILENAME = 'index.jsonl'
+MEDIA_STORE_OBJECTS_DIRNAME = 'objects'
+MEDIA_STORE_TMP_DIRNAME = 'tmp'
+
+# ioctl of Linux cloning file by sharing its extents, e.g. on Btrfs and XFS
+FICLONE = 0x40049409
+
+_MEDIA_STORE: ContextVar[Optional['MediaStore']] = ContextVar(
+    'media_store',
+    default=None
+)
+
+
+class MediaStore(object):
+    """
+    layout under the given directory,
+    .media/index.jsonl                          URL path -> digest, size and file extension
+    .media/objects/<digest[:2]>/<digest><ext>   stream content
+    the query of stream URL is signed with expiry, so only its path identifies the stream
+    the index is shared by the processes on the directory, see 'StoreIndex'
+    """
+
+    def __init__(self, dir_path: Path) -> None:
+        self._root_p = dir_path.joinpath(MEDIA_STORE_DIRNAME)
+        self._index = StoreIndex(self._root_p.joinpath(MEDIA_STORE_INDEX_FILENAME))
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def export(self, task: 'BaseCoroutineDownloadTask') -> None:
+        """
+        materialize the stream of task to its file, downloading it when it isn't stored
+        """
+        object_p = await self.fetch(task)
+        materialize(object_p, task.file_path)
+
+    async def fetch(self, task: 'BaseCoroutineDownloadTask') -> Path:
+        """
+        return the path of stored stream content
+        """
+        key = self.get_key(task.url)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._index.load().get(key)
+            if entry is not None:
+                object_p = self._get_object_path(entry['digest'], entry['ext'])
+                if object_p.exists() and object_p.stat().st_size == entry['size']:
+                    logger.info(f'Stream is stored already: {key}')
+                    self._record_digest(task, entry)
+                    return object_p
+
+            tmp_p = self._root_p.joinpath(
+                MEDIA_STORE_TMP_DIRNAME,
+                f'{uuid.uuid4().hex}{task.file_path.suffix}'
+            )
+            # the temporary file isn't the one recorded for scrubbing
+            with record_digests(None):
+                digest = await task.download_stream_to(tmp_p)
+            object_p = self._get_object_path(digest.sha256, task.file_path.suffix)
+            if object_p.exists():
+                # the same content from another URL
+                logger.info(f'Stream is deduplicated by content: {key}')
+                tmp_p.unlink()
+            else:
+                object_p.parent.mkdir(parents=True, exist_ok=True)
+                tmp_p.replace(object_p)
+
+            entry = {
+                'digest': digest.sha256,
+                'digests': digest.hexdigests(),
+                'size': digest.size,
+                'ext': task.file_path.suffix
+            }
+            self._index.append(key, entry)
+            self._record_digest(task, entry)
+            return object_p
+
+    @staticmethod
+    def get_key(url: str) -> str:
+        """
+        the host is one of CDN mirrors, which doesn't matter either
+        """
+        return urlparse(url).path
+
+    def _get_object_path(self, digest: str, ext: str) -> Path:
+        return self._root_p.joinpath(
+            MEDIA_STORE_OBJECTS_DIRNAME,
+            digest[:2],
+            f'{digest}{ext}'
+        )
+
+    @staticmethod
+    def _record_digest(task: 'BaseCoroutineDownloadTask', entry: Dict) -> None:
+        digest_log = get_digest_log()
+        if digest_log is not None:
+            digest_log.record_hexdigests(task.file_path, entry['size'], entry['digests'], task.url)
+
+
+def materialize(object_p: Path, file_p: Path) -> None:
+    """
+    link the stored object to the given path,
+    by hard link, or by reflink when hard link isn't supported, e.g. across devices,
+    otherwise copy it
+    """
+    file_p.parent.mkdir(parents=True, exist_ok=True)
+    if file_p.exists():
+        if file_p.samefile(object_p):
+            return
+        file_p.unlink()
+    try:
+        os.link(object_p, file_p)
+        return
+    except OSError:
+        pass
+    try:
+        _reflink(object_p, file_p)
+    except OSError:
+        # e.g. file system doesn't support any link
+        file_p.unlink(missing_ok=True)
+        shutil.copyfile(object_p, file_p)
+
+
+def _reflink(src_p: Path, dst_p: Path) -> None:
+    with src_p.open('rb') as src, dst_p.open('wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def get_media_store() -> Optional[MediaStore]:
+    return _MEDIA_STORE.get()
+
+
+@contextmanager
+def media_store(dir_path: Optional[Path]) -> Iterator[Optional[MediaStore]]:
+    """
+    store the streams downloaded in current context under 'dir_path', disabled if None
+    """
+    store = MediaStore(dir_path) if dir_path is not None else None
+    token = _MEDIA_STORE.set(store)
+    try:
+        yield store
+    finally:
+        _MEDIA_STORE.reset(token)
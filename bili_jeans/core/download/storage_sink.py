@@ -0,0 +1,387 @@
+"""
+Storage sinks of downloaded resources
+
+by default, resources are written to the local filesystem as before,
+within 'storage_sink' of an S3-compatible bucket, e.g. MinIO,
+streams are uploaded in parts concurrently while being downloaded, without a local copy
+"""
+from abc import ABC, abstractmethod
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+import logging
+import os
+from pathlib import Path
+from typing import cast, AsyncContextManager, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode, urlparse
+import uuid
+from xml.etree.ElementTree import Element, fromstring, SubElement, tostring
+
+import aiofile
+import aiohttp
+from yarl import URL
+
+from ..http import client_session
+from ..utils import sign_request
+
+
+__all__ = [
+    'create_storage_sink',
+    'FileSystemSink',
+    'get_storage_sink',
+    'S3Sink',
+    'SinkWriter',
+    'StorageSink',
+    'storage_sink'
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+SINK_SCHEME_FILE = 'file'
+SINK_SCHEME_S3 = 's3'
+
+FILE_SINK_TMP_SUFFIX = '.tmp'
+
+DEFAULT_S3_REGION = 'us-east-1'
+# S3 rejects the parts smaller than 5 MiB, except the last one
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_PART_SIZE = 8 * 1024 * 1024
+S3_UPLOAD_CONCURRENCY = 4
+
+
+class SinkWriter(ABC):
+
+    @abstractmethod
+    async def write(self, data: bytes) -> None:
+        pass
+
+
+class StorageSink(ABC):
+    """
+    'is_local' tells whether the written files are readable locally,
+    e.g. for muxing, linking and validating them afterward
+    """
+
+    is_local: bool = False
+
+    @abstractmethod
+    def open(self, file_p: Path) -> AsyncContextManager[SinkWriter]:
+        """
+        async context manager of a writer to the given path,
+        which is published only when exiting without exception,
+        otherwise the existing file or object of the path is kept as is
+        """
+
+
+class FileSystemSink(StorageSink):
+    """
+    the file is written to a temporary one beside it, which replaces the file on success,
+    so the existing file isn't truncated in place, which may be linked to the others, e.g. stored media
+    """
+
+    is_local = True
+
+    @asynccontextmanager
+    async def open(self, file_p: Path) -> AsyncIterator[SinkWriter]:
+        file_p.parent.mkdir(parents=True, exist_ok=True)
+        tmp_p = file_p.with_name(f'.{file_p.name}.{uuid.uuid4().hex}{FILE_SINK_TMP_SUFFIX}')
+        try:
+            async with aiofile.async_open(str(tmp_p), 'wb') as afp:
+                yield cast(SinkWriter, afp)
+        except BaseException:
+            tmp_p.unlink(missing_ok=True)
+            raise
+        tmp_p.replace(file_p)
+
+
+class S3Sink(StorageSink):
+    """
+    the object key is the path relative to 'dir_path', under 'prefix'
+    the requests are path-style, which MinIO and the other compatible servers accept,
+    and signed by AWS Signature Version 4
+    at most 'concurrency' parts are being uploaded, shared by the streams written to the sink,
+    besides them, each stream buffers less than a part of 'part_size' in memory
+    the parts are capped by the slots instead of byte budget, since the buffers held while waiting for budget
+    could exhaust it together, so in each process the sink holds less than ('concurrency' + streams) parts
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        dir_path: Path,
+        access_key: str,
+        secret_key: str,
+        prefix: str = '',
+        region: str = DEFAULT_S3_REGION,
+        part_size: int = S3_PART_SIZE,
+        concurrency: int = S3_UPLOAD_CONCURRENCY
+    ) -> None:
+        if part_size < S3_MIN_PART_SIZE:
+            raise ValueError(f'Part size should be at least {S3_MIN_PART_SIZE}: {part_size}')
+        if concurrency < 1:
+            raise ValueError(f'Concurrency of uploading parts should be positive: {concurrency}')
+        # yarl drops the default port, which isn't in 'Host' header either
+        self._endpoint = str(URL(endpoint)).rstrip('/')
+        self._bucket = bucket
+        self._dir_p = dir_path
+        self._prefix = prefix.strip('/')
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._region = region
+        self._part_size = part_size
+        self._concurrency = concurrency
+        self._upload_slots = asyncio.Semaphore(concurrency)
+
+    @property
+    def part_size(self) -> int:
+        return self._part_size
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency
+
+    @property
+    def upload_slots(self) -> asyncio.Semaphore:
+        """
+        slots of the parts being uploaded, shared by the writers
+        """
+        return self._upload_slots
+
+    @asynccontextmanager
+    async def open(self, file_p: Path) -> AsyncIterator[SinkWriter]:
+        writer = S3MultipartWriter(self, self.get_key(file_p))
+        try:
+            yield writer
+            await writer.commit()
+        except BaseException:
+            await writer.abort()
+            raise
+
+    def get_key(self, file_p: Path) -> str:
+        try:
+            key = file_p.resolve().relative_to(self._dir_p.resolve()).as_posix()
+        except ValueError:
+            raise ValueError(f'File {file_p} is out of directory {self._dir_p}')
+        return f'{self._prefix}/{key}' if self._prefix else key
+
+    async def put_object(self, key: str, data: bytes) -> None:
+        async with self._request('PUT', key, data=data):
+            pass
+
+    async def create_multipart_upload(self, key: str) -> str:
+        async with self._request('POST', key, {'uploads': ''}) as resp:
+            root = fromstring(await resp.read())
+        upload_id = _find_text(root, 'UploadId')
+        if not upload_id:
+            raise ValueError(f'No upload ID of multipart upload responded: {key}')
+        return upload_id
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """
+        return ETag of the part
+        """
+        query = {'partNumber': str(part_number), 'uploadId': upload_id}
+        async with self._request('PUT', key, query, data=data) as resp:
+            etag = resp.headers.get('ETag')
+        if not etag:
+            raise ValueError(f'No ETag of part {part_number} responded: {key}')
+        return etag
+
+    async def complete_multipart_upload(
+        self,
+        key: str,
+        upload_id: str,
+        parts: List[Tuple[int, str]]
+    ) -> None:
+        root = Element('CompleteMultipartUpload')
+        for part_number, etag in parts:
+            part = SubElement(root, 'Part')
+            SubElement(part, 'PartNumber').text = str(part_number)
+            SubElement(part, 'ETag').text = etag
+        async with self._request('POST', key, {'uploadId': upload_id}, data=tostring(root)) as resp:
+            content = await resp.read()
+        # the failure could be responded with status 200, after the parts are being combined
+        result = fromstring(content)
+        if _local_name(result.tag) == 'Error':
+            raise ValueError(
+                f'Failed to complete multipart upload of {key}: '
+                f'{_find_text(result, "Code")} {_find_text(result, "Message")}'
+            )
+
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        async with self._request('DELETE', key, {'uploadId': upload_id}):
+            pass
+
+    @asynccontextmanager
+    async def _request(
+        self,
+        method: str,
+        key: str,
+        query: Optional[Dict[str, str]] = None,
+        data: Optional[bytes] = None
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        url = f'{self._endpoint}/{quote(self._bucket)}/{quote(key, safe="/-_.~")}'
+        if query:
+            url = f'{url}?{urlencode(sorted(query.items()), quote_via=quote, safe="-_.~")}'
+        headers = sign_request(method, url, self._access_key, self._secret_key, self._region)
+        async with client_session() as session:
+            # the URL is encoded already as signed
+            async with session.request(
+                method,
+                URL(url, encoded=True),
+                headers=headers,
+                data=data
+            ) as resp:
+                resp.raise_for_status()
+                yield resp
+
+
+class S3MultipartWriter(SinkWriter):
+    """
+    the stream is buffered up to a part, then uploaded in background,
+    writing waits for a free slot of the sink when 'concurrency' parts are being uploaded
+    the stream smaller than a part is put as one object instead
+    """
+
+    def __init__(self, sink: S3Sink, key: str) -> None:
+        self._sink = sink
+        self._key = key
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._etags: Dict[int, str] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        part_size = self._sink.part_size
+        while len(self._buffer) >= part_size:
+            await self._upload_part(part_size)
+
+    async def commit(self) -> None:
+        if self._upload_id is None:
+            await self._sink.put_object(self._key, bytes(self._buffer))
+            self._buffer.clear()
+            return
+        if self._buffer:
+            await self._upload_part(len(self._buffer))
+        await asyncio.gather(*self._tasks)
+        await self._sink.complete_multipart_upload(
+            self._key,
+            self._upload_id,
+            sorted(self._etags.items())
+        )
+
+    async def abort(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._upload_id is None:
+            return
+        try:
+            await self._sink.abort_multipart_upload(self._key, self._upload_id)
+        except aiohttp.ClientError:
+            # the uploaded parts are left for the lifecycle rule of bucket
+            logger.warning(f'Failed to abort multipart upload {self._upload_id} of {self._key}')
+
+    async def _upload_part(self, size: int) -> None:
+        """
+        the part is copied out of buffer only when a slot is acquired
+        """
+        self._raise_failure()
+        if self._upload_id is None:
+            self._upload_id = await self._sink.create_multipart_upload(self._key)
+        part_number = len(self._tasks) + 1
+        await self._sink.upload_slots.acquire()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        task = asyncio.create_task(self._run_part(self._upload_id, part_number, data))
+        # even if it's cancelled before being started
+        task.add_done_callback(lambda _: self._sink.upload_slots.release())
+        self._tasks.append(task)
+
+    async def _run_part(self, upload_id: str, part_number: int, data: bytes) -> None:
+        self._etags[part_number] = await self._sink.upload_part(
+            self._key,
+            upload_id,
+            part_number,
+            data
+        )
+
+    def _raise_failure(self) -> None:
+        """
+        fail the stream as soon as any of its parts failed
+        """
+        for task in self._tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise cast(BaseException, task.exception())
+
+
+def create_storage_sink(url: Optional[str], dir_path: Path) -> StorageSink:
+    """
+    'url' is one of,
+    None or 'file://'           the local filesystem
+    's3://<bucket>/<prefix>'    S3-compatible bucket, configured by the environment variables of AWS CLI,
+                                'AWS_ENDPOINT_URL', 'AWS_REGION', 'AWS_ACCESS_KEY_ID' and 'AWS_SECRET_ACCESS_KEY'
+    """
+    if url is None:
+        return FileSystemSink()
+    parsed = urlparse(url)
+    if parsed.scheme == SINK_SCHEME_FILE:
+        return FileSystemSink()
+    if parsed.scheme != SINK_SCHEME_S3:
+        raise ValueError(f'Unsupported storage sink: {url}')
+    if not parsed.netloc:
+        raise ValueError(f'Bucket of storage sink is required: {url}')
+
+    access_key = os.environ.get('AWS_ACCESS_KEY_ID')
+    secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    if not access_key or not secret_key:
+        raise ValueError('AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY are required by S3 storage sink')
+    region = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or DEFAULT_S3_REGION
+    endpoint = os.environ.get('AWS_ENDPOINT_URL') or f'https://s3.{region}.amazonaws.com'
+    return S3Sink(
+        endpoint,
+        parsed.netloc,
+        dir_path,
+        access_key,
+        secret_key,
+        prefix=parsed.path,
+        region=region
+    )
+
+
+_STORAGE_SINK: ContextVar[StorageSink] = ContextVar(
+    'storage_sink',
+    default=FileSystemSink()
+)
+
+
+def get_storage_sink() -> StorageSink:
+    return _STORAGE_SINK.get()
+
+
+@contextmanager
+def storage_sink(sink: StorageSink) -> Iterator[StorageSink]:
+    """
+    write the resources downloaded in current context to the given sink
+    """
+    token = _STORAGE_SINK.set(sink)
+    try:
+        yield sink
+    finally:
+        _STORAGE_SINK.reset(token)
+
+
+def _local_name(tag: str) -> str:
+    # S3 responds XML with namespace, the compatible servers may not
+    return tag.rsplit('}', 1)[-1]
+
+
+def _find_text(root: Element, name: str) -> Optional[str]:
+    for element in root.iter():
+        if _local_name(element.tag) == name:
+            return element.text
+    return None
@@ -0,0 +1,61 @@
+"""
+Index of content-addressed stores
+
+the index is append-only JSON lines, so processes sharing the directory can add entries concurrently,
+and each of them reads the lines appended by the others before looking up
+the latest entry of a key wins
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict
+
+
+__all__ = ['StoreIndex']
+
+
+logger = logging.getLogger(__name__)
+
+
+class StoreIndex(object):
+
+    def __init__(self, file_p: Path) -> None:
+        self._file_p = file_p
+        self._entries: Dict[str, Dict] = {}
+        self._offset = 0
+
+    @property
+    def file_path(self) -> Path:
+        return self._file_p
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        read the lines appended since the last load
+        """
+        if not self._file_p.exists():
+            return self._entries
+        with self._file_p.open('rb') as fp:
+            fp.seek(self._offset)
+            for line in fp:
+                if not line.endswith(b'\n'):
+                    # being appended by another process, read it next time
+                    break
+                self._offset += len(line)
+                try:
+                    record = json.loads(line)
+                    self._entries[record.pop('key')] = record
+                except (ValueError, AttributeError, KeyError):
+                    logger.warning(f'Ignore broken index entry in {self._file_p}')
+        return self._entries
+
+    def append(self, key: str, entry: Dict) -> None:
+        line = f'{json.dumps({"key": key, **entry}, ensure_ascii=False)}\n'.encode('utf-8')
+        self._file_p.parent.mkdir(parents=True, exist_ok=True)
+        # a single write with O_APPEND isn't interleaved with the others
+        fd = os.open(self._file_p, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        self._entries[key] = entry
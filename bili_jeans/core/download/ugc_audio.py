@@ -9,7 +9,7 @@ from .download_task import (
     BaseCoroutineDownloadTask,
     StreamDownloadTask
 )
-from ..constants import BitRateId, FILE_EXT_M4A
+from ..constants import BitRateId, FILE_EXT_M4A, RESOURCE_KIND_AUDIO
 from ..utils import filter_avail_quality_id
 from ..schemes import GetUGCPlayResponse, PageData
 from ..schemes.ugc_play import DashMediaItem, GetUGCPlayDataDash
@@ -51,7 +51,8 @@ def create_audio_task(
 
     download_task = StreamDownloadTask(
         url=url,
-        file=str(file_p)
+        file=str(file_p),
+        kind=RESOURCE_KIND_AUDIO
     )
     return download_task
 
@@ -2,26 +2,41 @@
 create download task for cover of UGC page
 """
 from pathlib import Path
+from typing import Optional
 
+from .cover_store import CoverStore
 from .download_task import (
     BaseCoroutineDownloadTask,
+    CoverDownloadTask,
     StreamDownloadTask
 )
-from ..constants import FILE_EXT_JPG
+from ..constants import FILE_EXT_JPG, RESOURCE_KIND_COVER
 from ..schemes import PageData
 
 
 def create_cover_task(
     page_data: PageData,
-    dir_path: Path
+    dir_path: Path,
+    cover_store: Optional[CoverStore] = None
 ) -> BaseCoroutineDownloadTask:
+    """
+    when cover store is given, the cover would be deduplicated
+    among pages and runs via the store
+    """
     url = page_data.cover
 
     filename = f'{page_data.bvid}/{page_data.cid}{FILE_EXT_JPG}'
     file_p = dir_path.joinpath(filename)
 
+    if cover_store is not None:
+        return CoverDownloadTask(
+            url=url,
+            file=str(file_p),
+            cover_store=cover_store
+        )
     download_task = StreamDownloadTask(
         url=url,
-        file=str(file_p)
+        file=str(file_p),
+        kind=RESOURCE_KIND_COVER
     )
     return download_task
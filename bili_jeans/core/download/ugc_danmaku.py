@@ -1,33 +1,85 @@
 """
 create download task for danmaku of UGC page
 """
+import math
 from pathlib import Path
+from typing import Dict, List
 from urllib.parse import urlencode, urlparse
 
 from .download_task import (
     BaseCoroutineDownloadTask,
+    DanmakuDownloadTask,
+    SegmentedDanmakuDownloadTask,
     StreamDownloadTask
 )
 from ..constants import (
+    DANMAKU_SEGMENT_DURATION,
+    FILE_EXT_GZ,
     FILE_EXT_XML,
-    URL_WEB_DANMAKU
+    RESOURCE_KIND_DANMAKU,
+    URL_WEB_DANMAKU,
+    URL_WEB_DANMAKU_SEGMENT
 )
 from ..schemes import PageData
 
 
 def create_danmaku_task(
     page_data: PageData,
-    dir_path: Path
+    dir_path: Path,
+    compress: bool = False,
+    segmented: bool = False
 ) -> BaseCoroutineDownloadTask:
+    """
+    when 'compress' is True, the danmaku would be validated
+    and stored as seekable gzip, with its frame index alongside
+    when 'segmented' is True, get danmaku from the protobuf API
+    which isn't limited by the maximum of legacy XML API
+    """
+    filename = f'{page_data.bvid}/{page_data.cid}{FILE_EXT_XML}'
+    if compress:
+        filename = f'{filename}{FILE_EXT_GZ}'
+    file_p = dir_path.joinpath(filename)
+
+    if segmented:
+        return SegmentedDanmakuDownloadTask(
+            cid=page_data.cid,
+            urls=_get_segment_urls(page_data),
+            file=str(file_p),
+            compress=compress
+        )
+
     url = urlparse(URL_WEB_DANMAKU)._replace(
         query=urlencode({'oid': page_data.cid})
     ).geturl()
 
-    filename = f'{page_data.bvid}/{page_data.cid}{FILE_EXT_XML}'
-    file_p = dir_path.joinpath(filename)
-
+    if compress:
+        return DanmakuDownloadTask(
+            url=url,
+            file=str(file_p),
+            compress=True
+        )
     download_task = StreamDownloadTask(
         url=url,
-        file=str(file_p)
+        file=str(file_p),
+        kind=RESOURCE_KIND_DANMAKU
     )
     return download_task
+
+
+def _get_segment_urls(page_data: PageData) -> List[str]:
+    """
+    one segment covers 6 minutes of the page, whose index starts from 1
+    """
+    segment_count = max(
+        math.ceil((page_data.duration or 0) / DANMAKU_SEGMENT_DURATION),
+        1
+    )
+    params: Dict = {'type': 1, 'oid': page_data.cid}
+    if page_data.aid is not None:
+        params.update({'pid': page_data.aid})
+    return [
+        urlparse(URL_WEB_DANMAKU_SEGMENT)._replace(
+            query=urlencode({**params, 'segment_index': segment_index})
+        ).geturl()
+        for segment_index in range(1, segment_count + 1)
+    ]
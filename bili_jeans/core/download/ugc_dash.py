@@ -0,0 +1,90 @@
+"""
+create download tasks for video and audio of UGC page
+which are chosen jointly by stream policy
+"""
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .download_task import BaseCoroutineDownloadTask, StreamDownloadTask
+from .ugc_video import create_video_task
+from ..constants import (
+    BitRateId,
+    CodecId,
+    FILE_EXT_M4A,
+    FILE_EXT_MP4,
+    QualityNumber,
+    RESOURCE_KIND_AUDIO,
+    RESOURCE_KIND_VIDEO
+)
+from ..schemes import GetUGCPlayResponse, PageData
+from ..selection import select_dash_streams, StreamPolicy
+
+
+logger = logging.getLogger(__name__)
+
+
+def create_dash_tasks(
+    page_data: PageData,
+    ugc_play: Optional[GetUGCPlayResponse],
+    dir_path: Path,
+    stream_policy: StreamPolicy
+) -> Tuple[
+    Optional[BaseCoroutineDownloadTask],
+    Optional[BaseCoroutineDownloadTask]
+]:
+    """
+    return video task and audio task
+    """
+    if ugc_play is None:
+        return None, None
+    if ugc_play.data is None:
+        logger.error(
+            f'No UGC play data for {page_data.cid} of {page_data.bvid}: '
+            f'[{ugc_play.code}] {ugc_play.message}'
+        )
+        return None, None
+    if ugc_play.data.dash is None:
+        # preview resource in durl has no separated audio
+        return create_video_task(page_data, ugc_play, dir_path), None
+
+    video, audio = select_dash_streams(ugc_play.data.dash, stream_policy)
+
+    video_task: Optional[BaseCoroutineDownloadTask] = None
+    if video is not None:
+        fmt_fields = [
+            QualityNumber.from_value(video.id_field).quality_name
+            if QualityNumber.is_valid(video.id_field) else f'{video.id_field}',
+            f'{video.width}x{video.height}',
+            CodecId.from_value(video.codecid).quality_name
+            if CodecId.is_valid(video.codecid) else f'{video.codecid}',
+            f'{video.frame_rate} fps',
+            f'{video.bandwidth} bps'
+        ]
+        logger.info(f'[Chosen video stream]: {" | ".join(fmt_fields)}')
+        video_task = StreamDownloadTask(
+            url=video.base_url,
+            file=str(dir_path.joinpath(f'{page_data.bvid}/{page_data.cid}{FILE_EXT_MP4}')),
+            kind=RESOURCE_KIND_VIDEO
+        )
+    else:
+        logger.error(f'No any UGC video data for {page_data.cid} of {page_data.bvid}')
+
+    audio_task: Optional[BaseCoroutineDownloadTask] = None
+    if audio is not None:
+        fmt_fields = [
+            audio.codecs,
+            BitRateId.from_value(audio.id_field).quality_name
+            if BitRateId.is_valid(audio.id_field) else f'{audio.id_field}',
+            f'{audio.bandwidth} bps'
+        ]
+        logger.info(f'[Chosen audio stream]: {" | ".join(fmt_fields)}')
+        audio_task = StreamDownloadTask(
+            url=audio.base_url,
+            file=str(dir_path.joinpath(f'{page_data.bvid}/{page_data.cid}{FILE_EXT_M4A}')),
+            kind=RESOURCE_KIND_AUDIO
+        )
+    else:
+        logger.error(f'No any UGC audio data for {page_data.cid} of {page_data.bvid}')
+
+    return video_task, audio_task
@@ -4,13 +4,14 @@ create download task for subtitle of UGC page
 import logging
 from pathlib import Path
 from typing import List, Optional
+from urllib.parse import urljoin
 
 from .download_task import (
     BaseCoroutineDownloadTask,
     StreamDownloadTask,
     SRTSubtitleDownloadTask
 )
-from ..constants import FILE_EXT_JSON, FILE_EXT_SRT
+from ..constants import FILE_EXT_JSON, FILE_EXT_SRT, RESOURCE_KIND_SUBTITLE
 from ..schemes import GetUGCPlayerResponse, PageData
 
 
@@ -34,14 +35,16 @@ def create_subtitle_tasks(
         return download_tasks
 
     for subtitle in ugc_player.data.subtitle.subtitles:
-        url = 'https:' + subtitle.subtitle_url
+        # protocol-relative URL by default
+        url = urljoin('https:', subtitle.subtitle_url)
         filename_wo_ext = f'{page_data.bvid}/{page_data.cid}.{subtitle.id_field}'
 
         raw_filename = f'{filename_wo_ext}{FILE_EXT_JSON}'
         raw_file_p = dir_path.joinpath(raw_filename)
         download_raw_task = StreamDownloadTask(
             url=url,
-            file=str(raw_file_p)
+            file=str(raw_file_p),
+            kind=RESOURCE_KIND_SUBTITLE
         )
         srt_filename = f'{filename_wo_ext}{FILE_EXT_SRT}'
         srt_file_p = dir_path.joinpath(srt_filename)
@@ -9,7 +9,8 @@ from .download_task import BaseCoroutineDownloadTask, StreamDownloadTask
 from ..constants import (
     CodecId,
     FILE_EXT_MP4,
-    QualityNumber
+    QualityNumber,
+    RESOURCE_KIND_VIDEO
 )
 from ..schemes import GetUGCPlayResponse, PageData
 from ..schemes.ugc_play import GetUGCPlayData, GetUGCPlayDataDash
@@ -58,7 +59,8 @@ def create_video_task(
 
     download_task = StreamDownloadTask(
         url=url,
-        file=str(file_p)
+        file=str(file_p),
+        kind=RESOURCE_KIND_VIDEO
     )
     return download_task
 
@@ -1,16 +1,22 @@
 """
 Factory on instance according to resource type
 """
+import asyncio
+import json
 import logging
+from pathlib import Path
 import re
-from typing import Optional
+from typing import Dict, List, Optional, Sequence
 from urllib.parse import urlparse
+import uuid
 
 import aiohttp
 from aiohttp import ClientResponse
 
 from .constants import HEADERS, TIMEOUT
+from .http import client_session
 from .schemes import WebViewMetaData
+from .utils.bvid import normalize_view_meta
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +31,41 @@ WEB_VIEW_URL_ID_TYPE_MAPPING = {
     WEB_VIEW_URL_UGC_BVID_PATTERN: ('bvid', str),
     WEB_VIEW_URL_UGC_AVID_PATTERN: ('aid', int)
 }
+SHORT_LINK_HOSTS = ('b23.tv', 'bili2233.cn')
+
+
+class ShortLinkCache(object):
+    """
+    persistent mapping from short link to the metadata of its destination
+    short links never change their destination, so no expiration
+    """
+
+    def __init__(self, file_p: Optional[Path] = None) -> None:
+        self._file_p = file_p
+        self._entries: Dict[str, Dict] = {}
+        if file_p is not None and file_p.exists():
+            try:
+                self._entries = json.loads(file_p.read_bytes())
+            except ValueError:
+                logger.warning(f'Ignore broken short link cache: {file_p}')
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, url: str) -> Optional[WebViewMetaData]:
+        entry = self._entries.get(_get_short_link_key(url))
+        return WebViewMetaData.model_validate(entry) if entry is not None else None
+
+    def set(self, url: str, metadata: WebViewMetaData) -> None:
+        self._entries[_get_short_link_key(url)] = metadata.model_dump(exclude_none=True)
+
+    def save(self) -> None:
+        if self._file_p is None:
+            return
+        self._file_p.parent.mkdir(parents=True, exist_ok=True)
+        tmp_p = self._file_p.with_name(f'{self._file_p.name}.{uuid.uuid4().hex}.tmp')
+        tmp_p.write_text(json.dumps(self._entries), encoding='utf-8')
+        tmp_p.replace(self._file_p)
 
 
 async def parse_web_view_url(url: str) -> WebViewMetaData:
@@ -36,7 +77,7 @@ async def parse_web_view_url(url: str) -> WebViewMetaData:
     """
     dest_url = url
     response: Optional[ClientResponse] = None
-    async with aiohttp.ClientSession() as session:
+    async with client_session() as session:
         try:
             async with session.get(
                 url,
@@ -53,17 +94,105 @@ async def parse_web_view_url(url: str) -> WebViewMetaData:
     if response is not None:
         dest_url = response.headers.get('location', url)
 
-    url_path = urlparse(dest_url).path
+    metadata = match_web_view_url(dest_url)
+    if metadata is not None:
+        return metadata
+    raise ValueError(
+        f'Invalid Url. source Url: {url}, destination Url: {dest_url}'
+    )
+
+
+def match_web_view_url(url: str) -> Optional[WebViewMetaData]:
+    """
+    extract metadata from the path of Url itself, without any request
+    """
+    url_path = urlparse(url).path
     for path_pattern in (WEB_VIEW_URL_UGC_BVID_PATTERN, WEB_VIEW_URL_UGC_AVID_PATTERN):
         search_result = path_pattern.search(url_path)
         if search_result:
-            metadata = WebViewMetaData()
             field_name, func_name = WEB_VIEW_URL_ID_TYPE_MAPPING[path_pattern]
-            metadata.__setattr__(
-                field_name,
-                func_name(search_result.group(1))
-            )
+            return WebViewMetaData.model_validate({field_name: func_name(search_result.group(1))})
+    return None
+
+
+def is_short_link(url: str) -> bool:
+    host = urlparse(url if '//' in url else f'//{url}').hostname or ''
+    return any(host == short_host or host.endswith(f'.{short_host}') for short_host in SHORT_LINK_HOSTS)
+
+
+async def resolve_web_view_url(
+    url: str,
+    cache: Optional[ShortLinkCache] = None
+) -> WebViewMetaData:
+    """
+    extract metadata with regex first, only short link is requested for its destination
+    unlike 'parse_web_view_url', the canonical Url isn't requested,
+    so a PGC resource declared by UGC Url isn't rejected here but by its view
+    """
+    metadata = match_web_view_url(url)
+    if metadata is not None:
+        return metadata
+    if not is_short_link(url):
+        return await parse_web_view_url(url)
+
+    if cache is not None:
+        metadata = cache.get(url)
+        if metadata is not None:
             return metadata
-    raise ValueError(
-        f'Invalid Url. source Url: {url}, destination Url: {dest_url}'
-    )
+    metadata = await parse_web_view_url(url if '//' in url else f'https://{url}')
+    if cache is not None:
+        cache.set(url, metadata)
+    return metadata
+
+
+async def resolve_web_view_urls(
+    urls: Sequence[str],
+    cache: Optional[ShortLinkCache] = None,
+    concurrency: int = 32
+) -> List[Optional[WebViewMetaData]]:
+    """
+    resolve Urls in batch, the unresolvable one is None
+    short links are requested concurrently, and each distinct one only once
+    both AV ID and BV ID of the resolved ones are filled
+    """
+    results: List[Optional[WebViewMetaData]] = [match_web_view_url(url) for url in urls]
+    pending: Dict[str, List[int]] = {}
+    for idx, (url, metadata) in enumerate(zip(urls, results)):
+        if metadata is None:
+            pending.setdefault(url, []).append(idx)
+    if not pending:
+        return [_normalize(metadata) for metadata in results]
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _resolve(url: str) -> Optional[WebViewMetaData]:
+        async with semaphore:
+            try:
+                return await resolve_web_view_url(url, cache)
+            except ValueError as e:
+                logger.warning(f'Resolve Url failed: {e}')
+                return None
+
+    async with client_session():
+        resolved = await asyncio.gather(*[_resolve(url) for url in pending])
+    for url, metadata in zip(pending, resolved):
+        for idx in pending[url]:
+            results[idx] = metadata
+    if cache is not None:
+        cache.save()
+    return [_normalize(metadata) for metadata in results]
+
+
+def _normalize(metadata: Optional[WebViewMetaData]) -> Optional[WebViewMetaData]:
+    if metadata is None:
+        return None
+    try:
+        return normalize_view_meta(metadata)
+    except ValueError as e:
+        logger.warning(f'Normalize resource ID failed: {e}')
+        return metadata
+
+
+def _get_short_link_key(url: str) -> str:
+    parsed = urlparse(url if '//' in url else f'//{url}')
+    return f'{parsed.hostname}{parsed.path.rstrip("/")}'
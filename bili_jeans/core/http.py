@@ -0,0 +1,54 @@
+"""
+Shared HTTP client layer
+
+by default, every caller opens its own client session as before,
+within 'shared_client_session', the callers reuse the same session
+(and its connection pool) in current context
+"""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+
+__all__ = ['client_session', 'shared_client_session']
+
+
+_SHARED_SESSION: ContextVar[Optional[aiohttp.ClientSession]] = ContextVar(
+    'shared_client_session',
+    default=None
+)
+
+
+@asynccontextmanager
+async def client_session() -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    yield the shared session if exists, else a temporary one
+    the shared session wouldn't be closed when exiting
+    """
+    session = _SHARED_SESSION.get()
+    if session is not None and not session.closed:
+        yield session
+        return
+
+    async with aiohttp.ClientSession() as session:
+        yield session
+
+
+@asynccontextmanager
+async def shared_client_session(
+    limit: int = 100
+) -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    :param limit: total number of simultaneous connections of the pool
+    :type limit: int
+    """
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=limit)
+    ) as session:
+        token = _SHARED_SESSION.set(session)
+        try:
+            yield session
+        finally:
+            _SHARED_SESSION.reset(token)
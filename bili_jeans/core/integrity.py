@@ -0,0 +1,222 @@
+"""
+Integrity of downloaded streams
+
+byte count is computed while the stream is being written, and digests as well when they are consumed,
+then checked against 'Content-Length', and the box structure of MP4 is walked cheaply,
+so a truncated or corrupted response fails its download instead of muxing later
+the digests are appended to a log under the directory, for later scrubbing jobs
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, ValidationError
+
+try:
+    import xxhash  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover
+    xxhash = None
+
+
+__all__ = [
+    'DigestLog',
+    'DigestRecord',
+    'get_digest_log',
+    'record_digests',
+    'StreamDigest',
+    'validate_mp4_boxes'
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+DIGEST_LOG_FILENAME = '.digests.jsonl'
+
+DIGEST_SHA256 = 'sha256'
+DIGEST_XXH3 = 'xxh3_128'
+
+# the first box of MP4 file, or of segment of fragmented MP4
+MP4_LEADING_BOX_TYPES = (b'ftyp', b'styp')
+MP4_BOX_HEADER_SIZE = 8
+MP4_LARGE_BOX_HEADER_SIZE = 16
+
+_DIGEST_LOG: ContextVar[Optional['DigestLog']] = ContextVar(
+    'digest_log',
+    default=None
+)
+
+
+class StreamDigest(object):
+    """
+    SHA-256 is computed as the key of content,
+    XXH3 is computed additionally when xxhash is installed, which is much cheaper to verify
+    without 'hashing', e.g. neither recorded nor deduplicated, only the bytes are counted
+    """
+
+    def __init__(self, hashing: bool = True) -> None:
+        self._size = 0
+        self._hashes: Dict[str, Any] = {}
+        if hashing:
+            self._hashes[DIGEST_SHA256] = hashlib.sha256()
+            if xxhash is not None:
+                self._hashes[DIGEST_XXH3] = xxhash.xxh3_128()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def sha256(self) -> str:
+        if DIGEST_SHA256 not in self._hashes:
+            raise ValueError('Digest of stream is not computed')
+        return self._hashes[DIGEST_SHA256].hexdigest()
+
+    def update(self, data: bytes) -> None:
+        self._size += len(data)
+        for hash_obj in self._hashes.values():
+            hash_obj.update(data)
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {name: hash_obj.hexdigest() for name, hash_obj in self._hashes.items()}
+
+    def verify_size(self, content_length: Optional[int]) -> None:
+        if content_length is not None and self._size != content_length:
+            raise ValueError(
+                f'Incomplete stream, {self._size} bytes received '
+                f'but Content-Length is {content_length}'
+            )
+
+
+def validate_mp4_boxes(file_p: Path) -> None:
+    """
+    the top-level boxes should cover the whole file exactly,
+    only their headers are read
+    the file not starting with MP4 box, e.g. FLV, is skipped
+    """
+    file_size = file_p.stat().st_size
+    with file_p.open('rb') as fp:
+        header = fp.read(MP4_BOX_HEADER_SIZE)
+        if len(header) < MP4_BOX_HEADER_SIZE or header[4:] not in MP4_LEADING_BOX_TYPES:
+            return
+
+        offset = 0
+        while offset < file_size:
+            fp.seek(offset)
+            header = fp.read(MP4_LARGE_BOX_HEADER_SIZE)
+            if len(header) < MP4_BOX_HEADER_SIZE:
+                raise ValueError(f'Truncated MP4 box header at {offset} of {file_p}')
+            box_size = int.from_bytes(header[:4], 'big')
+            box_type = header[4:8]
+            if box_size == 1:
+                if len(header) < MP4_LARGE_BOX_HEADER_SIZE:
+                    raise ValueError(f'Truncated MP4 box header at {offset} of {file_p}')
+                box_size = int.from_bytes(header[8:16], 'big')
+            elif box_size == 0:
+                # the last box extends to the end of file
+                box_size = file_size - offset
+            if box_size < MP4_BOX_HEADER_SIZE:
+                raise ValueError(f'Invalid size {box_size} of MP4 box {box_type!r} at {offset} of {file_p}')
+            if offset + box_size > file_size:
+                raise ValueError(
+                    f'Truncated MP4 box {box_type!r} at {offset} of {file_p}, '
+                    f'{box_size} bytes declared but {file_size - offset} bytes left'
+                )
+            offset += box_size
+
+
+class DigestRecord(BaseModel):
+
+    file: str                       # relative to the directory of log
+    size: int
+    digests: Dict[str, str]         # algorithm -> hex digest
+    url: Optional[str] = None
+    recorded_at: float              # Unix timestamp
+
+
+class DigestLog(object):
+    """
+    append-only JSON lines, so processes and nodes sharing the directory can record concurrently,
+    the latest record of a file wins
+    """
+
+    def __init__(self, dir_path: Path, file_p: Optional[Path] = None) -> None:
+        self._dir_p = dir_path
+        self._file_p = file_p if file_p is not None else dir_path.joinpath(DIGEST_LOG_FILENAME)
+
+    @property
+    def file_path(self) -> Path:
+        return self._file_p
+
+    def record(self, file_p: Path, digest: StreamDigest, url: Optional[str] = None) -> DigestRecord:
+        return self.record_hexdigests(file_p, digest.size, digest.hexdigests(), url)
+
+    def record_hexdigests(
+        self,
+        file_p: Path,
+        size: int,
+        digests: Dict[str, str],
+        url: Optional[str] = None
+    ) -> DigestRecord:
+        try:
+            file = file_p.resolve().relative_to(self._dir_p.resolve()).as_posix()
+        except ValueError:
+            file = str(file_p.resolve())
+        record = DigestRecord(
+            file=file,
+            size=size,
+            digests=digests,
+            url=url,
+            recorded_at=time.time()
+        )
+        line = f'{record.model_dump_json()}\n'.encode('utf-8')
+        self._file_p.parent.mkdir(parents=True, exist_ok=True)
+        # a single write with O_APPEND isn't interleaved with the others
+        fd = os.open(self._file_p, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        return record
+
+    def load(self) -> Dict[str, DigestRecord]:
+        records: Dict[str, DigestRecord] = {}
+        if not self._file_p.exists():
+            return records
+        with self._file_p.open('rb') as fp:
+            for line in fp:
+                try:
+                    record = DigestRecord.model_validate(json.loads(line))
+                except (ValueError, ValidationError):
+                    # e.g. the last line written partially
+                    logger.warning(f'Ignore broken digest record in {self._file_p}')
+                    continue
+                records[record.file] = record
+        return records
+
+    def list(self) -> List[DigestRecord]:
+        return list(self.load().values())
+
+
+def get_digest_log() -> Optional[DigestLog]:
+    return _DIGEST_LOG.get()
+
+
+@contextmanager
+def record_digests(dir_path: Optional[Path]) -> Iterator[Optional[DigestLog]]:
+    """
+    record digests of the streams downloaded in current context to the log under 'dir_path',
+    disabled if None
+    """
+    digest_log = DigestLog(dir_path) if dir_path is not None else None
+    token = _DIGEST_LOG.set(digest_log)
+    try:
+        yield digest_log
+    finally:
+        _DIGEST_LOG.reset(token)
@@ -0,0 +1,185 @@
+"""
+Persistent queue of download jobs
+
+jobs are stored in SQLite, and claimed by priority then by submission order
+the running jobs are re-queued when the store is reopened, e.g. after crash
+"""
+from contextlib import contextmanager
+import json
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Literal, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+__all__ = ['Job', 'JobStore']
+
+
+JobStatus = Literal['queued', 'running', 'done', 'failed', 'cancelled']
+JOB_STATUS_QUEUED: JobStatus = 'queued'
+JOB_STATUS_RUNNING: JobStatus = 'running'
+JOB_STATUS_DONE: JobStatus = 'done'
+JOB_STATUS_FAILED: JobStatus = 'failed'
+JOB_STATUS_CANCELLED: JobStatus = 'cancelled'
+
+JOB_COLUMNS = (
+    'id', 'url', 'options', 'priority', 'status', 'error',
+    'attempts', 'created_at', 'started_at', 'finished_at'
+)
+
+
+class Job(BaseModel):
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    id_field: int = Field(..., alias='id')
+    url: str
+    options: Dict[str, Any] = {}          # keyword arguments of download run
+    priority: int = 0                     # higher one is claimed first
+    status: JobStatus = JOB_STATUS_QUEUED
+    error: Optional[str] = None
+    attempts: int = 0                     # times of being claimed
+    created_at: float                     # Unix timestamp
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class JobStore(object):
+    """
+    each operation is a short transaction, which blocks until it's done,
+    so the event loop runs them on threads, e.g. by 'asyncio.to_thread'
+    the operations are serialized, as the connection is shared by the threads
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), isolation_level=None, check_same_thread=False)
+        # reentrant, as submitting gets the jobs submitted
+        self._lock = threading.RLock()
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'url TEXT NOT NULL, '
+            'options TEXT NOT NULL, '
+            'priority INTEGER NOT NULL DEFAULT 0, '
+            'status TEXT NOT NULL, '
+            'error TEXT, '
+            'attempts INTEGER NOT NULL DEFAULT 0, '
+            'created_at REAL NOT NULL, '
+            'started_at REAL, '
+            'finished_at REAL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, id)'
+        )
+        self._conn.execute(
+            'UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?',
+            (JOB_STATUS_QUEUED, JOB_STATUS_RUNNING)
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def submit(
+        self,
+        url: str,
+        options: Optional[Dict[str, Any]] = None,
+        priority: int = 0
+    ) -> Job:
+        return self.submit_many([(url, options or {}, priority)])[0]
+
+    def submit_many(self, specs: Sequence[Tuple[str, Dict[str, Any], int]]) -> List[Job]:
+        """
+        submit jobs of (url, options, priority) in one transaction
+        """
+        now = time.time()
+        job_ids = []
+        with self._lock:
+            with self._transaction():
+                for url, options, priority in specs:
+                    cursor = self._conn.execute(
+                        'INSERT INTO jobs (url, options, priority, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                        (url, json.dumps(options), priority, JOB_STATUS_QUEUED, now)
+                    )
+                    job_ids.append(cursor.lastrowid)
+            return [job for job in map(self.get, job_ids) if job is not None]
+
+    def get(self, job_id: Optional[int]) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {", ".join(JOB_COLUMNS)} FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def list(
+        self,
+        status: Optional[JobStatus] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[Job]:
+        condition, params = ('WHERE status = ?', (status,)) if status is not None else ('', ())
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {", ".join(JOB_COLUMNS)} FROM jobs {condition} ORDER BY id LIMIT ? OFFSET ?',
+                (*params, limit, offset)
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def count(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+    def claim(self) -> Optional[Job]:
+        """
+        take the next queued job and mark it running
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 '
+                'WHERE id = ('
+                '  SELECT id FROM jobs WHERE status = ? ORDER BY priority DESC, id LIMIT 1'
+                f') RETURNING {", ".join(JOB_COLUMNS)}',
+                (JOB_STATUS_RUNNING, time.time(), JOB_STATUS_QUEUED)
+            ).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def finish(self, job_id: int, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                (JOB_STATUS_DONE if error is None else JOB_STATUS_FAILED, error, time.time(), job_id)
+            )
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        only the queued job can be cancelled
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?',
+                (JOB_STATUS_CANCELLED, time.time(), job_id, JOB_STATUS_QUEUED)
+            )
+        return cursor.rowcount > 0
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    @staticmethod
+    def _to_job(row: Sequence) -> Job:
+        values = dict(zip(JOB_COLUMNS, row))
+        values['options'] = json.loads(values['options'])
+        return Job.model_validate(values)
@@ -11,8 +11,6 @@ from logging.config import dictConfig
 from collections import OrderedDict
 from typing import Literal, Optional, Sequence
 
-import tzlocal
-
 
 __all__ = ['config_logging']
 
@@ -124,6 +122,8 @@ class JsonFormatter(Formatter):
         return json.dumps(result)
 
     def formatTime(self, record: LogRecord, datefmt: Optional[str] = None) -> str:
+        import tzlocal  # only JSON format needs it, which is not used by CLI
+
         ct = datetime.datetime.fromtimestamp(
             record.created,
             tzlocal.get_localzone()
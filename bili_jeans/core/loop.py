@@ -0,0 +1,61 @@
+"""
+Event loop selection and tuning
+
+'auto' picks uvloop when it's installed, whose callbacks and sockets are cheaper
+with hundreds of concurrent connections, otherwise the default loop of asyncio
+the default executor serves 'run_in_executor' and 'asyncio.to_thread',
+e.g. prompting in interactive mode and waiting on the queues of worker processes
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Literal, Optional
+
+try:
+    import uvloop  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover
+    uvloop = None
+
+
+__all__ = ['get_loop_factory', 'run_coroutine']
+
+
+LoopName = Literal['auto', 'asyncio', 'uvloop']
+LOOP_AUTO: LoopName = 'auto'
+LOOP_ASYNCIO: LoopName = 'asyncio'
+LOOP_UVLOOP: LoopName = 'uvloop'
+LOOP_NAMES = (LOOP_AUTO, LOOP_ASYNCIO, LOOP_UVLOOP)
+
+
+def get_loop_factory(
+    loop: LoopName = LOOP_AUTO
+) -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    """
+    None stands for the default loop of asyncio
+    """
+    if loop not in LOOP_NAMES:
+        raise ValueError(f'Unknown event loop: {loop}')
+    if loop == LOOP_ASYNCIO:
+        return None
+    if uvloop is None:
+        if loop == LOOP_UVLOOP:
+            raise ValueError('uvloop is not installed')
+        return None
+    return uvloop.new_event_loop
+
+
+def run_coroutine(
+    coroutine: Coroutine,
+    loop: LoopName = LOOP_AUTO,
+    executor_workers: Optional[int] = None
+) -> Any:
+    """
+    run the coroutine like 'asyncio.run' on the chosen loop
+    :param executor_workers: max threads of the default executor, default to the one of asyncio
+    :type executor_workers: Optional[int]
+    """
+    with asyncio.Runner(loop_factory=get_loop_factory(loop)) as runner:
+        if executor_workers is not None:
+            runner.get_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix='bili_jeans')
+            )
+        return runner.run(coroutine)
@@ -0,0 +1,100 @@
+"""
+Manifest of downloaded pages
+
+one entry per page, keyed by its BV ID and CID, persisted as append-only JSON lines,
+so recording a page doesn't rewrite the whole manifest, the latest entry of a page wins
+only the process owning the manifest records entries, e.g. the parent of worker pool
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, ValidationError
+
+
+__all__ = ['Manifest', 'ManifestEntry']
+
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_FILENAME = '.manifest.jsonl'
+
+ManifestStatus = Literal['done', 'failed']
+MANIFEST_STATUS_DONE: ManifestStatus = 'done'
+MANIFEST_STATUS_FAILED: ManifestStatus = 'failed'
+
+
+class ManifestEntry(BaseModel):
+
+    bvid: Optional[str] = None
+    cid: int
+    idx: int
+    title: str
+    status: ManifestStatus
+    error: Optional[str] = None
+    worker: Optional[int] = None      # process ID which downloaded the page
+    node: Optional[str] = None        # worker ID on the shared work queue
+    elapsed: float = 0.0              # unit is second
+    finished_at: float                # Unix timestamp
+
+    @property
+    def key(self) -> str:
+        return Manifest.get_key(self.bvid, self.cid)
+
+
+class Manifest(object):
+
+    def __init__(self, file_p: Path) -> None:
+        self._file_p = file_p
+        self._entries: Dict[str, ManifestEntry] = {}
+        if not file_p.exists():
+            return
+        with file_p.open('rb') as fp:
+            for line in fp:
+                try:
+                    entry = ManifestEntry.model_validate(json.loads(line))
+                except (ValueError, ValidationError):
+                    # e.g. the last line written partially
+                    logger.warning(f'Ignore broken manifest entry in {file_p}')
+                    continue
+                self._entries[entry.key] = entry
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def file_path(self) -> Path:
+        return self._file_p
+
+    @staticmethod
+    def get_key(bvid: Optional[str], cid: int) -> str:
+        return f'{bvid}/{cid}'
+
+    def get(self, bvid: Optional[str], cid: int) -> Optional[ManifestEntry]:
+        return self._entries.get(self.get_key(bvid, cid))
+
+    def is_done(self, bvid: Optional[str], cid: int) -> bool:
+        entry = self.get(bvid, cid)
+        return entry is not None and entry.status == MANIFEST_STATUS_DONE
+
+    def list(self, status: Optional[ManifestStatus] = None) -> List[ManifestEntry]:
+        return [
+            entry for entry in self._entries.values()
+            if status is None or entry.status == status
+        ]
+
+    def record(self, entry: ManifestEntry) -> None:
+        self._entries[entry.key] = entry
+        line = f'{entry.model_dump_json()}\n'.encode('utf-8')
+        self._file_p.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._file_p, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
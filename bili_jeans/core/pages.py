@@ -5,12 +5,57 @@ from typing import List, Optional
 
 from .proxy import get_ugc_view
 from .schemes import PageData, WebViewMetaData
+from .schemes.ugc_view import GetUGCViewData
 
 
 async def get_ugc_pages(
     view_meta: WebViewMetaData,
     sess_data: Optional[str] = None
 ) -> List[PageData]:
+    view_data = await _get_ugc_view_data(view_meta, sess_data)
+    return _list_view_pages(view_data)
+
+
+async def get_ugc_season_pages(
+    view_meta: WebViewMetaData,
+    sess_data: Optional[str] = None
+) -> List[PageData]:
+    """
+    expand all of episodes in the UGC season which the video belongs to
+    pages of each episode are embedded in the season,
+    so there is no more request on the view of episodes
+    when the video isn't in any season, its own pages are returned
+    """
+    view_data = await _get_ugc_view_data(view_meta, sess_data)
+    ugc_season = view_data.ugc_season
+    if ugc_season is None:
+        return _list_view_pages(view_data)
+
+    pages = []
+    episodes = [episode for section in ugc_season.sections for episode in section.episodes]
+    for episode_idx, episode in enumerate(episodes, start=1):
+        for idx, item in enumerate(episode.pages):
+            page = PageData(
+                idx=item.page,
+                episode_idx=episode_idx,
+                aid=episode.aid,
+                bvid=episode.bvid,
+                cid=item.cid,
+                title=item.part,
+                cover=episode.arc.pic,
+                duration=item.duration,
+                description=episode.arc.desc if idx == 0 else '',
+                owner_name=view_data.owner.name,
+                pubdate=episode.arc.pubdate
+            )
+            pages.append(page)
+    return pages
+
+
+async def _get_ugc_view_data(
+    view_meta: WebViewMetaData,
+    sess_data: Optional[str] = None
+) -> GetUGCViewData:
     ugc_view = await get_ugc_view(
         bvid=view_meta.bvid,
         aid=view_meta.aid,
@@ -19,20 +64,24 @@ async def get_ugc_pages(
     if ugc_view.code != 0:
         raise ValueError(ugc_view.message)
 
-    pages = []
     assert ugc_view.data is not None
-    for idx, item in enumerate(ugc_view.data.pages):
+    return ugc_view.data
+
+
+def _list_view_pages(view_data: GetUGCViewData) -> List[PageData]:
+    pages = []
+    for idx, item in enumerate(view_data.pages):
         page = PageData(
             idx=item.page,
-            aid=ugc_view.data.aid,
-            bvid=ugc_view.data.bvid,
+            aid=view_data.aid,
+            bvid=view_data.bvid,
             cid=item.cid,
             title=item.part,
-            cover=ugc_view.data.pic,
+            cover=view_data.pic,
             duration=item.duration,
-            description=ugc_view.data.desc if idx == 0 else '',
-            owner_name=ugc_view.data.owner.name,
-            pubdate=ugc_view.data.pubdate
+            description=view_data.desc if idx == 0 else '',
+            owner_name=view_data.owner.name,
+            pubdate=view_data.pubdate
         )
         pages.append(page)
     return pages
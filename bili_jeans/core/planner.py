@@ -0,0 +1,220 @@
+"""
+Storage planning on pages before downloading
+
+the size of DASH stream is estimated by its bandwidth and duration,
+when the total exceeds the budget,
+streams are downgraded one step at a time, the one saving most bytes first
+"""
+import asyncio
+import heapq
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from .constants import FormatNumberValue
+from .proxy import get_ugc_play
+from .schemes import PageData
+from .schemes.base import DashMediaItem
+from .schemes.ugc_play import GetUGCPlayDataDash
+from .selection import rank_dash_streams, select_dash_streams, StreamPolicy
+
+
+__all__ = ['estimate_bytes', 'PagePlan', 'plan_pages', 'plan_storage', 'StoragePlan']
+
+
+logger = logging.getLogger(__name__)
+
+
+STREAM_VIDEO = 'video'
+STREAM_AUDIO = 'audio'
+
+
+class PlannedStream(BaseModel):
+
+    quality_id: int                 # quality number of video, or bit rate ID of audio
+    codec_id: Optional[int] = None  # only for video
+    bandwidth: int                  # unit is bit per second
+    estimated_bytes: int
+
+
+class PagePlan(BaseModel):
+
+    idx: int
+    bvid: Optional[str] = None
+    cid: int
+    title: str
+    duration: int                   # unit is second
+    video: Optional[PlannedStream] = None
+    audio: Optional[PlannedStream] = None
+    estimated_bytes: int = 0
+
+
+class StoragePlan(BaseModel):
+
+    budget: Optional[int] = None    # unit is byte
+    total_bytes: int = 0
+    fits: bool = True
+    pages: List[PagePlan] = []
+
+
+def estimate_bytes(bandwidth: int, duration: int) -> int:
+    return bandwidth * duration // 8
+
+
+async def plan_pages(
+    pages: Sequence[PageData],
+    stream_policy: Optional[StreamPolicy] = None,
+    budget: Optional[int] = None,
+    sess_data: Optional[str] = None,
+    concurrency: int = 8
+) -> StoragePlan:
+    """
+    request play data of all pages, then plan on them
+    pages without DASH data are planned as empty
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _get_dash(page: PageData) -> Optional[GetUGCPlayDataDash]:
+        async with semaphore:
+            try:
+                ugc_play = await get_ugc_play(
+                    cid=page.cid,
+                    bvid=page.bvid,
+                    aid=page.aid,
+                    fnval=FormatNumberValue.get_dash_full_fnval(),
+                    sess_data=sess_data
+                )
+            except Exception as e:
+                logger.warning(f'Get UGC play data failed for {page.cid} of {page.bvid}: {e}')
+                return None
+        if ugc_play.data is None:
+            logger.warning(
+                f'No UGC play data for {page.cid} of {page.bvid}: '
+                f'[{ugc_play.code}] {ugc_play.message}'
+            )
+            return None
+        return ugc_play.data.dash
+
+    dashes = await asyncio.gather(*[_get_dash(page) for page in pages])
+    return plan_storage(
+        list(zip(pages, dashes)),
+        stream_policy or StreamPolicy(),
+        budget
+    )
+
+
+def plan_storage(
+    pages: Sequence[Tuple[PageData, Optional[GetUGCPlayDataDash]]],
+    stream_policy: StreamPolicy,
+    budget: Optional[int] = None
+) -> StoragePlan:
+    # candidates of each page and stream, from the chosen one to the smallest
+    candidates: List[Dict[str, List[DashMediaItem]]] = []
+    durations: List[int] = []
+    for page, dash in pages:
+        page_candidates: Dict[str, List[DashMediaItem]] = {STREAM_VIDEO: [], STREAM_AUDIO: []}
+        durations.append(dash.duration if dash is not None else page.duration or 0)
+        if dash is not None:
+            videos, audios = rank_dash_streams(dash, stream_policy)
+            video, audio = select_dash_streams(dash, stream_policy)
+            page_candidates[STREAM_VIDEO] = _get_downgrade_chain(video, videos)
+            page_candidates[STREAM_AUDIO] = _get_downgrade_chain(audio, audios)
+        candidates.append(page_candidates)
+
+    # position of the current candidate of each page and stream
+    positions = [{STREAM_VIDEO: 0, STREAM_AUDIO: 0} for _ in pages]
+    total_bytes = sum(
+        estimate_bytes(chain[0].bandwidth, duration)
+        for page_candidates, duration in zip(candidates, durations)
+        for chain in page_candidates.values() if chain
+    )
+
+    if budget is not None and total_bytes > budget:
+        # max heap on bytes saved by the next downgrade step
+        steps: List[Tuple[int, int, str]] = []
+        for page_pos, page_candidates in enumerate(candidates):
+            for stream in (STREAM_VIDEO, STREAM_AUDIO):
+                _push_step(steps, page_candidates[stream], 0, durations[page_pos], page_pos, stream)
+        while total_bytes > budget and steps:
+            negative_saved, page_pos, stream = heapq.heappop(steps)
+            total_bytes += negative_saved
+            positions[page_pos][stream] += 1
+            _push_step(
+                steps,
+                candidates[page_pos][stream],
+                positions[page_pos][stream],
+                durations[page_pos],
+                page_pos,
+                stream
+            )
+
+    plan = StoragePlan(budget=budget, total_bytes=total_bytes)
+    plan.fits = budget is None or total_bytes <= budget
+    for (page, _), page_candidates, page_positions, duration in zip(
+        pages, candidates, positions, durations
+    ):
+        page_plan = PagePlan(
+            idx=page.idx,
+            bvid=page.bvid,
+            cid=page.cid,
+            title=page.title,
+            duration=duration
+        )
+        video_chain = page_candidates[STREAM_VIDEO]
+        if video_chain:
+            video = video_chain[page_positions[STREAM_VIDEO]]
+            page_plan.video = PlannedStream(
+                quality_id=video.id_field,
+                codec_id=video.codecid,
+                bandwidth=video.bandwidth,
+                estimated_bytes=estimate_bytes(video.bandwidth, duration)
+            )
+        audio_chain = page_candidates[STREAM_AUDIO]
+        if audio_chain:
+            audio = audio_chain[page_positions[STREAM_AUDIO]]
+            page_plan.audio = PlannedStream(
+                quality_id=audio.id_field,
+                bandwidth=audio.bandwidth,
+                estimated_bytes=estimate_bytes(audio.bandwidth, duration)
+            )
+        page_plan.estimated_bytes = sum(
+            stream.estimated_bytes
+            for stream in (page_plan.video, page_plan.audio) if stream is not None
+        )
+        plan.pages.append(page_plan)
+    return plan
+
+
+def _get_downgrade_chain(
+    chosen: Optional[DashMediaItem],
+    ranked: List[DashMediaItem]
+) -> List[DashMediaItem]:
+    """
+    from the chosen one, the following candidates in preferred order
+    which are smaller than all of the previous ones
+    """
+    if chosen is None:
+        return []
+    chain = [chosen]
+    for item in ranked:
+        if item.bandwidth < chain[-1].bandwidth:
+            chain.append(item)
+    return chain
+
+
+def _push_step(
+    steps: List[Tuple[int, int, str]],
+    chain: List[DashMediaItem],
+    position: int,
+    duration: int,
+    page_pos: int,
+    stream: str
+) -> None:
+    if position + 1 >= len(chain):
+        return
+    saved = (
+        estimate_bytes(chain[position].bandwidth, duration) -
+        estimate_bytes(chain[position + 1].bandwidth, duration)
+    )
+    heapq.heappush(steps, (-saved, page_pos, stream))
@@ -1,19 +1,29 @@
 """
 Proxy Interface on Bilibili API
 """
-import json
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
 
 import aiohttp
 
 from .constants import (
     HEADERS,
     TIMEOUT,
+    URL_WEB_NAV,
+    URL_WEB_SPACE_VIDEOS,
     URL_WEB_UGC_PLAY,
     URL_WEB_UGC_PLAYER,
     URL_WEB_UGC_VIEW
 )
-from .schemes import GetUGCPlayResponse, GetUGCPlayerResponse, GetUGCViewResponse
+from .http import client_session
+from .schemes import (
+    GetNavResponse,
+    GetSpaceVideosResponse,
+    GetUGCPlayResponse,
+    GetUGCPlayerResponse,
+    GetUGCViewResponse
+)
+from .utils.json_codec import loads, validate_json
+from .utils.wbi import sign_params
 
 
 async def get_ugc_view(
@@ -21,19 +31,21 @@ async def get_ugc_view(
     aid: Optional[int] = None,
     sess_data: Optional[str] = None
 ) -> GetUGCViewResponse:
-    data = await get_ugc_view_response(bvid, aid, sess_data)
-    return GetUGCViewResponse.model_validate(data)
+    data = await get_ugc_view_response(bvid, aid, sess_data, raw=True)
+    return validate_json(GetUGCViewResponse, data)
 
 
 async def get_ugc_view_response(
     bvid: Optional[str] = None,
     aid: Optional[int] = None,
-    sess_data: Optional[str] = None
-) -> Dict:
+    sess_data: Optional[str] = None,
+    raw: bool = False
+) -> Union[Dict, bytes]:
     """
     get UGC resource meta info which is with '/video' namespace
     support being requested byf one of BV ID (which has higher priority) and AV ID
     refer to https://www.bilibili.com/read/cv5167957/?spm_id_from=333.976.0.0)
+    return the undecoded content with raw, which is validated by model directly
     """
     if all([id_val is None for id_val in (bvid, aid)]):
         raise ValueError("One of bvid and aid is required")
@@ -44,18 +56,18 @@ async def get_ugc_view_response(
     else:
         params.update({'aid': aid})
 
-    async with aiohttp.ClientSession() as session:
-        if sess_data is not None:
-            session.cookie_jar.update_cookies({'SESSDATA': sess_data})
+    async with client_session() as session:
         async with session.get(
             URL_WEB_UGC_VIEW,
             params=params,
             headers=HEADERS,
+            cookies=_get_cookies(sess_data),
             timeout=aiohttp.ClientTimeout(total=float(TIMEOUT))
         ) as response:
             content = await response.read()
-            data = json.loads(content.decode('utf-8'))
-            return data
+            if raw:
+                return content
+            return loads(content)
 
 
 async def get_ugc_play(
@@ -67,8 +79,8 @@ async def get_ugc_play(
     fourk: int = 1,
     sess_data: Optional[str] = None
 ) -> GetUGCPlayResponse:
-    data = await get_ugc_play_response(cid, bvid, aid, qn, fnval, fourk, sess_data)
-    return GetUGCPlayResponse.model_validate(data)
+    data = await get_ugc_play_response(cid, bvid, aid, qn, fnval, fourk, sess_data, raw=True)
+    return validate_json(GetUGCPlayResponse, data)
 
 
 async def get_ugc_play_response(
@@ -78,8 +90,9 @@ async def get_ugc_play_response(
     qn: Optional[int] = None,
     fnval: int = 16,
     fourk: int = 1,
-    sess_data: Optional[str] = None
-) -> Dict:
+    sess_data: Optional[str] = None,
+    raw: bool = False
+) -> Union[Dict, bytes]:
     """
     get UGC play resource info which is with '/video' namespace
     :param cid: Identifier of codec
@@ -96,7 +109,9 @@ async def get_ugc_play_response(
     :type fourk: int
     :param sess_data: cookie of Bilibili user, SESSDATA
     :type sess_data: str
-    :return: dict, UGC play response data
+    :param raw: return the undecoded content, which is validated by model directly
+    :type raw: bool
+    :return: dict, UGC play response data, or its raw content
     """
     if all([id_val is None for id_val in (bvid, aid)]):
         raise ValueError("One of bvid and aid is required")
@@ -114,18 +129,18 @@ async def get_ugc_play_response(
         'fourk': fourk
     })
 
-    async with aiohttp.ClientSession() as session:
-        if sess_data is not None:
-            session.cookie_jar.update_cookies({'SESSDATA': sess_data})
+    async with client_session() as session:
         async with session.get(
             URL_WEB_UGC_PLAY,
             params=params,
             headers=HEADERS,
+            cookies=_get_cookies(sess_data),
             timeout=aiohttp.ClientTimeout(total=float(TIMEOUT))
         ) as response:
             content = await response.read()
-            data = json.loads(content.decode('utf-8'))
-            return data
+            if raw:
+                return content
+            return loads(content)
 
 
 async def get_ugc_player(
@@ -142,9 +157,10 @@ async def get_ugc_player(
         aid,
         season_id,
         ep_id,
-        sess_data
+        sess_data,
+        raw=True
     )
-    return GetUGCPlayerResponse.model_validate(data)
+    return validate_json(GetUGCPlayerResponse, data)
 
 
 async def get_ugc_player_response(
@@ -153,8 +169,9 @@ async def get_ugc_player_response(
     aid: Optional[int] = None,
     season_id: Optional[int] = None,
     ep_id: Optional[int] = None,
-    sess_data: Optional[str] = None
-) -> Dict:
+    sess_data: Optional[str] = None,
+    raw: bool = False
+) -> Union[Dict, bytes]:
     """
     get UGC web player metadata which is with '/video' namespace
     :param cid: Identifier of codec
@@ -169,7 +186,9 @@ async def get_ugc_player_response(
     :type ep_id: Optional[int]
     :param sess_data: cookie of Bilibili user, SESSDATA
     :type sess_data: str
-    :return: dict, UGC player response data
+    :param raw: return the undecoded content, which is validated by model directly
+    :type raw: bool
+    :return: dict, UGC player response data, or its raw content
     """
     if all([id_val is None for id_val in (bvid, aid)]):
         raise ValueError("One of bvid and aid is required")
@@ -185,15 +204,111 @@ async def get_ugc_player_response(
         params.update({'ep_id': ep_id})
     params.update({'cid': cid})
 
-    async with aiohttp.ClientSession() as session:
-        if sess_data is not None:
-            session.cookie_jar.update_cookies({'SESSDATA': sess_data})
+    async with client_session() as session:
         async with session.get(
             URL_WEB_UGC_PLAYER,
             params=params,
             headers=HEADERS,
+            cookies=_get_cookies(sess_data),
             timeout=aiohttp.ClientTimeout(total=float(TIMEOUT))
         ) as response:
             content = await response.read()
-            data = json.loads(content.decode('utf-8'))
-            return data
+            if raw:
+                return content
+            return loads(content)
+
+
+async def get_nav(
+    sess_data: Optional[str] = None
+) -> GetNavResponse:
+    data = await get_nav_response(sess_data, raw=True)
+    return validate_json(GetNavResponse, data)
+
+
+async def get_nav_response(
+    sess_data: Optional[str] = None,
+    raw: bool = False
+) -> Union[Dict, bytes]:
+    """
+    get navigation info of current user, which holds the WBI keys
+    the keys are responded even not logged in
+    """
+    async with client_session() as session:
+        async with session.get(
+            URL_WEB_NAV,
+            headers=HEADERS,
+            cookies=_get_cookies(sess_data),
+            timeout=aiohttp.ClientTimeout(total=float(TIMEOUT))
+        ) as response:
+            content = await response.read()
+            if raw:
+                return content
+            return loads(content)
+
+
+async def get_space_videos(
+    mid: int,
+    mixin_key: str,
+    pn: int = 1,
+    ps: int = 30,
+    sess_data: Optional[str] = None
+) -> GetSpaceVideosResponse:
+    data = await get_space_videos_response(mid, mixin_key, pn, ps, sess_data, raw=True)
+    return validate_json(GetSpaceVideosResponse, data)
+
+
+async def get_space_videos_response(
+    mid: int,
+    mixin_key: str,
+    pn: int = 1,
+    ps: int = 30,
+    sess_data: Optional[str] = None,
+    raw: bool = False
+) -> Union[Dict, bytes]:
+    """
+    get one page of videos uploaded by the user, from the latest one
+    :param mid: User ID of uploader
+    :type mid: int
+    :param mixin_key: WBI mixin key for signing the query
+    :type mixin_key: str
+    :param pn: Serial num of page, starts from 1
+    :type pn: int
+    :param ps: Size of page, at most 50
+    :type ps: int
+    :param sess_data: cookie of Bilibili user, SESSDATA
+    :type sess_data: str
+    :param raw: return the undecoded content, which is validated by model directly
+    :type raw: bool
+    :return: dict, space videos response data, or its raw content
+    """
+    params = sign_params(
+        {
+            'mid': mid,
+            'pn': pn,
+            'ps': ps,
+            'order': 'pubdate'
+        },
+        mixin_key
+    )
+
+    async with client_session() as session:
+        async with session.get(
+            URL_WEB_SPACE_VIDEOS,
+            params=params,
+            headers=HEADERS,
+            cookies=_get_cookies(sess_data),
+            timeout=aiohttp.ClientTimeout(total=float(TIMEOUT))
+        ) as response:
+            content = await response.read()
+            if raw:
+                return content
+            return loads(content)
+
+
+def _get_cookies(sess_data: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """
+    cookies are sent per request, since the session may be shared by other users
+    """
+    if sess_data is None:
+        return None
+    return {'SESSDATA': sess_data}
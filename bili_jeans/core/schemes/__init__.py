@@ -1,7 +1,10 @@
 """
 Scheme definition for type hint
 """
+from .danmaku import DanmakuElem  # noqa: F401
 from .factory import PageData, WebViewMetaData  # noqa: F401
+from .nav import GetNavResponse  # noqa: F401
+from .space import GetSpaceVideosResponse  # noqa: F401
 from .subtitle import SubTitle  # noqa: F401
 from .ugc_play import GetUGCPlayResponse  # noqa: F401
 from .ugc_player import GetUGCPlayerResponse  # noqa: F401
@@ -0,0 +1,22 @@
+"""
+Scheme definition of the danmaku from https://api.bilibili.com/x/v2/dm/web/seg.so
+which is 'DanmakuElem' of protobuf message 'DmSegMobileReply'
+"""
+from pydantic import BaseModel, Field
+
+
+class DanmakuElem(BaseModel):
+
+    id_field: int = Field(0, alias='id')  # danmaku ID
+    progress: int = 0                     # appearance time in video, unit is millisecond
+    mode: int = 1                         # 1-3 rolling, 4 bottom, 5 top, 6 reverse, 7 advanced, 8 code, 9 BAS
+    fontsize: int = 25
+    color: int = 16777215                 # decimal RGB888
+    mid_hash: str = ''                    # CRC32 of sender's mid
+    content: str = ''
+    ctime: int = 0                        # Unix timestamp when sent
+    weight: int = 0                       # weight for shielding
+    action: str = ''
+    pool: int = 0                         # 0 normal, 1 subtitle, 2 special
+    id_str: str = ''                      # danmaku ID in string
+    attr: int = 0                         # bitmap of attributes
@@ -23,6 +23,7 @@ class PageData(BaseModel):
     standard metadata of page which is the finest resource from Bilibili
     """
     idx: int
+    episode_idx: Optional[int] = None  # serial of the episode in UGC season, only for collection
     aid: Optional[int] = None
     bvid: Optional[str] = None
     cid: int
@@ -0,0 +1,44 @@
+"""
+Scheme definition of the response from https://api.bilibili.com/x/web-interface/nav
+"""
+from pathlib import PurePosixPath
+from typing import Optional
+from urllib.parse import urlparse
+
+from pydantic import BaseModel
+
+from .base import BaseResponseModel
+
+
+class GetNavDataWbiImg(BaseModel):
+    """
+    source of WBI keys, the keys are the stems of image URLs
+    """
+    img_url: str
+    sub_url: str
+
+    @property
+    def img_key(self) -> str:
+        return PurePosixPath(urlparse(self.img_url).path).stem
+
+    @property
+    def sub_key(self) -> str:
+        return PurePosixPath(urlparse(self.sub_url).path).stem
+
+
+class GetNavData(BaseModel):
+    """
+    'data' field, only defines part of necessary fields
+    """
+    isLogin: bool
+    wbi_img: GetNavDataWbiImg
+
+
+class GetNavResponse(BaseResponseModel):
+    """
+    On 'code' field,
+
+    0：success
+    -101：not logged in, but 'data' still holds 'wbi_img'
+    """
+    data: Optional[GetNavData] = None
@@ -0,0 +1,65 @@
+"""
+Scheme definition of the response from https://api.bilibili.com/x/space/wbi/arc/search
+"""
+from typing import List, Optional
+from urllib.parse import urlparse, urlunparse
+
+from pydantic import BaseModel, Field
+
+from .base import BaseResponseModel
+from ..constants import URL_WEB_HOST, URL_WEB_NAMESPACE_UGC
+
+
+class GetSpaceVideosDataListVListItem(BaseModel):
+    """
+    Metadata of a video in uploader's space
+    """
+    aid: int       # AV ID of video
+    bvid: str      # BV ID of video
+    created: int   # Unix timestamp when video published
+    length: str    # duration like 'MM:SS'
+    pic: str       # URL of video cover
+    title: str     # Title of video
+
+    @property
+    def view_url(self) -> str:
+        unparsed_base = urlparse(URL_WEB_HOST)
+        return urlunparse((
+            unparsed_base.scheme,
+            unparsed_base.netloc,
+            '/'.join([*(URL_WEB_NAMESPACE_UGC.split('/')), self.bvid]),
+            '',
+            None,
+            ''
+        ))
+
+
+class GetSpaceVideosDataList(BaseModel):
+
+    vlist: List[GetSpaceVideosDataListVListItem] = []
+
+
+class GetSpaceVideosDataPage(BaseModel):
+
+    count: int  # Total count of videos
+    pn: int     # Serial num of current page
+    ps: int     # Size of page
+
+
+class GetSpaceVideosData(BaseModel):
+    """
+    'data' field, only defines part of necessary fields
+    """
+    list_field: GetSpaceVideosDataList = Field(..., alias='list')
+    page: GetSpaceVideosDataPage
+
+
+class GetSpaceVideosResponse(BaseResponseModel):
+    """
+    On 'code' field,
+
+    0：success
+    -352：risk control, e.g. missing or wrong WBI signature
+    -400：request error
+    """
+    data: Optional[GetSpaceVideosData] = None
@@ -1,7 +1,8 @@
 """
 Scheme definition of the response from https://api.bilibili.com/x/web-interface/wbi/view
 """
-from typing import List, Optional
+from functools import cached_property
+from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse, urlunparse
 
 from pydantic import BaseModel, Field
@@ -102,6 +103,8 @@ class GetUGCViewDataUGCSeason(BaseModel):
 class GetUGCViewData(BaseModel):
     """
     'data' field, only defines part of necessary fields
+    UGC season may hold thousands of episodes which are rarely read,
+    so it's kept as is and validated on the first access
     """
     aid: int                                              # AV ID of video
     bvid: str                                             # BV ID of video
@@ -115,7 +118,16 @@ class GetUGCViewData(BaseModel):
     pic: str                                              # URL of video cover
     pubdate: int                                          # Unix timestamp when video published (audited)
     title: str                                            # Title of video
-    ugc_season: Optional[GetUGCViewDataUGCSeason] = None  # related UGC season's info with other videos
+    raw_ugc_season: Optional[Dict[str, Any]] = Field(None, alias='ugc_season')  # unvalidated UGC season
+
+    @cached_property
+    def ugc_season(self) -> Optional[GetUGCViewDataUGCSeason]:
+        """
+        related UGC season's info with other videos
+        """
+        if self.raw_ugc_season is None:
+            return None
+        return GetUGCViewDataUGCSeason.model_validate(self.raw_ugc_season)
 
     @property
     def view_url(self) -> str:
@@ -0,0 +1,209 @@
+"""
+Declarative selection on DASH streams
+
+every video and audio stream is scored against the user policy,
+and the video-audio pair is chosen jointly
+so that bandwidth limit covers both of them
+"""
+import json
+import logging
+from pathlib import Path
+from typing import List, Literal, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+from .constants import BitRateId, CodecId, QualityId, QualityNumber
+from .schemes.base import DashMediaItem
+from .schemes.ugc_play import GetUGCPlayDataDash
+
+
+__all__ = ['rank_dash_streams', 'select_dash_streams', 'StreamPolicy']
+
+
+logger = logging.getLogger(__name__)
+
+
+VideoCriterion = Literal['qn', 'codec', 'frame_rate', 'resolution', 'bandwidth']
+DEFAULT_VIDEO_PRIORITY: List[VideoCriterion] = [
+    'qn', 'codec', 'frame_rate', 'resolution', 'bandwidth'
+]
+
+
+class StreamPolicy(BaseModel):
+    """
+    bandwidth unit is bit per second, which is the same as DASH's
+    e.g. best AV1 at or below 1080P60 unless its bandwidth > 3 Mbps
+    {"max_qn": 116, "codecs": [13, 12, 7], "max_video_bandwidth": 3000000}
+    """
+    max_qn: Optional[int] = None                  # highest quality number allowed
+    min_qn: Optional[int] = None                  # lowest quality number allowed
+    codecs: List[int] = []                        # codec IDs in preferred order, prefer efficient one if empty
+    max_frame_rate: Optional[float] = None
+    max_height: Optional[int] = None
+    max_video_bandwidth: Optional[int] = None
+    max_bit_rate_id: Optional[int] = None         # highest audio bit rate ID allowed
+    max_audio_bandwidth: Optional[int] = None
+    max_bandwidth: Optional[int] = None           # limit on the sum of video and audio
+    priority: List[VideoCriterion] = DEFAULT_VIDEO_PRIORITY  # criteria order on scoring video
+    prefer_higher: bool = True                    # prefer higher score or lower
+
+    @classmethod
+    def load(cls, value: str) -> 'StreamPolicy':
+        """
+        load from JSON string, or path of JSON file
+        """
+        if value.lstrip().startswith('{'):
+            return cls.model_validate_json(value)
+        return cls.model_validate(json.loads(Path(value).read_text(encoding='utf-8')))
+
+
+def select_dash_streams(
+    dash: GetUGCPlayDataDash,
+    policy: StreamPolicy
+) -> Tuple[Optional[DashMediaItem], Optional[DashMediaItem]]:
+    """
+    choose video and audio in one pass
+    when no pair satisfies the policy,
+    hard limits are relaxed and the pair with the least bandwidth would be chosen
+    """
+    videos, audios = rank_dash_streams(dash, policy)
+
+    if not videos or not audios:
+        return (
+            videos[0] if videos else None,
+            audios[0] if audios else None
+        )
+    if policy.max_bandwidth is None:
+        return videos[0], audios[0]
+
+    # video score dominates, so the first video with any affordable audio wins
+    for video in videos:
+        budget = policy.max_bandwidth - video.bandwidth
+        for audio in audios:
+            if audio.bandwidth <= budget:
+                return video, audio
+
+    logger.warning(
+        f'No stream pair within the bandwidth {policy.max_bandwidth}, choose the least one'
+    )
+    return (
+        min(videos, key=lambda item: item.bandwidth),
+        min(audios, key=lambda item: item.bandwidth)
+    )
+
+
+def rank_dash_streams(
+    dash: GetUGCPlayDataDash,
+    policy: StreamPolicy
+) -> Tuple[List[DashMediaItem], List[DashMediaItem]]:
+    """
+    videos and audios allowed by the policy, from the most preferred one
+    when none is allowed, all of them are ranked instead
+    """
+    videos = _sort_videos(
+        [video for video in dash.video if _is_video_allowed(video, policy)],
+        policy
+    )
+    if not videos and dash.video:
+        logger.warning('No video stream satisfies the policy, relax its limits')
+        videos = _sort_videos(list(dash.video), policy)
+    audios = _sort_audios(
+        [audio for audio in _list_audios(dash) if _is_audio_allowed(audio, policy)],
+        policy
+    )
+    if not audios and _list_audios(dash):
+        logger.warning('No audio stream satisfies the policy, relax its limits')
+        audios = _sort_audios(_list_audios(dash), policy)
+    return videos, audios
+
+
+def _list_audios(dash: GetUGCPlayDataDash) -> List[DashMediaItem]:
+    audios: List[DashMediaItem] = []
+    if dash.audio is not None:
+        audios.extend(dash.audio)
+    flac = dash.flac
+    if flac is not None and flac.audio is not None:
+        audios.append(flac.audio)
+    dolby = dash.dolby
+    if dolby.audio is not None:
+        audios.extend(dolby.audio)
+    return audios
+
+
+def _get_frame_rate(video: DashMediaItem) -> float:
+    try:
+        return float(video.frame_rate)
+    except ValueError:
+        return 0.0
+
+
+def _get_order(quality_class: Type[QualityId], quality_id: int) -> int:
+    """
+    unknown quality ID is regarded as the lowest
+    """
+    if not quality_class.is_valid(quality_id):
+        return 0
+    return quality_class.from_value(quality_id).quality_order
+
+
+def _is_video_allowed(video: DashMediaItem, policy: StreamPolicy) -> bool:
+    qn_order = _get_order(QualityNumber, video.id_field)
+    if policy.max_qn is not None and qn_order > _get_order(QualityNumber, policy.max_qn):
+        return False
+    if policy.min_qn is not None and qn_order < _get_order(QualityNumber, policy.min_qn):
+        return False
+    if policy.max_frame_rate is not None and _get_frame_rate(video) > policy.max_frame_rate:
+        return False
+    if policy.max_height is not None and video.height > policy.max_height:
+        return False
+    if policy.max_video_bandwidth is not None and video.bandwidth > policy.max_video_bandwidth:
+        return False
+    return True
+
+
+def _is_audio_allowed(audio: DashMediaItem, policy: StreamPolicy) -> bool:
+    if (
+        policy.max_bit_rate_id is not None and
+        _get_order(BitRateId, audio.id_field) > _get_order(BitRateId, policy.max_bit_rate_id)
+    ):
+        return False
+    if policy.max_audio_bandwidth is not None and audio.bandwidth > policy.max_audio_bandwidth:
+        return False
+    return True
+
+
+def _get_codec_score(codec_id: int, codecs: Sequence[int]) -> int:
+    if not codecs:
+        return _get_order(CodecId, codec_id)
+    if codec_id not in codecs:
+        return 0
+    return len(codecs) - codecs.index(codec_id)
+
+
+def _score_video(video: DashMediaItem, policy: StreamPolicy) -> Tuple:
+    """
+    codec preference is always honored,
+    the other criteria are reversed when lower one is preferred
+    """
+    sign = 1 if policy.prefer_higher else -1
+    values = {
+        'qn': sign * _get_order(QualityNumber, video.id_field),
+        'codec': _get_codec_score(video.codecid, policy.codecs),
+        'frame_rate': sign * _get_frame_rate(video),
+        'resolution': sign * video.width * video.height,
+        'bandwidth': sign * video.bandwidth
+    }
+    return tuple(values[criterion] for criterion in policy.priority)
+
+
+def _score_audio(audio: DashMediaItem, policy: StreamPolicy) -> Tuple:
+    sign = 1 if policy.prefer_higher else -1
+    return sign * _get_order(BitRateId, audio.id_field), sign * audio.bandwidth
+
+
+def _sort_videos(videos: List[DashMediaItem], policy: StreamPolicy) -> List[DashMediaItem]:
+    return sorted(videos, key=lambda video: _score_video(video, policy), reverse=True)
+
+
+def _sort_audios(audios: List[DashMediaItem], policy: StreamPolicy) -> List[DashMediaItem]:
+    return sorted(audios, key=lambda audio: _score_audio(audio, policy), reverse=True)
@@ -0,0 +1,112 @@
+"""
+Crawler on all of videos uploaded by one user
+
+pages of the uploader's video list are yielded one video at a time,
+and the next page is requested while the current one is being processed
+"""
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import AsyncIterator, Optional, Set
+import uuid
+
+from .proxy import get_nav, get_space_videos
+from .schemes.space import GetSpaceVideosData, GetSpaceVideosDataListVListItem
+from .utils.wbi import get_mixin_key
+
+
+__all__ = ['iter_space_videos', 'SpaceCheckpoint']
+
+
+logger = logging.getLogger(__name__)
+
+
+SPACE_PAGE_SIZE = 30
+
+
+class SpaceCheckpoint(object):
+    """
+    BV IDs of the processed videos, persisted as JSON list
+    the uploader's list is ordered by publish date and shifts on new uploads,
+    so the checkpoint records videos rather than page numbers
+    """
+
+    def __init__(self, file_p: Path) -> None:
+        self._file_p = file_p
+        self._bvids: Set[str] = set()
+        if file_p.exists():
+            try:
+                self._bvids = set(json.loads(file_p.read_bytes()))
+            except ValueError:
+                logger.warning(f'Ignore broken space checkpoint: {file_p}')
+
+    def __contains__(self, bvid: object) -> bool:
+        return bvid in self._bvids
+
+    def __len__(self) -> int:
+        return len(self._bvids)
+
+    def mark_done(self, bvid: str) -> None:
+        self._bvids.add(bvid)
+        self._file_p.parent.mkdir(parents=True, exist_ok=True)
+        tmp_p = self._file_p.with_name(f'{self._file_p.name}.{uuid.uuid4().hex}.tmp')
+        tmp_p.write_text(json.dumps(sorted(self._bvids)), encoding='utf-8')
+        tmp_p.replace(self._file_p)
+
+
+async def iter_space_videos(
+    mid: int,
+    sess_data: Optional[str] = None,
+    page_size: int = SPACE_PAGE_SIZE
+) -> AsyncIterator[GetSpaceVideosDataListVListItem]:
+    """
+    yield videos uploaded by the user, from the latest one
+    :param mid: User ID of uploader
+    :type mid: int
+    :param sess_data: cookie of Bilibili user, SESSDATA
+    :type sess_data: str
+    :param page_size: count of videos requested in one page
+    :type page_size: int
+    """
+    nav = await get_nav(sess_data)
+    if nav.data is None:
+        raise ValueError(f'No WBI keys from navigation info: [{nav.code}] {nav.message}')
+    mixin_key = get_mixin_key(nav.data.wbi_img.img_key, nav.data.wbi_img.sub_key)
+
+    pn = 1
+    next_page: Optional[asyncio.Future[GetSpaceVideosData]] = asyncio.ensure_future(
+        _get_space_videos_data(mid, mixin_key, pn, page_size, sess_data)
+    )
+    try:
+        while next_page is not None:
+            data = await next_page
+            next_page = None
+            videos = data.list_field.vlist
+            if videos and data.page.pn * data.page.ps < data.page.count:
+                pn += 1
+                # prefetch, the consumer processes the current page in the meantime
+                next_page = asyncio.ensure_future(
+                    _get_space_videos_data(mid, mixin_key, pn, page_size, sess_data)
+                )
+            for video in videos:
+                yield video
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+
+
+async def _get_space_videos_data(
+    mid: int,
+    mixin_key: str,
+    pn: int,
+    ps: int,
+    sess_data: Optional[str] = None
+) -> GetSpaceVideosData:
+    space_videos = await get_space_videos(mid, mixin_key, pn, ps, sess_data)
+    if space_videos.code != 0 or space_videos.data is None:
+        raise ValueError(
+            f'Get videos of user {mid} failed on page {pn}: '
+            f'[{space_videos.code}] {space_videos.message}'
+        )
+    return space_videos.data
@@ -1,5 +1,15 @@
 """
 Common utility functions
 """
+from .bvid import aid_to_bvid, bvid_to_aid, normalize_view_meta  # noqa: F401
+from .compression import (  # noqa: F401
+    ContentDecoder,
+    read_seekable_gzip,
+    SeekableGzipEncoder
+)
+from .danmaku import convert_to_xml, decode_danmaku_segment  # noqa: F401
+from .json_codec import loads, validate_json  # noqa: F401
 from .quality import filter_avail_quality_id  # noqa: F401
+from .sigv4 import sign_request  # noqa: F401
 from .subtitle import convert_to_srt  # noqa: F401
+from .wbi import get_mixin_key, sign_params  # noqa: F401
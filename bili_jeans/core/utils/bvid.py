@@ -0,0 +1,70 @@
+"""
+Offline conversion between BV ID and AV ID
+
+BV ID is 'BV1' with 9 base58 digits of the masked AV ID, two pairs swapped
+refer to https://github.com/SocialSisterYi/bilibili-API-collect/blob/master/docs/misc/bvid_desc.md
+the conversion is unrolled on precomputed tables, for converting IDs in bulk
+"""
+from typing import Dict, List
+
+from ..schemes import WebViewMetaData
+
+
+BVID_TABLE = 'FcwAPNKTMug3GV5Lj7EJnHpWsx4tb8haYeviqBz6rkCy12mUSDQX9RdoZf'
+BVID_PREFIXES = ('BV1', 'bv1')
+BVID_LENGTH = 12
+BVID_BASE = 58
+BVID_XOR_CODE = 23442827791579
+BVID_MASK_CODE = (1 << 51) - 1
+MAX_AID = 1 << 51
+
+# from the most significant base58 digit, their positions in BV ID are 9, 7, 5, 6, 4, 8, 3, 10, 11
+# so that the digits 2-3 and 7-8 are adjacent, which are looked up as pairs
+_BVID_PAIRS: List[str] = [a + b for a in BVID_TABLE for b in BVID_TABLE]
+# weight of the character on each position of BV ID
+_BVID_WEIGHTS: Dict[int, Dict[str, int]] = {
+    position: {char: idx * BVID_BASE ** (8 - order) for idx, char in enumerate(BVID_TABLE)}
+    for order, position in enumerate((9, 7, 5, 6, 4, 8, 3, 10, 11))
+}
+_W3, _W4, _W5, _W6, _W7, _W8, _W9, _W10, _W11 = (_BVID_WEIGHTS[position] for position in range(3, 12))
+
+
+def aid_to_bvid(aid: int) -> str:
+    if not 0 < aid < MAX_AID:
+        raise ValueError(f'AV ID out of range: {aid}')
+    value = (MAX_AID | aid) ^ BVID_XOR_CODE
+    value, d78 = divmod(value, 3364)
+    value, d6 = divmod(value, BVID_BASE)
+    value, d5 = divmod(value, BVID_BASE)
+    value, d4 = divmod(value, BVID_BASE)
+    value, d23 = divmod(value, 3364)
+    d0, d1 = divmod(value, BVID_BASE)
+    return (
+        f'BV1{BVID_TABLE[d6]}{BVID_TABLE[d4]}{_BVID_PAIRS[d23]}'
+        f'{BVID_TABLE[d1]}{BVID_TABLE[d5]}{BVID_TABLE[d0]}{_BVID_PAIRS[d78]}'
+    )
+
+
+def bvid_to_aid(bvid: str) -> int:
+    if len(bvid) != BVID_LENGTH or not bvid.startswith(BVID_PREFIXES):
+        raise ValueError(f'Invalid BV ID: {bvid}')
+    try:
+        value = (
+            _W3[bvid[3]] + _W4[bvid[4]] + _W5[bvid[5]] + _W6[bvid[6]] + _W7[bvid[7]] +
+            _W8[bvid[8]] + _W9[bvid[9]] + _W10[bvid[10]] + _W11[bvid[11]]
+        )
+    except KeyError:
+        raise ValueError(f'Invalid BV ID: {bvid}')
+    return (value & BVID_MASK_CODE) ^ BVID_XOR_CODE
+
+
+def normalize_view_meta(view_meta: WebViewMetaData) -> WebViewMetaData:
+    """
+    fill the missing one of AV ID and BV ID offline,
+    so that either one can be used as key
+    """
+    if view_meta.aid is not None and view_meta.bvid is None:
+        return WebViewMetaData(aid=view_meta.aid, bvid=aid_to_bvid(view_meta.aid))
+    if view_meta.bvid is not None and view_meta.aid is None:
+        return WebViewMetaData(aid=bvid_to_aid(view_meta.bvid), bvid=view_meta.bvid)
+    return view_meta
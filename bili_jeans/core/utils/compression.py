@@ -0,0 +1,158 @@
+"""
+Utilities to decode HTTP compressed content and persist it as seekable gzip
+
+A seekable gzip file is a sequence of independent gzip members,
+each one holds a frame of fixed-size uncompressed content.
+It is still a valid gzip file for the general tools (e.g. 'zcat'),
+and with the frame index, random access only needs to decompress one frame
+"""
+import gzip
+import json
+from typing import Dict, List, Optional, Tuple
+import zlib
+
+
+CONTENT_ENCODING_IDENTITY = 'identity'
+CONTENT_ENCODING_DEFLATE = 'deflate'
+CONTENT_ENCODING_GZIP = 'gzip'
+
+
+class ContentDecoder(object):
+    """
+    incremental decoder on the HTTP body by its 'Content-Encoding'
+    for 'deflate', both zlib-wrapped and raw stream are accepted,
+    since some of servers (e.g. Bilibili danmaku API) respond the raw one
+    """
+
+    def __init__(self, encoding: Optional[str] = None) -> None:
+        encoding = (encoding or CONTENT_ENCODING_IDENTITY).strip().lower()
+        if encoding not in (
+            CONTENT_ENCODING_IDENTITY,
+            CONTENT_ENCODING_DEFLATE,
+            CONTENT_ENCODING_GZIP
+        ):
+            raise ValueError(f'Unsupported content encoding: {encoding}')
+        self._encoding = encoding
+        self._decompressor: Optional['zlib._Decompress'] = None
+        if encoding == CONTENT_ENCODING_GZIP:
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._encoding == CONTENT_ENCODING_IDENTITY:
+            return data
+        if self._decompressor is None:
+            # zlib header: lower nibble of CMF is 8 (deflate) and the header is a multiple of 31
+            is_zlib_wrapped = (
+                len(data) >= 2 and
+                data[0] & 0x0F == 8 and
+                ((data[0] << 8) | data[1]) % 31 == 0
+            )
+            self._decompressor = zlib.decompressobj(
+                zlib.MAX_WBITS if is_zlib_wrapped else -zlib.MAX_WBITS
+            )
+        return self._decompressor.decompress(data)
+
+    def flush(self) -> bytes:
+        """
+        finish decoding, and ensure the compressed stream is complete
+        """
+        if self._decompressor is None:
+            return b''
+        remaining = self._decompressor.flush()
+        if not self._decompressor.eof:
+            raise ValueError(
+                f'Truncated {self._encoding} stream, end of compressed data not found'
+            )
+        return remaining
+
+
+class SeekableGzipEncoder(object):
+    """
+    compress content into independent gzip members with fixed-size frames
+    index records (uncompressed offset, compressed offset) of each frame
+    """
+
+    def __init__(
+        self,
+        frame_size: int,
+        compresslevel: int = 9
+    ) -> None:
+        if frame_size <= 0:
+            raise ValueError('Frame size should be positive')
+        self._frame_size = frame_size
+        self._compresslevel = compresslevel
+        self._buffer = bytearray()
+        self._uncompressed_offset = 0
+        self._compressed_offset = 0
+        self._frames: List[Tuple[int, int]] = []
+
+    def feed(self, data: bytes) -> bytes:
+        """
+        return the compressed frames that have been completed
+        """
+        self._buffer.extend(data)
+        compressed = bytearray()
+        while len(self._buffer) >= self._frame_size:
+            compressed.extend(self._compress_frame(bytes(self._buffer[:self._frame_size])))
+            del self._buffer[:self._frame_size]
+        return bytes(compressed)
+
+    def flush(self) -> bytes:
+        if not self._buffer:
+            return b''
+        compressed = self._compress_frame(bytes(self._buffer))
+        self._buffer.clear()
+        return compressed
+
+    def _compress_frame(self, frame: bytes) -> bytes:
+        compressed = gzip.compress(frame, compresslevel=self._compresslevel, mtime=0)
+        self._frames.append((self._uncompressed_offset, self._compressed_offset))
+        self._uncompressed_offset += len(frame)
+        self._compressed_offset += len(compressed)
+        return compressed
+
+    @property
+    def index(self) -> Dict:
+        return {
+            'frame_size': self._frame_size,
+            'uncompressed_size': self._uncompressed_offset,
+            'compressed_size': self._compressed_offset,
+            'frames': [list(frame) for frame in self._frames]
+        }
+
+    def dump_index(self) -> bytes:
+        return json.dumps(self.index).encode('utf-8')
+
+
+def read_seekable_gzip(
+    file: str,
+    index: Dict,
+    offset: int = 0,
+    size: Optional[int] = None
+) -> bytes:
+    """
+    read uncompressed content in [offset, offset + size)
+    only the frames covering the range would be decompressed
+    """
+    frame_size = index['frame_size']
+    frames = index['frames']
+    uncompressed_size = index['uncompressed_size']
+    end = uncompressed_size if size is None else min(offset + size, uncompressed_size)
+    if offset >= end:
+        return b''
+
+    first_idx = offset // frame_size
+    last_idx = (end - 1) // frame_size
+    result = bytearray()
+    with open(file, 'rb') as fp:
+        for frame_idx in range(first_idx, last_idx + 1):
+            _, compressed_start = frames[frame_idx]
+            compressed_end = (
+                frames[frame_idx + 1][1]
+                if frame_idx + 1 < len(frames)
+                else index['compressed_size']
+            )
+            fp.seek(compressed_start)
+            result.extend(gzip.decompress(fp.read(compressed_end - compressed_start)))
+    start_in_result = offset - first_idx * frame_size
+    return bytes(result[start_in_result:start_in_result + end - offset])
@@ -0,0 +1,90 @@
+"""
+Utilities to convert Bilibili protobuf danmaku segments to XML,
+which is the same format as the one from legacy XML API
+"""
+from io import StringIO
+from typing import Dict, Iterable, List
+from xml.sax.saxutils import escape, quoteattr
+
+from .protobuf import iter_fields, to_signed
+from ..schemes import DanmakuElem
+
+
+# field number of 'DanmakuElem' -> (field name, is string)
+DANMAKU_ELEM_FIELDS = {
+    1: ('id_field', False),
+    2: ('progress', False),
+    3: ('mode', False),
+    4: ('fontsize', False),
+    5: ('color', False),
+    6: ('mid_hash', True),
+    7: ('content', True),
+    8: ('ctime', False),
+    9: ('weight', False),
+    10: ('action', True),
+    11: ('pool', False),
+    12: ('id_str', True),
+    13: ('attr', False)
+}
+# field number of 'elems' in 'DmSegMobileReply'
+DM_SEG_REPLY_ELEMS_FIELD = 1
+DANMAKU_CHAT_SERVER = 'chat.bilibili.com'
+
+
+def decode_danmaku_segment(content: bytes) -> List[DanmakuElem]:
+    result = []
+    for field_number, value in iter_fields(content):
+        if field_number != DM_SEG_REPLY_ELEMS_FIELD or not isinstance(value, bytes):
+            continue
+        result.append(_decode_danmaku_elem(value))
+    return result
+
+
+def _decode_danmaku_elem(content: bytes) -> DanmakuElem:
+    fields: Dict = {}
+    for field_number, value in iter_fields(content):
+        if field_number not in DANMAKU_ELEM_FIELDS:
+            continue
+        field_name, is_str = DANMAKU_ELEM_FIELDS[field_number]
+        if is_str:
+            if isinstance(value, bytes):
+                fields[field_name] = value.decode('utf-8', errors='replace')
+        elif isinstance(value, int):
+            fields[field_name] = to_signed(value)
+    # the values are typed by wire format already, skip validation
+    return DanmakuElem.model_construct(**fields)
+
+
+def convert_to_xml(cid: int, elems: Iterable[DanmakuElem]) -> bytes:
+    """
+    'p' attribute of the element 'd' is composed of
+    appearance time in seconds, mode, font size, color, sent timestamp,
+    pool, sender's hash, danmaku ID and weight
+    """
+    sorted_elems = sorted(elems, key=lambda elem: (elem.progress, elem.id_field))
+
+    converted = StringIO()
+    converted.write('<?xml version="1.0" encoding="UTF-8"?>')
+    converted.write('<i>')
+    converted.write(f'<chatserver>{DANMAKU_CHAT_SERVER}</chatserver>')
+    converted.write(f'<chatid>{cid}</chatid>')
+    converted.write('<mission>0</mission>')
+    converted.write(f'<maxlimit>{len(sorted_elems)}</maxlimit>')
+    converted.write('<state>0</state>')
+    converted.write('<real_name>0</real_name>')
+    converted.write('<source>k-v</source>')
+    for elem in sorted_elems:
+        attr_p = ','.join(map(str, (
+            f'{elem.progress / 1000:.5f}',
+            elem.mode,
+            elem.fontsize,
+            elem.color,
+            elem.ctime,
+            elem.pool,
+            elem.mid_hash,
+            elem.id_str or elem.id_field,
+            elem.weight
+        )))
+        converted.write(f'<d p={quoteattr(attr_p)}>{escape(elem.content)}</d>')
+    converted.write('</i>')
+    return converted.getvalue().encode('utf-8')
@@ -0,0 +1,36 @@
+"""
+Utilities to decode JSON content of API responses
+
+response bytes are decoded by orjson when it's installed, which is optional by the 'fast' extra,
+and about twice as fast as the standard library on the fixtures,
+otherwise by the standard library as before,
+pydantic's 'model_validate_json' is slower than both on the large payloads
+"""
+import json
+from typing import Any, Dict, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+
+ModelT = TypeVar('ModelT', bound=BaseModel)
+
+
+def loads(content: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def validate_json(model_class: Type[ModelT], content: Union[bytes, str, Dict]) -> ModelT:
+    """
+    validate raw content without decoding it to text first,
+    the decoded dict is still accepted for the callers holding one
+    """
+    if isinstance(content, dict):
+        return model_class.model_validate(content)
+    return model_class.model_validate(loads(content))
@@ -0,0 +1,75 @@
+"""
+Lightweight decoder of Protocol Buffers wire format
+
+only decodes the fields of one message,
+nested message is returned as bytes which could be decoded again
+"""
+from typing import Iterator, Tuple, Union
+
+
+WIRE_TYPE_VARINT = 0
+WIRE_TYPE_I64 = 1
+WIRE_TYPE_LEN = 2
+WIRE_TYPE_I32 = 5
+
+
+def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """
+    return the decoded value and the position after it
+    """
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError('Truncated varint')
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 64:
+            raise ValueError('Too long varint')
+
+
+def iter_fields(data: bytes) -> Iterator[Tuple[int, Union[int, bytes]]]:
+    """
+    yield (field number, value) of the message
+    value is int for VARINT, I64 and I32, bytes for LEN
+    """
+    pos = 0
+    length = len(data)
+    while pos < length:
+        key, pos = decode_varint(data, pos)
+        field_number, wire_type = key >> 3, key & 0x07
+        value: Union[int, bytes]
+        if wire_type == WIRE_TYPE_VARINT:
+            value, pos = decode_varint(data, pos)
+        elif wire_type == WIRE_TYPE_LEN:
+            size, pos = decode_varint(data, pos)
+            if pos + size > length:
+                raise ValueError('Truncated length-delimited field')
+            value = data[pos:pos + size]
+            pos += size
+        elif wire_type == WIRE_TYPE_I64:
+            if pos + 8 > length:
+                raise ValueError('Truncated 64-bit field')
+            value = int.from_bytes(data[pos:pos + 8], 'little')
+            pos += 8
+        elif wire_type == WIRE_TYPE_I32:
+            if pos + 4 > length:
+                raise ValueError('Truncated 32-bit field')
+            value = int.from_bytes(data[pos:pos + 4], 'little')
+            pos += 4
+        else:
+            raise ValueError(f'Unsupported wire type: {wire_type}')
+        yield field_number, value
+
+
+def to_signed(value: int, bits: int = 64) -> int:
+    """
+    varint of negative int32/int64 is encoded as two's complement of 64 bits
+    """
+    if value >= 1 << (bits - 1):
+        value -= 1 << bits
+    return value
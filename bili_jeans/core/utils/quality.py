@@ -24,39 +24,21 @@ def filter_avail_quality_id(
     if len(quality_set) <= 0:
         raise ValueError('No alternative quality IDs')
 
-    if quality_id is not None:
-        try:
-            _ = quality_class.from_value(quality_id)
-        except ValueError:
-            quality_id = None
+    if quality_id is not None and not quality_class.is_valid(quality_id):
+        quality_id = None
 
-    quality_ids = [
-        quality_class.from_value(_quality_id)
-        for _quality_id in quality_set
-    ]
+    quality_ids = quality_class.from_values(quality_set)
 
     if quality_id is None:
-        avail_quality_items = sorted(
-            quality_ids,
-            key=lambda _q_item: _q_item.quality_order,
-            reverse=reverse
-        )
-        quality_item, *_ = avail_quality_items
-        return quality_item.quality_id
-
-    if quality_id not in quality_set:
-        greater: Optional[QualityId] = None
-        lesser: Optional[QualityId] = None
-        quality_id_obj = quality_class.from_value(quality_id)
-        for item in quality_ids:
-            if item > quality_id_obj:
-                greater = item if greater is None or greater > item else greater
-            else:
-                lesser = item if lesser is None or lesser < item else lesser
-        if lesser is not None:
-            quality_id_obj = lesser
-        elif greater is not None:
-            quality_id_obj = greater
-        return quality_id_obj.quality_id
-
-    return quality_id
+        if reverse:
+            return max(quality_ids).quality_id
+        return min(quality_ids).quality_id
+
+    if quality_id in quality_set:
+        return quality_id
+
+    quality_id_obj = quality_class.from_value(quality_id)
+    lesser = [item for item in quality_ids if item < quality_id_obj]
+    if lesser:
+        return max(lesser).quality_id
+    return min(quality_ids).quality_id
@@ -0,0 +1,128 @@
+"""
+Lightweight client of Redis serialization protocol (RESP2)
+
+only the request-response commands are supported,
+which is enough for the servers speaking Redis protocol, e.g. Redis, Valkey and KeyDB
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Union
+from urllib.parse import unquote, urlparse
+
+
+RespValue = Union[None, int, bytes, str, List[Any]]
+RespExecute = Callable[..., Awaitable[RespValue]]
+
+DEFAULT_REDIS_PORT = 6379
+
+
+def encode_command(*args: Union[bytes, str, int, float]) -> bytes:
+    """
+    encode command as array of bulk strings
+    """
+    parts = [f'*{len(args)}\r\n'.encode('utf-8')]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+        parts.append(f'${len(data)}\r\n'.encode('utf-8'))
+        parts.append(data)
+        parts.append(b'\r\n')
+    return b''.join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> RespValue:
+    """
+    simple string is returned as str, bulk string as bytes, null as None
+    error reply raises ValueError
+    """
+    line = await reader.readuntil(b'\r\n')
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b'+':
+        return body.decode('utf-8')
+    if prefix == b'-':
+        raise ValueError(f'Redis error: {body.decode("utf-8", errors="replace")}')
+    if prefix == b':':
+        return int(body)
+    if prefix == b'$':
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if prefix == b'*':
+        length = int(body)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ValueError(f'Unknown RESP reply: {line!r}')
+
+
+class RespClient(object):
+    """
+    one connection, on which commands are sent one at a time,
+    or a sequence of them by one holder, e.g. a transaction by WATCH, MULTI and EXEC
+    URL is like redis://[:password@]host[:port][/db]
+    """
+
+    def __init__(self, url: str) -> None:
+        parsed = urlparse(url)
+        if parsed.scheme != 'redis':
+            raise ValueError(f'Unsupported Redis URL: {url}')
+        self._host = parsed.hostname or '127.0.0.1'
+        self._port = parsed.port or DEFAULT_REDIS_PORT
+        self._password = unquote(parsed.password) if parsed.password else None
+        self._db = int(parsed.path.strip('/') or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def execute(self, *args: Union[bytes, str, int, float]) -> RespValue:
+        async with self.hold() as execute:
+            return await execute(*args)
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator[RespExecute]:
+        """
+        hold the connection, so the commands executed by the yielded function aren't interleaved
+        with the others, the state of connection, e.g. the watched keys and queued transaction,
+        is discarded on exception by reconnecting
+        """
+        async with self._lock:
+            try:
+                yield self._execute
+            except BaseException:
+                # e.g. cancelled before reading the reply, which would be read by the next command,
+                # the connection isn't reused then
+                self._drop()
+                raise
+
+    async def _execute(self, *args: Union[bytes, str, int, float]) -> RespValue:
+        if self._writer is None or self._writer.is_closing():
+            await self._connect()
+        assert self._reader is not None and self._writer is not None
+        self._writer.write(encode_command(*args))
+        await self._writer.drain()
+        return await read_reply(self._reader)
+
+    def _drop(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+        self._reader = None
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+            self._reader = None
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self._host, self._port)
+        if self._password is not None:
+            self._writer.write(encode_command('AUTH', self._password))
+            await self._writer.drain()
+            await read_reply(self._reader)
+        if self._db:
+            self._writer.write(encode_command('SELECT', self._db))
+            await self._writer.drain()
+            await read_reply(self._reader)
@@ -0,0 +1,77 @@
+"""
+AWS Signature Version 4 on requests of S3-compatible object storage
+
+the payload isn't hashed, as 'UNSIGNED-PAYLOAD' is accepted by S3 and its compatible servers,
+so the parts of stream are signed without being read once more
+"""
+import datetime
+import hashlib
+import hmac
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, quote, urlparse
+
+
+SIGV4_ALGORITHM = 'AWS4-HMAC-SHA256'
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+
+
+def sign_request(
+    method: str,
+    url: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    service: str = 's3',
+    headers: Optional[Dict[str, str]] = None,
+    now: Optional[datetime.datetime] = None
+) -> Dict[str, str]:
+    """
+    return new headers with 'Authorization', 'x-amz-date' and 'x-amz-content-sha256'
+    the path of URL should be URI-encoded already, which S3 doesn't encode twice
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+    date_stamp = now.strftime('%Y%m%d')
+    parsed = urlparse(url)
+
+    signed_headers = {
+        **{key.lower(): value.strip() for key, value in (headers or {}).items()},
+        'host': parsed.netloc,
+        'x-amz-content-sha256': UNSIGNED_PAYLOAD,
+        'x-amz-date': amz_date
+    }
+    header_names = sorted(signed_headers)
+    canonical_query = '&'.join(
+        f'{quote(key, safe="-_.~")}={quote(value, safe="-_.~")}'
+        for key, value in sorted(parse_qsl(parsed.query, keep_blank_values=True))
+    )
+    canonical_request = '\n'.join([
+        method.upper(),
+        parsed.path or '/',
+        canonical_query,
+        ''.join(f'{name}:{signed_headers[name]}\n' for name in header_names),
+        ';'.join(header_names),
+        UNSIGNED_PAYLOAD
+    ])
+    scope = f'{date_stamp}/{region}/{service}/aws4_request'
+    string_to_sign = '\n'.join([
+        SIGV4_ALGORITHM,
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+    ])
+
+    key = f'AWS4{secret_key}'.encode('utf-8')
+    for item in (date_stamp, region, service, 'aws4_request'):
+        key = hmac.new(key, item.encode('utf-8'), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    return {
+        **(headers or {}),
+        'x-amz-content-sha256': UNSIGNED_PAYLOAD,
+        'x-amz-date': amz_date,
+        'Authorization': (
+            f'{SIGV4_ALGORITHM} Credential={access_key}/{scope}, '
+            f'SignedHeaders={";".join(header_names)}, Signature={signature}'
+        )
+    }
@@ -0,0 +1,43 @@
+"""
+WBI signature on the query of Bilibili web API
+
+the mixin key is shuffled from the image keys in the nav response,
+and 'w_rid' is the MD5 of the sorted query concatenated with it
+"""
+import hashlib
+import time
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+
+MIXIN_KEY_ENC_TAB = [
+    46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
+    33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
+    61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
+    36, 20, 34, 44, 52
+]
+MIXIN_KEY_LENGTH = 32
+WBI_FILTERED_CHARS = str.maketrans('', '', "!'()*")
+
+
+def get_mixin_key(img_key: str, sub_key: str) -> str:
+    orig = img_key + sub_key
+    return ''.join(orig[idx] for idx in MIXIN_KEY_ENC_TAB if idx < len(orig))[:MIXIN_KEY_LENGTH]
+
+
+def sign_params(
+    params: Dict,
+    mixin_key: str,
+    wts: Optional[int] = None
+) -> Dict:
+    """
+    return new params with 'wts' and 'w_rid'
+    """
+    signed = {**params, 'wts': int(time.time()) if wts is None else wts}
+    signed = {
+        key: str(signed[key]).translate(WBI_FILTERED_CHARS)
+        for key in sorted(signed)
+    }
+    query = urlencode(signed)
+    signed['w_rid'] = hashlib.md5(f'{query}{mixin_key}'.encode('utf-8')).hexdigest()
+    return signed
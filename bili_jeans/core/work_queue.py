@@ -0,0 +1,468 @@
+"""
+Queue of page-level work shared by worker nodes
+
+a work item is leased by one worker for a while, and kept by its heartbeats,
+the item of an expired lease is leased again by the other workers,
+so completion is idempotent, only the first one of an item counts
+
+the backend is chosen by URL,
+redis://host:port/db?prefix=bili_jeans    server speaking Redis protocol
+sqlite:///path/to/file, or plain path     SQLite file, for the nodes sharing a file system
+"""
+from abc import ABC, abstractmethod
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterator, Literal, Optional, Tuple, TypeVar
+from urllib.parse import parse_qs, urlparse
+
+from pydantic import BaseModel
+
+from .schemes import PageData
+from .selection import StreamPolicy
+from .utils.resp import RespClient, RespExecute
+
+
+__all__ = ['BaseWorkQueue', 'open_work_queue', 'RedisWorkQueue', 'SQLiteWorkQueue', 'WorkItem']
+
+
+WorkStatus = Literal['queued', 'leased', 'done', 'failed']
+WORK_STATUS_QUEUED: WorkStatus = 'queued'
+WORK_STATUS_LEASED: WorkStatus = 'leased'
+WORK_STATUS_DONE: WorkStatus = 'done'
+WORK_STATUS_FAILED: WorkStatus = 'failed'
+
+T = TypeVar('T')
+
+DEFAULT_MAX_ATTEMPTS = 3
+# error of the item whose last lease is expired, e.g. its worker crashed
+WORK_ERROR_LEASE_EXPIRED = 'Lease expired at the last attempt'
+DEFAULT_REDIS_PREFIX = 'bili_jeans'
+# in the order of positional stream options of downloading page
+STREAM_OPTION_NAMES = (
+    'qn', 'reverse_qn', 'codec_id', 'reverse_codec', 'bit_rate_id', 'reverse_bit_rate', 'stream_policy'
+)
+
+
+class WorkItem(BaseModel):
+
+    key: str                                  # BV ID and CID of the page, same as manifest's
+    page: PageData
+    qn: Optional[int] = None
+    reverse_qn: bool = False
+    codec_id: Optional[int] = None
+    reverse_codec: bool = False
+    bit_rate_id: Optional[int] = None
+    reverse_bit_rate: bool = False
+    stream_policy: Optional[StreamPolicy] = None
+    options: Dict[str, Any] = {}              # the other keyword arguments of downloading page
+    attempts: int = 0                         # times of being leased, filled by queue
+
+    @property
+    def stream_options(self) -> Tuple:
+        """
+        positional stream options of downloading page
+        """
+        return tuple(getattr(self, name) for name in STREAM_OPTION_NAMES)
+
+
+class BaseWorkQueue(ABC):
+
+    @abstractmethod
+    async def put(self, item: WorkItem) -> bool:
+        """
+        return False if the item of the same key exists, which is kept as is
+        """
+
+    @abstractmethod
+    async def lease(
+        self,
+        worker: str,
+        lease_seconds: float,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ) -> Optional[WorkItem]:
+        """
+        take the next queued item, or the one whose lease is expired,
+        unless it's attempted for 'max_attempts' times, which is failed instead
+        """
+
+    @abstractmethod
+    async def heartbeat(self, key: str, worker: str, lease_seconds: float) -> bool:
+        """
+        extend the lease, return False if the worker doesn't hold it anymore
+        """
+
+    @abstractmethod
+    async def complete(self, key: str, worker: str) -> bool:
+        """
+        return True only for the first completion of the item
+        """
+
+    @abstractmethod
+    async def fail(
+        self,
+        key: str,
+        worker: str,
+        error: str,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ) -> bool:
+        """
+        release the lease, the item is queued again until it's attempted for 'max_attempts' times
+        return True if the item is failed finally
+        """
+
+    @abstractmethod
+    async def count(self) -> Dict[str, int]:
+        """
+        count of items by status
+        """
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+
+def open_work_queue(url: str) -> BaseWorkQueue:
+    parsed = urlparse(url)
+    if parsed.scheme == 'redis':
+        prefix = parse_qs(parsed.query).get('prefix', [DEFAULT_REDIS_PREFIX])[0]
+        return RedisWorkQueue(parsed._replace(query='').geturl(), prefix)
+    if parsed.scheme == 'sqlite':
+        return SQLiteWorkQueue(Path(parsed.path))
+    if parsed.scheme == '':
+        return SQLiteWorkQueue(Path(url))
+    raise ValueError(f'Unsupported work queue: {url}')
+
+
+class SQLiteWorkQueue(BaseWorkQueue):
+    """
+    every operation is one short transaction, so processes on nodes can share the file,
+    as long as the file system supports locking
+    the operations run on a dedicated thread, so waiting for the lock of file
+    doesn't block the event loop, e.g. the heartbeats and downloads
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        # only used by the thread of executor, except for initializing
+        self._conn = sqlite3.connect(
+            str(db_path),
+            isolation_level=None,
+            timeout=30,
+            check_same_thread=False
+        )
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='work_queue')
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS work_items ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'key TEXT NOT NULL UNIQUE, '
+            'item TEXT NOT NULL, '
+            'status TEXT NOT NULL, '
+            'worker TEXT, '
+            'lease_until REAL, '
+            'attempts INTEGER NOT NULL DEFAULT 0, '
+            'error TEXT)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS work_items_lease ON work_items (status, lease_until, seq)'
+        )
+
+    async def put(self, item: WorkItem) -> bool:
+        return await self._run(self._put, item)
+
+    async def lease(
+        self,
+        worker: str,
+        lease_seconds: float,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ) -> Optional[WorkItem]:
+        return await self._run(self._lease, worker, lease_seconds, max_attempts)
+
+    async def heartbeat(self, key: str, worker: str, lease_seconds: float) -> bool:
+        return await self._run(self._heartbeat, key, worker, lease_seconds)
+
+    async def complete(self, key: str, worker: str) -> bool:
+        return await self._run(self._complete, key, worker)
+
+    async def fail(
+        self,
+        key: str,
+        worker: str,
+        error: str,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ) -> bool:
+        return await self._run(self._fail, key, worker, error, max_attempts)
+
+    async def count(self) -> Dict[str, int]:
+        return await self._run(self._count)
+
+    async def close(self) -> None:
+        await self._run(self._conn.close)
+        self._executor.shutdown()
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _put(self, item: WorkItem) -> bool:
+        cursor = self._conn.execute(
+            'INSERT OR IGNORE INTO work_items (key, item, status) VALUES (?, ?, ?)',
+            (item.key, item.model_dump_json(), WORK_STATUS_QUEUED)
+        )
+        return cursor.rowcount > 0
+
+    def _lease(self, worker: str, lease_seconds: float, max_attempts: int) -> Optional[WorkItem]:
+        now = time.time()
+        with self._transaction():
+            self._conn.execute(
+                'UPDATE work_items SET status = ?, worker = NULL, lease_until = NULL, error = ? '
+                'WHERE status = ? AND lease_until < ? AND attempts >= ?',
+                (WORK_STATUS_FAILED, WORK_ERROR_LEASE_EXPIRED, WORK_STATUS_LEASED, now, max_attempts)
+            )
+            row = self._conn.execute(
+                'UPDATE work_items SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1 '
+                'WHERE seq = ('
+                '  SELECT seq FROM work_items '
+                '  WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY seq LIMIT 1'
+                ') RETURNING item, attempts',
+                (
+                    WORK_STATUS_LEASED, worker, now + lease_seconds,
+                    WORK_STATUS_QUEUED, WORK_STATUS_LEASED, now
+                )
+            ).fetchone()
+        if row is None:
+            return None
+        item = WorkItem.model_validate_json(row[0])
+        item.attempts = row[1]
+        return item
+
+    def _heartbeat(self, key: str, worker: str, lease_seconds: float) -> bool:
+        cursor = self._conn.execute(
+            'UPDATE work_items SET lease_until = ? WHERE key = ? AND status = ? AND worker = ?',
+            (time.time() + lease_seconds, key, WORK_STATUS_LEASED, worker)
+        )
+        return cursor.rowcount > 0
+
+    def _complete(self, key: str, worker: str) -> bool:
+        cursor = self._conn.execute(
+            'UPDATE work_items SET status = ?, worker = ?, lease_until = NULL, error = NULL '
+            'WHERE key = ? AND status != ?',
+            (WORK_STATUS_DONE, worker, key, WORK_STATUS_DONE)
+        )
+        return cursor.rowcount > 0
+
+    def _fail(self, key: str, worker: str, error: str, max_attempts: int) -> bool:
+        with self._transaction():
+            row = self._conn.execute(
+                'SELECT attempts FROM work_items WHERE key = ? AND status = ? AND worker = ?',
+                (key, WORK_STATUS_LEASED, worker)
+            ).fetchone()
+            if row is None:
+                # the lease is taken over, the other worker decides
+                return False
+            final = row[0] >= max_attempts
+            self._conn.execute(
+                'UPDATE work_items SET status = ?, worker = NULL, lease_until = NULL, error = ? '
+                'WHERE key = ?',
+                (WORK_STATUS_FAILED if final else WORK_STATUS_QUEUED, error, key)
+            )
+        return final
+
+    def _count(self) -> Dict[str, int]:
+        rows = self._conn.execute(
+            'SELECT status, COUNT(*) FROM work_items GROUP BY status'
+        ).fetchall()
+        return {status: count for status, count in rows}
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+
+class RedisWorkQueue(BaseWorkQueue):
+    """
+    keys under the prefix,
+    <prefix>:items      hash, key -> item JSON
+    <prefix>:queued     list of keys
+    <prefix>:leases     sorted set, key -> deadline of lease
+    <prefix>:owners     hash, key -> worker holding the lease
+    <prefix>:attempts   hash, key -> times of being leased
+    <prefix>:done       set of keys
+    <prefix>:failed     hash, key -> error
+    only the plain commands are used, the steps moving an item between the keys
+    are transactions by WATCH, MULTI and EXEC, so an item isn't lost by a worker crashing among them,
+    and the contended ones are retried, e.g. only one of workers re-queues an expired lease
+    """
+
+    def __init__(self, url: str, prefix: str = DEFAULT_REDIS_PREFIX) -> None:
+        self._client = RespClient(url)
+        self._prefix = prefix
+
+    def _name(self, name: str) -> str:
+        return f'{self._prefix}:{name}'
+
+    async def put(self, item: WorkItem) -> bool:
+        created = await self._client.execute(
+            'HSETNX', self._name('items'), item.key, item.model_dump_json()
+        )
+        if not created:
+            return False
+        await self._client.execute('RPUSH', self._name('queued'), item.key)
+        return True
+
+    async def lease(
+        self,
+        worker: str,
+        lease_seconds: float,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ) -> Optional[WorkItem]:
+        now = time.time()
+        expired = await self._client.execute(
+            'ZRANGEBYSCORE', self._name('leases'), '-inf', f'({now}'
+        )
+        assert isinstance(expired, list)
+        for key in expired:
+            await self._requeue_expired(key, now, max_attempts)
+
+        while True:
+            async with self._client.hold() as execute:
+                await execute('WATCH', self._name('queued'))
+                key = await execute('LINDEX', self._name('queued'), 0)
+                if key is None:
+                    await execute('UNWATCH')
+                    return None
+                assert isinstance(key, bytes)
+                done = await execute('SISMEMBER', self._name('done'), key)
+                await execute('MULTI')
+                await execute('LPOP', self._name('queued'))
+                if not done:
+                    await execute('HSET', self._name('owners'), key, worker)
+                    await execute('ZADD', self._name('leases'), now + lease_seconds, key)
+                    await execute('HINCRBY', self._name('attempts'), key, 1)
+                    await execute('HGET', self._name('items'), key)
+                replies = await execute('EXEC')
+            if replies is None or done:
+                # the queue is changed by the other worker since watched, or the item is dropped
+                continue
+            assert isinstance(replies, list)
+            attempts, data = replies[-2:]
+            if data is None:
+                continue
+            assert isinstance(data, bytes) and isinstance(attempts, int)
+            item = WorkItem.model_validate_json(data)
+            item.attempts = attempts
+            return item
+
+    async def _requeue_expired(self, key: bytes, now: float, max_attempts: int) -> None:
+        async with self._client.hold() as execute:
+            await execute('WATCH', self._name('leases'))
+            score = await execute('ZSCORE', self._name('leases'), key)
+            assert score is None or isinstance(score, bytes)
+            if score is None or float(score) >= now:
+                # re-queued by the other worker, or kept by heartbeat
+                await execute('UNWATCH')
+                return
+            attempts = await execute('HGET', self._name('attempts'), key)
+            assert attempts is None or isinstance(attempts, bytes)
+            done = await execute('SISMEMBER', self._name('done'), key)
+            await execute('MULTI')
+            await execute('ZREM', self._name('leases'), key)
+            await execute('HDEL', self._name('owners'), key)
+            if done:
+                # completed by another worker, which didn't hold the lease
+                pass
+            elif int(attempts or 0) >= max_attempts:
+                await execute('HSET', self._name('failed'), key, WORK_ERROR_LEASE_EXPIRED)
+            else:
+                await execute('LPUSH', self._name('queued'), key)
+            await execute('EXEC')
+
+    async def heartbeat(self, key: str, worker: str, lease_seconds: float) -> bool:
+        while True:
+            async with self._client.hold() as execute:
+                await execute('WATCH', self._name('leases'), self._name('owners'))
+                if not await self._holds_lease(execute, key, worker):
+                    await execute('UNWATCH')
+                    return False
+                await execute('MULTI')
+                await execute('ZADD', self._name('leases'), time.time() + lease_seconds, key)
+                replies = await execute('EXEC')
+            if replies is not None:
+                return True
+
+    async def complete(self, key: str, worker: str) -> bool:
+        """
+        the lease is released only by its holder,
+        the other worker completing the item leaves the lease to the holder
+        """
+        while True:
+            async with self._client.hold() as execute:
+                await execute('WATCH', self._name('leases'), self._name('owners'))
+                owner = await execute('HGET', self._name('owners'), key)
+                await execute('MULTI')
+                await execute('SADD', self._name('done'), key)
+                await execute('HDEL', self._name('failed'), key)
+                if owner is None or owner == worker.encode('utf-8'):
+                    await execute('ZREM', self._name('leases'), key)
+                    await execute('HDEL', self._name('owners'), key)
+                replies = await execute('EXEC')
+            if replies is not None:
+                assert isinstance(replies, list)
+                return bool(replies[0])
+
+    async def fail(
+        self,
+        key: str,
+        worker: str,
+        error: str,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ) -> bool:
+        while True:
+            async with self._client.hold() as execute:
+                await execute('WATCH', self._name('leases'), self._name('owners'))
+                if not await self._holds_lease(execute, key, worker):
+                    # the lease is expired and taken over, the other worker decides
+                    await execute('UNWATCH')
+                    return False
+                attempts = await execute('HGET', self._name('attempts'), key)
+                assert attempts is None or isinstance(attempts, bytes)
+                final = int(attempts or 0) >= max_attempts
+                await execute('MULTI')
+                await execute('ZREM', self._name('leases'), key)
+                await execute('HDEL', self._name('owners'), key)
+                if final:
+                    await execute('HSET', self._name('failed'), key, error)
+                else:
+                    await execute('RPUSH', self._name('queued'), key)
+                replies = await execute('EXEC')
+            if replies is not None:
+                return final
+
+    async def count(self) -> Dict[str, int]:
+        counts = {
+            WORK_STATUS_QUEUED: await self._client.execute('LLEN', self._name('queued')),
+            WORK_STATUS_LEASED: await self._client.execute('ZCARD', self._name('leases')),
+            WORK_STATUS_DONE: await self._client.execute('SCARD', self._name('done')),
+            WORK_STATUS_FAILED: await self._client.execute('HLEN', self._name('failed'))
+        }
+        return {status: count for status, count in counts.items() if isinstance(count, int) and count}
+
+    async def close(self) -> None:
+        await self._client.close()
+
+    async def _holds_lease(self, execute: RespExecute, key: str, worker: str) -> bool:
+        """
+        check on the connection held, after watching the leases and owners
+        """
+        if await execute('HGET', self._name('owners'), key) != worker.encode('utf-8'):
+            return False
+        return await execute('ZSCORE', self._name('leases'), key) is not None
@@ -0,0 +1,383 @@
+"""
+Local mock server of Bilibili API and CDN
+
+the API responds the fixtures in 'tests/data', whose resource URLs are rewritten to this server,
+the DASH media is synthetic, as large as its bandwidth and duration imply unless 'media_size' is given,
+and could be requested by Range
+synthetic videos, e.g. with hundreds of pages, 8K stream or many subtitles, are derived from the fixtures
+by 'add_video'
+
+latency, bandwidth and failure are configurable, for load tests and end-to-end benchmarks,
+run standalone with 'python -m tests.mock_server --port 18080'
+"""
+import argparse
+import asyncio
+from collections import Counter
+from contextlib import contextmanager
+import copy
+import json
+from pathlib import Path
+import random
+import re
+import struct
+from typing import Any, Dict, Iterator, Optional, Tuple
+from unittest.mock import patch
+import zlib
+
+from aiohttp import web
+
+from bili_jeans.core.utils import bvid_to_aid
+
+
+DATA_DIR_P = Path(__file__).parent.joinpath('data')
+
+FAILURE_MODE_STATUS = 'status'      # respond 503 before the body
+FAILURE_MODE_TRUNCATE = 'truncate'  # close the connection in the middle of body
+
+BLOCK_SIZE = 64 * 1024
+PATTERN = bytes(range(256)) * (BLOCK_SIZE // 256)
+# ftyp box, then the header of mdat box with 64-bit size, which is filled by media size
+FTYP_BOX = struct.pack('>I4s4sI4s4s', 24, b'ftyp', b'iso5', 512, b'iso6', b'mp41')
+MEDIA_HEADER_SIZE = len(FTYP_BOX) + 16
+COVER_CONTENT = b'\xff\xd8\xff\xe0' + b'\0' * 1020
+DANMAKU_CONTENT = (
+    '<?xml version="1.0" encoding="UTF-8"?><i><chatserver>chat.bilibili.com</chatserver>'
+    '<d p="1.00000,1,25,16777215,1700000000,0,mock,1">mock</d></i>'
+).encode('utf-8')
+
+SUBTITLE_FIXTURE_BVID = 'BV1Et4y1r7Eu'   # the fixture with subtitle
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_media_content(media_size: int, start: int, end: int) -> bytes:
+    """
+    bytes in [start, end) of the synthetic media,
+    which is a valid sequence of MP4 boxes, and the byte at offset i of mdat payload is i % 256
+    """
+    header = FTYP_BOX + struct.pack('>I4sQ', 1, b'mdat', media_size - len(FTYP_BOX))
+    parts = []
+    if start < MEDIA_HEADER_SIZE:
+        parts.append(header[start:min(end, MEDIA_HEADER_SIZE)])
+        start = MEDIA_HEADER_SIZE
+    while start < end:
+        offset = (start - MEDIA_HEADER_SIZE) % BLOCK_SIZE
+        length = min(BLOCK_SIZE - offset, end - start)
+        parts.append(PATTERN[offset:offset + length])
+        start += length
+    return b''.join(parts)
+
+
+class MockBilibiliServer(object):
+    """
+    :param latency: seconds before responding
+    :param bandwidth: bytes per second of each response, unlimited if None
+    :param failure_rate: probability of failure on each request of media
+    :param failure_mode: 'status' or 'truncate'
+    :param media_size: bytes of each media, including the MP4 box headers
+    :param media_scale: scale of the media size implied by bandwidth and duration, when 'media_size' is None
+    :param subtitle_lines: lines of each subtitle
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bandwidth: Optional[int] = None,
+        failure_rate: float = 0.0,
+        failure_mode: str = FAILURE_MODE_STATUS,
+        media_size: Optional[int] = None,
+        media_scale: float = 1.0,
+        subtitle_lines: int = 100,
+        seed: int = 0
+    ) -> None:
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.media_size = media_size
+        self.media_scale = media_scale
+        self.subtitle_lines = subtitle_lines
+        self.requests: Counter = Counter()    # count of requests by route name
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+        self._url: Optional[str] = None
+        self._videos: Dict[str, Dict[str, Dict]] = {}    # fixtures of synthetic videos by name
+        self._app = web.Application()
+        self._app.add_routes([
+            web.get('/video/{bvid}', self._get_web_view, name='web_view'),
+            web.get('/x/web-interface/view', self._get_ugc_view, name='ugc_view'),
+            web.get('/x/player/wbi/playurl', self._get_ugc_play, name='ugc_play'),
+            web.get('/x/player/wbi/v2', self._get_ugc_player, name='ugc_player'),
+            web.get('/x/v1/dm/list.so', self._get_danmaku, name='danmaku'),
+            web.get('/cover/{name}', self._get_cover, name='cover'),
+            web.get('/subtitle/{name}', self._get_subtitle, name='subtitle'),
+            web.get('/media/{bvid}/{cid}/{name}', self._get_media, name='media')
+        ])
+
+    @property
+    def url(self) -> str:
+        assert self._url is not None  # server should be started
+        return self._url
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> None:
+        self._runner = web.AppRunner(self._app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        host, port = self._runner.addresses[0][:2]
+        self._url = f'http://{host}:{port}'
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> 'MockBilibiliServer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    @contextmanager
+    def patch_urls(self) -> Iterator[None]:
+        """
+        point the API URLs of this package to the server
+        """
+        targets = {
+            'bili_jeans.core.proxy.URL_WEB_UGC_VIEW': '/x/web-interface/view',
+            'bili_jeans.core.proxy.URL_WEB_UGC_PLAY': '/x/player/wbi/playurl',
+            'bili_jeans.core.proxy.URL_WEB_UGC_PLAYER': '/x/player/wbi/v2',
+            'bili_jeans.core.download.ugc_danmaku.URL_WEB_DANMAKU': '/x/v1/dm/list.so'
+        }
+        patchers = [patch(target, f'{self.url}{path}') for target, path in targets.items()]
+        for patcher in patchers:
+            patcher.start()
+        try:
+            yield
+        finally:
+            for patcher in patchers:
+                patcher.stop()
+
+    def view_url(self, bvid: str) -> str:
+        return f'{self.url}/video/{bvid}'
+
+    def add_video(
+        self,
+        bvid: str,
+        base_bvid: str = 'BV1X54y1C74U',
+        pages: int = 1,
+        qn: Optional[int] = None,
+        bandwidth: Optional[int] = None,
+        subtitles: int = 0
+    ) -> None:
+        """
+        register a synthetic video derived from the fixtures of 'base_bvid'
+        :param pages: count of pages, whose cids follow the one of base
+        :param qn: quality number of the additional AV1 video stream, e.g. 127 for 8K
+        :param bandwidth: bits per second of the additional video stream, default to 10x of the top one
+        :param subtitles: count of subtitles of each page
+        """
+        view, play, player = (self._load_fixture(name, base_bvid) for name in ('ugc_view', 'ugc_play', 'ugc_player'))
+        aid = bvid_to_aid(bvid)
+        base_page = view['data']['pages'][0]
+        view['data'].update(
+            bvid=bvid,
+            aid=aid,
+            videos=pages,
+            pages=[
+                {**base_page, 'cid': base_page['cid'] + idx, 'page': idx + 1, 'part': f'P{idx + 1}'}
+                for idx in range(pages)
+            ]
+        )
+        player['data'].update(bvid=bvid, aid=aid)
+
+        if qn is not None:
+            dash = play['data']['dash']
+            top = max(dash['video'], key=lambda item: item['bandwidth'])
+            dash['video'].insert(0, {
+                **top,
+                'id': qn,
+                'codecid': 13,
+                'bandwidth': bandwidth or top['bandwidth'] * 10,
+                'width': 7680,
+                'height': 4320
+            })
+            play['data']['accept_quality'].insert(0, qn)
+
+        subtitle_item = self._load_fixture('ugc_player', SUBTITLE_FIXTURE_BVID)['data']['subtitle']['subtitles'][0]
+        player['data']['subtitle']['subtitles'] = [
+            {**subtitle_item, 'id': subtitle_item['id'] + idx, 'lan': f'lan-{idx}'}
+            for idx in range(subtitles)
+        ]
+        self._videos[bvid] = {'ugc_view': view, 'ugc_play': play, 'ugc_player': player}
+
+    async def _before(self, request: web.Request) -> None:
+        self.requests[request.match_info.route.name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def _get_web_view(self, request: web.Request) -> web.Response:
+        await self._before(request)
+        return web.Response(text='<!DOCTYPE html><html lang="zh-Hans"></html>', content_type='text/html')
+
+    async def _get_ugc_view(self, request: web.Request) -> web.Response:
+        await self._before(request)
+        data = self._load_fixture('ugc_view', request.query.get('bvid'))
+        if data.get('data'):
+            data['data']['pic'] = f'{self.url}/cover/{data["data"]["bvid"]}.jpg'
+        return web.json_response(data)
+
+    async def _get_ugc_play(self, request: web.Request) -> web.Response:
+        await self._before(request)
+        bvid, cid = request.query.get('bvid'), request.query.get('cid')
+        data = self._load_fixture('ugc_play', bvid)
+        dash = (data.get('data') or {}).get('dash')
+        if dash is not None:
+            audios = [
+                *(dash.get('audio') or []),
+                *((dash.get('dolby') or {}).get('audio') or []),
+                *([dash['flac']['audio']] if (dash.get('flac') or {}).get('audio') else [])
+            ]
+            for item in [*dash['video'], *audios]:
+                media_size = self.media_size or max(
+                    int(item['bandwidth'] * dash['duration'] * self.media_scale) // 8, MEDIA_HEADER_SIZE
+                )
+                url = f'{self.url}/media/{bvid}/{cid}/{item["id"]}-{item.get("codecid", 0)}-{media_size}.m4s'
+                for name in ('baseUrl', 'base_url'):
+                    item[name] = url
+                for name in ('backupUrl', 'backup_url'):
+                    item[name] = [url]
+        return web.json_response(data)
+
+    async def _get_ugc_player(self, request: web.Request) -> web.Response:
+        await self._before(request)
+        data = self._load_fixture('ugc_player', request.query.get('bvid'))
+        for item in ((data.get('data') or {}).get('subtitle') or {}).get('subtitles') or []:
+            item['subtitle_url'] = f'{self.url}/subtitle/{item["id"]}.json'
+        return web.json_response(data)
+
+    async def _get_danmaku(self, request: web.Request) -> web.Response:
+        await self._before(request)
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        body = compressor.compress(DANMAKU_CONTENT) + compressor.flush()
+        return web.Response(body=body, content_type='text/xml', headers={'Content-Encoding': 'deflate'})
+
+    async def _get_cover(self, request: web.Request) -> web.Response:
+        await self._before(request)
+        return web.Response(body=COVER_CONTENT, content_type='image/jpeg')
+
+    async def _get_subtitle(self, request: web.Request) -> web.Response:
+        await self._before(request)
+        return web.json_response({
+            'font_size': 0.4,
+            'font_color': '#FFFFFF',
+            'background_alpha': 0.5,
+            'background_color': '#9C27B0',
+            'Stroke': 'none',
+            'body': [
+                {'from': idx * 2.0, 'to': idx * 2.0 + 1.5, 'location': 2, 'content': f'mock subtitle line {idx}'}
+                for idx in range(self.subtitle_lines)
+            ]
+        })
+
+    async def _get_media(self, request: web.Request) -> web.StreamResponse:
+        await self._before(request)
+        media_size = int(request.match_info['name'].split('.')[0].rsplit('-', 1)[-1])
+        failed = self.failure_rate > 0 and self._random.random() < self.failure_rate
+        if failed and self.failure_mode == FAILURE_MODE_STATUS:
+            raise web.HTTPServiceUnavailable()
+
+        byte_range = self._parse_range(request.headers.get('Range'), media_size)
+        headers = {'Accept-Ranges': 'bytes', 'Content-Type': 'video/mp4'}
+        if byte_range is None:
+            start, end, status = 0, media_size, 200
+        else:
+            start, end = byte_range
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end - 1}/{media_size}'
+        headers['Content-Length'] = str(end - start)
+
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        # truncate at the middle of body
+        stop = (start + end) // 2 if failed else end
+        pos = start
+        while pos < stop:
+            chunk_size = min(BLOCK_SIZE, stop - pos)
+            await response.write(get_media_content(media_size, pos, pos + chunk_size))
+            self.bytes_sent += chunk_size
+            pos += chunk_size
+            if self.bandwidth:
+                await asyncio.sleep(chunk_size / self.bandwidth)
+        if failed:
+            assert request.transport is not None
+            request.transport.close()
+            return response
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    def _parse_range(value: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+        """
+        return [start, end) of the single range, None for the whole content
+        """
+        if value is None:
+            return None
+        match = RANGE_PATTERN.match(value.strip())
+        if match is None or match.group(1) == match.group(2) == '':
+            return None
+        if match.group(1) == '':
+            start, end = max(size - int(match.group(2)), 0), size
+        else:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) + 1, size) if match.group(2) else size
+        if start >= size or start >= end:
+            raise web.HTTPRequestRangeNotSatisfiable(headers={'Content-Range': f'bytes */{size}'})
+        return start, end
+
+    def _load_fixture(self, name: str, bvid: Optional[str]) -> Dict:
+        if bvid in self._videos:
+            # the handlers rewrite the data in place
+            return copy.deepcopy(self._videos[bvid][name])
+        file_p = DATA_DIR_P.joinpath(name, f'{name}_{bvid}.json')
+        if bvid is None or not file_p.exists():
+            return {'code': -404, 'message': '啥都木有', 'ttl': 1}
+        return json.loads(file_p.read_bytes())
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = MockBilibiliServer(
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        failure_rate=args.failure_rate,
+        failure_mode=args.failure_mode,
+        media_size=args.media_size,
+        media_scale=args.media_scale
+    )
+    await server.start(args.host, args.port)
+    print(f'Mock server serving on {server.url}', flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--bandwidth', type=int, default=None, help='bytes per second of each response')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--failure-mode', choices=[FAILURE_MODE_STATUS, FAILURE_MODE_TRUNCATE], default='status')
+    parser.add_argument('--media-size', type=int, default=None, help='bytes of each media')
+    parser.add_argument('--media-scale', type=float, default=1.0, help='scale of the implied media size')
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+In-memory stand-in of Redis server, for the commands used by work queue
+
+transactions by WATCH, MULTI and EXEC are supported per connection,
+a watched key is changed by any of the writing commands on it
+"""
+import asyncio
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from bili_jeans.core.utils.resp import read_reply
+
+
+WRITING_COMMANDS: Set[str] = {
+    'HSETNX', 'HSET', 'HDEL', 'HINCRBY', 'RPUSH', 'LPUSH', 'LPOP', 'SADD', 'ZADD', 'ZREM'
+}
+
+
+class RedisStandIn(object):
+
+    def __init__(self) -> None:
+        self.data: Dict[bytes, Any] = {}
+        self._versions: Dict[bytes, int] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._commands: Dict[str, Callable[..., Any]] = {
+            name[len('cmd_'):].upper(): getattr(self, name)
+            for name in dir(self) if name.startswith('cmd_')
+        }
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f'redis://{host}:{port}/0'
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+
+    async def stop(self) -> None:
+        assert self._server is not None
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        watched: Dict[bytes, int] = {}
+        transaction: Optional[List[List[bytes]]] = None
+        try:
+            while True:
+                try:
+                    args = await read_reply(reader)
+                except asyncio.IncompleteReadError:
+                    return
+                assert isinstance(args, list)
+                name = args[0].decode('utf-8').upper()
+                if name == 'WATCH':
+                    watched.update({key: self._versions.get(key, 0) for key in args[1:]})
+                    writer.write(b'+OK\r\n')
+                elif name == 'UNWATCH':
+                    watched = {}
+                    writer.write(b'+OK\r\n')
+                elif name == 'MULTI':
+                    transaction = []
+                    writer.write(b'+OK\r\n')
+                elif name == 'EXEC':
+                    assert transaction is not None
+                    if any(self._versions.get(key, 0) != version for key, version in watched.items()):
+                        writer.write(b'*-1\r\n')
+                    else:
+                        replies = [self._execute(queued) for queued in transaction]
+                        writer.write(b'*%d\r\n' % len(replies) + b''.join(replies))
+                    watched, transaction = {}, None
+                elif transaction is not None:
+                    transaction.append(args)
+                    writer.write(b'+QUEUED\r\n')
+                else:
+                    writer.write(self._execute(args))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def _execute(self, args: List[bytes]) -> bytes:
+        name = args[0].decode('utf-8').upper()
+        command = self._commands.get(name)
+        if command is None:
+            return b'-ERR unknown command\r\n'
+        result = command(*args[1:])
+        if name in WRITING_COMMANDS:
+            self._versions[args[1]] = self._versions.get(args[1], 0) + 1
+        return self._encode(result)
+
+    def _encode(self, value: Any) -> bytes:
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, bool) or isinstance(value, int):
+            return f':{int(value)}\r\n'.encode('utf-8')
+        if isinstance(value, str):
+            return f'+{value}\r\n'.encode('utf-8')
+        if isinstance(value, bytes):
+            return b'$%d\r\n%s\r\n' % (len(value), value)
+        if isinstance(value, float):
+            return self._encode(repr(value).encode('utf-8'))
+        return b'*%d\r\n' % len(value) + b''.join(self._encode(item) for item in value)
+
+    def _get(self, key: bytes, factory: Callable[[], Any]) -> Any:
+        return self.data.setdefault(key, factory())
+
+    def cmd_ping(self) -> str:
+        return 'PONG'
+
+    def cmd_select(self, db: bytes) -> str:
+        return 'OK'
+
+    def cmd_hsetnx(self, key: bytes, field: bytes, value: bytes) -> bool:
+        hash_ = self._get(key, dict)
+        if field in hash_:
+            return False
+        hash_[field] = value
+        return True
+
+    def cmd_hset(self, key: bytes, field: bytes, value: bytes) -> bool:
+        hash_ = self._get(key, dict)
+        created = field not in hash_
+        hash_[field] = value
+        return created
+
+    def cmd_hget(self, key: bytes, field: bytes) -> Optional[bytes]:
+        return self._get(key, dict).get(field)
+
+    def cmd_hdel(self, key: bytes, field: bytes) -> bool:
+        return self._get(key, dict).pop(field, None) is not None
+
+    def cmd_hincrby(self, key: bytes, field: bytes, increment: bytes) -> int:
+        hash_ = self._get(key, dict)
+        value = int(hash_.get(field, 0)) + int(increment)
+        hash_[field] = str(value).encode('utf-8')
+        return value
+
+    def cmd_hlen(self, key: bytes) -> int:
+        return len(self._get(key, dict))
+
+    def cmd_rpush(self, key: bytes, value: bytes) -> int:
+        list_ = self._get(key, deque)
+        list_.append(value)
+        return len(list_)
+
+    def cmd_lpush(self, key: bytes, value: bytes) -> int:
+        list_ = self._get(key, deque)
+        list_.appendleft(value)
+        return len(list_)
+
+    def cmd_lpop(self, key: bytes) -> Optional[bytes]:
+        list_ = self._get(key, deque)
+        return list_.popleft() if list_ else None
+
+    def cmd_lindex(self, key: bytes, index: bytes) -> Optional[bytes]:
+        list_ = self._get(key, deque)
+        return list_[int(index)] if -len(list_) <= int(index) < len(list_) else None
+
+    def cmd_llen(self, key: bytes) -> int:
+        return len(self._get(key, deque))
+
+    def cmd_sadd(self, key: bytes, member: bytes) -> bool:
+        set_ = self._get(key, set)
+        if member in set_:
+            return False
+        set_.add(member)
+        return True
+
+    def cmd_sismember(self, key: bytes, member: bytes) -> bool:
+        return member in self._get(key, set)
+
+    def cmd_scard(self, key: bytes) -> int:
+        return len(self._get(key, set))
+
+    def cmd_zadd(self, key: bytes, score: bytes, member: bytes) -> bool:
+        zset = self._get(key, dict)
+        created = member not in zset
+        zset[member] = float(score)
+        return created
+
+    def cmd_zrem(self, key: bytes, member: bytes) -> bool:
+        return self._get(key, dict).pop(member, None) is not None
+
+    def cmd_zscore(self, key: bytes, member: bytes) -> Optional[float]:
+        return self._get(key, dict).get(member)
+
+    def cmd_zcard(self, key: bytes) -> int:
+        return len(self._get(key, dict))
+
+    def cmd_zrangebyscore(self, key: bytes, min_: bytes, max_: bytes) -> List[bytes]:
+        def _parse(value: bytes) -> Callable[[float], bool]:
+            text = value.decode('utf-8')
+            exclusive = text.startswith('(')
+            bound = float(text.lstrip('('))
+            if value is min_:
+                return (lambda score: score > bound) if exclusive else (lambda score: score >= bound)
+            return (lambda score: score < bound) if exclusive else (lambda score: score <= bound)
+
+        above, below = _parse(min_), _parse(max_)
+        return [
+            member for member, score in sorted(self._get(key, dict).items(), key=lambda item: item[1])
+            if above(score) and below(score)
+        ]
@@ -0,0 +1,144 @@
+"""
+In-memory stand-in of S3-compatible object storage, e.g. MinIO,
+for the requests of single and multipart upload
+"""
+import asyncio
+import datetime
+import hashlib
+from typing import Dict, List, Optional, Tuple
+import uuid
+from xml.etree.ElementTree import fromstring
+
+from aiohttp import web
+
+from bili_jeans.core.utils import sign_request
+
+
+S3_XMLNS = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+
+class S3StandIn(object):
+    """
+    the signature of each request is verified by the credentials given
+    'fail_part' responds 500 on uploading the part of that number
+    """
+
+    def __init__(
+        self,
+        access_key: str = 'minioadmin',
+        secret_key: str = 'minioadmin',
+        region: str = 'us-east-1',
+        part_delay: float = 0.01
+    ) -> None:
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.objects: Dict[Tuple[str, str], bytes] = {}
+        self.uploads: Dict[str, Dict[int, bytes]] = {}
+        self.requests: List[Tuple[str, str]] = []   # method and query keys
+        self.fail_part: Optional[int] = None
+        self.peak_parts = 0
+        self._part_delay = part_delay
+        self._parts_in_flight = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._port = 0
+
+    @property
+    def endpoint(self) -> str:
+        return f'http://127.0.0.1:{self._port}'
+
+    async def start(self) -> None:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route('*', '/{bucket}/{key:.+}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self._port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        assert self._runner is not None
+        await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests.append((request.method, '&'.join(sorted(request.query))))
+        if not self._verify_signature(request):
+            return web.Response(status=403)
+        bucket = request.match_info['bucket']
+        key = request.match_info['key']
+        body = await request.read()
+
+        if request.method == 'PUT' and 'partNumber' in request.query:
+            return await self._upload_part(request, body)
+        if request.method == 'PUT':
+            self.objects[(bucket, key)] = body
+            return web.Response(headers={'ETag': _get_etag(body)})
+        if request.method == 'POST' and 'uploads' in request.query:
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {}
+            return _xml_response(
+                f'<InitiateMultipartUploadResult xmlns="{S3_XMLNS}"><Bucket>{bucket}</Bucket>'
+                f'<Key>{key}</Key><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>'
+            )
+        if request.method == 'POST' and 'uploadId' in request.query:
+            return self._complete(request, bucket, key, body)
+        if request.method == 'DELETE' and 'uploadId' in request.query:
+            self.uploads.pop(request.query['uploadId'], None)
+            return web.Response(status=204)
+        return web.Response(status=405)
+
+    async def _upload_part(self, request: web.Request, body: bytes) -> web.Response:
+        parts = self.uploads.get(request.query['uploadId'])
+        if parts is None:
+            return web.Response(status=404)
+        part_number = int(request.query['partNumber'])
+        self._parts_in_flight += 1
+        self.peak_parts = max(self.peak_parts, self._parts_in_flight)
+        try:
+            await asyncio.sleep(self._part_delay)
+        finally:
+            self._parts_in_flight -= 1
+        if part_number == self.fail_part:
+            return web.Response(status=500)
+        parts[part_number] = body
+        return web.Response(headers={'ETag': _get_etag(body)})
+
+    def _complete(self, request: web.Request, bucket: str, key: str, body: bytes) -> web.Response:
+        parts = self.uploads.pop(request.query['uploadId'], None)
+        if parts is None:
+            return web.Response(status=404)
+        content = bytearray()
+        for part in fromstring(body):
+            part_number = int(part.findtext('PartNumber') or 0)
+            if part_number not in parts or part.findtext('ETag') != _get_etag(parts[part_number]):
+                # the same as S3, which responds the error with status 200
+                return _xml_response('<Error><Code>InvalidPart</Code><Message>Part mismatched</Message></Error>')
+            content += parts[part_number]
+        self.objects[(bucket, key)] = bytes(content)
+        return _xml_response(
+            f'<CompleteMultipartUploadResult xmlns="{S3_XMLNS}"><Key>{key}</Key>'
+            f'<ETag>{_get_etag(content)}</ETag></CompleteMultipartUploadResult>'
+        )
+
+    def _verify_signature(self, request: web.Request) -> bool:
+        amz_date = request.headers.get('x-amz-date')
+        if amz_date is None:
+            return False
+        now = datetime.datetime.strptime(amz_date, '%Y%m%dT%H%M%SZ').replace(tzinfo=datetime.timezone.utc)
+        expected = sign_request(
+            request.method,
+            f'http://{request.host}{request.raw_path}',
+            self.access_key,
+            self.secret_key,
+            self.region,
+            now=now
+        )
+        return request.headers.get('Authorization') == expected['Authorization']
+
+
+def _get_etag(content: bytes) -> str:
+    return f'"{hashlib.md5(content).hexdigest()}"'
+
+
+def _xml_response(text: str) -> web.Response:
+    return web.Response(body=text.encode('utf-8'), content_type='application/xml')
@@ -4,7 +4,11 @@ from unittest.mock import patch, AsyncMock
 
 from bili_jeans.cli import cli
 from bili_jeans.core.schemes import WebViewMetaData
-from tests.utils import MockAsyncIterator
+from tests.utils import mock_stream_request
+
+
+# refused at once, without any request out
+BAD_URL = 'http://127.0.0.1:1/not/a/video'
 
 
 with open('tests/data/ugc_view/ugc_view_BV1X54y1C74U.json', 'r') as fp:
@@ -15,7 +19,7 @@ with open('tests/data/ugc_player/ugc_player_BV1X54y1C74U.json', 'r') as fp:
     DATA_PLAYER = json.load(fp)
 
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
 @patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
@@ -37,7 +41,7 @@ def test_download(
     mock_get_ugc_view_resp_req.return_value = DATA_VIEW
     mock_get_ugc_play_resp_req.return_value = DATA_PLAY
     mock_get_ugc_player_resp_req.return_value = DATA_PLAYER
-    mock_get_resource_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_resource_req.side_effect = mock_stream_request
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
 
@@ -56,3 +60,19 @@ def test_download(
     # download video and audio separately
     assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 2
     assert result.exit_code == 0
+
+
+def test_byte_size_param_type():
+    from bili_jeans.cli.app import BYTE_SIZE
+
+    assert BYTE_SIZE.convert('1024', None, None) == 1024
+    assert BYTE_SIZE.convert('500M', None, None) == 500 * 1024 ** 2
+    assert BYTE_SIZE.convert('1.5GiB', None, None) == 3 * 1024 ** 3 // 2
+
+
+def test_download_with_bad_url(tmp_path):
+    runner = CliRunner()
+    result = runner.invoke(cli, ['download', BAD_URL, '-d', str(tmp_path)])
+
+    assert result.exit_code == 1
+    assert 'Parse resource ID failed' in result.output
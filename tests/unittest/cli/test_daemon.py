@@ -0,0 +1,102 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from bili_jeans.cli.daemon import _work, create_app
+from bili_jeans.core.jobs import JobStore
+
+
+# refused at once, without any request out
+BAD_URL = 'http://127.0.0.1:1/not/a/video'
+
+
+async def test_daemon_api(tmp_path):
+    store = JobStore(tmp_path.joinpath('jobs.sqlite3'))
+    wakeup = asyncio.Event()
+    async with TestClient(TestServer(create_app(store, wakeup))) as client:
+        resp = await client.post('/jobs', json=[
+            {'url': 'https://www.bilibili.com/video/BV1X54y1C74U'},
+            {
+                'url': 'https://www.bilibili.com/video/BV1tN4y1F79k',
+                'priority': 5,
+                'options': {'enable_cover': True, 'stream_policy': {'max_qn': 80}}
+            }
+        ])
+        assert resp.status == 201
+        job_ids = [job['id'] for job in (await resp.json())['jobs']]
+        assert wakeup.is_set()
+
+        resp = await client.post('/jobs', json={'url': 'dummy', 'options': {'unknown': 1}})
+        assert resp.status == 400
+        resp = await client.post('/jobs', json={'url': 'dummy', 'options': {'sess_data': 'dummy'}})
+        assert resp.status == 400
+        resp = await client.post('/jobs', json={'url': 'dummy', 'options': {'concurrency': 'many'}})
+        assert resp.status == 400
+
+        resp = await client.get(f'/jobs/{job_ids[1]}')
+        assert (await resp.json())['priority'] == 5
+
+        resp = await client.delete(f'/jobs/{job_ids[0]}')
+        assert (await resp.json())['status'] == 'cancelled'
+        resp = await client.delete(f'/jobs/{job_ids[0]}')
+        assert resp.status == 409
+
+        resp = await client.get('/jobs', params={'status': 'queued'})
+        assert [job['id'] for job in (await resp.json())['jobs']] == [job_ids[1]]
+        resp = await client.get('/status')
+        assert (await resp.json()) == {'jobs': {'cancelled': 1, 'queued': 1}}
+        resp = await client.get('/jobs/0')
+        assert resp.status == 404
+
+
+async def test_daemon_api_redacts_secret_options(tmp_path):
+    store = JobStore(tmp_path.joinpath('jobs.sqlite3'))
+    # stored by the previous versions
+    job = store.submit('https://www.bilibili.com/video/BV1X54y1C74U', {'sess_data': 'dummy_sess_data'})
+    async with TestClient(TestServer(create_app(store, asyncio.Event()))) as client:
+        resp = await client.get(f'/jobs/{job.id_field}')
+        assert (await resp.json())['options'] == {'sess_data': '***'}
+        resp = await client.get('/jobs')
+        assert 'dummy_sess_data' not in await resp.text()
+
+
+@patch('bili_jeans.cli.daemon.run', new_callable=AsyncMock)
+async def test_daemon_work(mock_run, tmp_path):
+    store = JobStore(tmp_path.joinpath('jobs.sqlite3'))
+    wakeup = asyncio.Event()
+    mock_run.side_effect = [None, ValueError('dummy failure')]
+    worker = asyncio.create_task(_work(store, wakeup, str(tmp_path), 'dummy_sess_data'))
+
+    ok = store.submit('https://www.bilibili.com/video/BV1X54y1C74U', {'stream_policy': {'max_qn': 80}})
+    failed = store.submit('https://www.bilibili.com/video/BV1tN4y1F79k')
+    wakeup.set()
+    for _ in range(500):
+        await asyncio.sleep(0.01)
+        if store.count().get('queued', 0) + store.count().get('running', 0) == 0:
+            break
+    worker.cancel()
+
+    assert store.get(ok.id_field).status == 'done'
+    assert store.get(failed.id_field).status == 'failed'
+    assert store.get(failed.id_field).error == 'ValueError: dummy failure'
+    first_call = mock_run.call_args_list[0]
+    assert first_call.kwargs['sess_data'] == 'dummy_sess_data'
+    assert first_call.kwargs['stream_policy'].max_qn == 80
+
+
+async def test_daemon_work_with_bad_url(tmp_path):
+    store = JobStore(tmp_path.joinpath('jobs.sqlite3'))
+    wakeup = asyncio.Event()
+    worker = asyncio.create_task(_work(store, wakeup, str(tmp_path), None))
+
+    job = store.submit(BAD_URL)
+    wakeup.set()
+    for _ in range(500):
+        await asyncio.sleep(0.01)
+        if store.get(job.id_field).status not in ('queued', 'running'):
+            break
+    worker.cancel()
+
+    assert store.get(job.id_field).status == 'failed'
+    assert store.get(job.id_field).error.startswith('ValueError: Parse resource ID failed')
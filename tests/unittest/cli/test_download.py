@@ -1,9 +1,18 @@
 import json
 from unittest.mock import patch, AsyncMock
 
-from bili_jeans.cli.download import run
+import pytest
+
+from bili_jeans.cli.download import run, run_space
 from bili_jeans.core.schemes import WebViewMetaData
-from tests.utils import MockAsyncIterator, MOCK_SESS_DATA
+from bili_jeans.core.selection import StreamPolicy
+from tests.mock_server import DANMAKU_CONTENT, get_media_content, MockBilibiliServer
+from tests.utils import (
+    get_mock_nav_response,
+    get_mock_space_videos_response,
+    MOCK_SESS_DATA,
+    mock_stream_request
+)
 
 
 HTML_CONTENT = b'<!DOCTYPE html><html lang="zh-Hans"></html>'
@@ -39,7 +48,7 @@ with open('tests/data/ugc_player/ugc_player_BV1Et4y1r7Eu.json', 'r') as fp:
     DATA_PLAYER_WITH_SUBTITLE = json.load(fp)
 
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
 @patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
@@ -61,7 +70,7 @@ async def test_run(
     mock_get_ugc_view_resp_req.return_value = DATA_VIEW
     mock_get_ugc_play_resp_req.return_value = DATA_PLAY
     mock_get_ugc_player_resp_req.return_value = DATA_PLAYER
-    mock_get_resource_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_resource_req.side_effect = mock_stream_request
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
 
@@ -76,7 +85,7 @@ async def test_run(
     assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 2
 
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
 @patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
@@ -98,7 +107,7 @@ async def test_run_with_flac(
     mock_get_ugc_view_resp_req.return_value = DATA_VIEW_WITH_FLAC
     mock_get_ugc_play_resp_req.return_value = DATA_PLAY_WITH_FLAC
     mock_get_ugc_player_resp_req.return_value = DATA_PLAYER_WITH_FLAC
-    mock_get_resource_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_resource_req.side_effect = mock_stream_request
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
 
@@ -113,7 +122,7 @@ async def test_run_with_flac(
     assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 2
 
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
 @patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
@@ -135,7 +144,7 @@ async def test_run_with_dolby(
     mock_get_ugc_view_resp_req.return_value = DATA_VIEW_WITH_DOLBY
     mock_get_ugc_play_resp_req.return_value = DATA_PLAY_WITH_DOLBY
     mock_get_ugc_player_resp_req.return_value = DATA_PLAYER_WITH_DOLBY
-    mock_get_resource_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_resource_req.side_effect = mock_stream_request
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
 
@@ -150,7 +159,7 @@ async def test_run_with_dolby(
     assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 2
 
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
 @patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
@@ -172,7 +181,7 @@ async def test_run_with_declared_quality(
     mock_get_ugc_view_resp_req.return_value = DATA_VIEW
     mock_get_ugc_play_resp_req.return_value = DATA_PLAY
     mock_get_ugc_player_resp_req.return_value = DATA_PLAYER
-    mock_get_resource_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_resource_req.side_effect = mock_stream_request
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
 
@@ -191,7 +200,7 @@ async def test_run_with_declared_quality(
     assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 2
 
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
 @patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
@@ -213,7 +222,7 @@ async def test_run_for_paid_ugc_without_privilege(
     mock_get_ugc_view_resp_req.return_value = DATA_VIEW_UNPURCHASED
     mock_get_ugc_play_resp_req.return_value = DATA_PLAY_UNPURCHASED
     mock_get_ugc_player_resp_req.return_value = DATA_PLAYER_UNPURCHASED
-    mock_get_resource_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_resource_req.side_effect = mock_stream_request
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
 
@@ -233,7 +242,7 @@ async def test_run_for_paid_ugc_without_privilege(
     assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 1
 
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
 @patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
@@ -255,7 +264,7 @@ async def test_run_enable_danmaku(
     mock_get_ugc_view_resp_req.return_value = DATA_VIEW
     mock_get_ugc_play_resp_req.return_value = DATA_PLAY
     mock_get_ugc_player_resp_req.return_value = DATA_PLAYER
-    mock_get_resource_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_resource_req.side_effect = mock_stream_request
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
 
@@ -271,7 +280,7 @@ async def test_run_enable_danmaku(
     assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 3
 
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
 @patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
@@ -293,7 +302,7 @@ async def test_run_enable_cover(
     mock_get_ugc_view_resp_req.return_value = DATA_VIEW
     mock_get_ugc_play_resp_req.return_value = DATA_PLAY
     mock_get_ugc_player_resp_req.return_value = DATA_PLAYER
-    mock_get_resource_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_resource_req.side_effect = mock_stream_request
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
 
@@ -309,7 +318,7 @@ async def test_run_enable_cover(
     assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 3
 
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.convert_to_srt')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
@@ -333,7 +342,7 @@ async def test_run_with_subtitle(
     mock_get_ugc_view_resp_req.return_value = DATA_VIEW_WITH_SUBTITLE
     mock_get_ugc_play_resp_req.return_value = DATA_PLAY_WITH_SUBTITLE
     mock_get_ugc_player_resp_req.return_value = DATA_PLAYER_WITH_SUBTITLE
-    mock_get_resource_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_resource_req.side_effect = mock_stream_request
     mock_convert_to_srt.return_value = b''
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
@@ -352,3 +361,183 @@ async def test_run_with_subtitle(
     # subtitle (zh-CN and ai-zh) and their SRT format,
     # and danmaku separately
     assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 8
+
+
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
+@patch('bili_jeans.core.download.download_task.Path')
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+@patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
+@patch('bili_jeans.core.proxy.get_ugc_play_response', new_callable=AsyncMock)
+@patch('bili_jeans.core.proxy.get_ugc_view_response', new_callable=AsyncMock)
+@patch('bili_jeans.cli.download.parse_web_view_url', new_callable=AsyncMock)
+async def test_run_with_stream_policy(
+    mock_parse_web_view_url,
+    mock_get_ugc_view_resp_req,
+    mock_get_ugc_play_resp_req,
+    mock_get_ugc_player_resp_req,
+    mock_get_resource_req,
+    mock_file_p,
+    mock_async_open
+):
+    mock_parse_web_view_url.return_value = WebViewMetaData(
+        bvid='BV13L4y1K7th'
+    )
+    mock_get_ugc_view_resp_req.return_value = DATA_VIEW_WITH_DOLBY
+    mock_get_ugc_play_resp_req.return_value = DATA_PLAY_WITH_DOLBY
+    mock_get_ugc_player_resp_req.return_value = DATA_PLAYER_WITH_DOLBY
+    mock_get_resource_req.side_effect = mock_stream_request
+    mock_file_p.return_value.parent.return_value.mkdir.return_value = None
+    mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
+
+    await run(
+        url='https://www.bilibili.com/video/BV13L4y1K7th/?vd_source=eab9f46166d54e0b07ace25e908097ae',
+        directory='/tmp',
+        stream_policy=StreamPolicy(max_qn=116, codecs=[13], max_bandwidth=1500000),
+        skip_mux=True,
+        sess_data=MOCK_SESS_DATA
+    )
+
+    # download video, audio separately
+    assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 2
+    requested_urls = [call.args[0] for call in mock_get_resource_req.call_args_list]
+    assert any('30232.m4s' in url for url in requested_urls)
+
+
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
+@patch('bili_jeans.core.download.download_task.Path')
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+@patch('bili_jeans.core.proxy.get_ugc_player_response', new_callable=AsyncMock)
+@patch('bili_jeans.core.proxy.get_ugc_play_response', new_callable=AsyncMock)
+@patch('bili_jeans.core.proxy.get_ugc_view_response', new_callable=AsyncMock)
+@patch('bili_jeans.cli.download.parse_web_view_url', new_callable=AsyncMock)
+async def test_run_with_budget(
+    mock_parse_web_view_url,
+    mock_get_ugc_view_resp_req,
+    mock_get_ugc_play_resp_req,
+    mock_get_ugc_player_resp_req,
+    mock_get_resource_req,
+    mock_file_p,
+    mock_async_open
+):
+    mock_parse_web_view_url.return_value = WebViewMetaData(
+        bvid='BV13L4y1K7th'
+    )
+    mock_get_ugc_view_resp_req.return_value = DATA_VIEW_WITH_DOLBY
+    mock_get_ugc_play_resp_req.return_value = DATA_PLAY_WITH_DOLBY
+    mock_get_ugc_player_resp_req.return_value = DATA_PLAYER_WITH_DOLBY
+    mock_get_resource_req.side_effect = mock_stream_request
+    mock_file_p.return_value.parent.return_value.mkdir.return_value = None
+    mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
+
+    await run(
+        url='https://www.bilibili.com/video/BV13L4y1K7th/?vd_source=eab9f46166d54e0b07ace25e908097ae',
+        directory='/tmp',
+        budget=1,
+        skip_mux=True,
+        sess_data=MOCK_SESS_DATA
+    )
+
+    # the smallest streams are downloaded when budget is unreachable
+    assert mock_async_open.return_value.__aenter__.return_value.write.call_count == 2
+    requested_urls = [call.args[0] for call in mock_get_resource_req.call_args_list]
+    assert any('30216.m4s' in url for url in requested_urls)
+
+
+@patch('bili_jeans.cli.download.run', new_callable=AsyncMock)
+@patch('bili_jeans.core.proxy.get_space_videos_response', new_callable=AsyncMock)
+@patch('bili_jeans.core.proxy.get_nav_response', new_callable=AsyncMock)
+async def test_run_space_resume(
+    mock_get_nav_resp_req,
+    mock_get_space_videos_resp_req,
+    mock_run,
+    tmp_path
+):
+    mock_get_nav_resp_req.return_value = get_mock_nav_response()
+    mock_get_space_videos_resp_req.return_value = get_mock_space_videos_response(
+        ['BV1', 'BV2', 'BV3'], 1, 30, 3
+    )
+    mock_run.side_effect = [None, ValueError('dummy failure'), None]
+
+    await run_space(mid=1, directory=str(tmp_path), enable_cover=True)
+
+    assert mock_run.call_count == 3
+    assert mock_run.call_args.kwargs['url'] == 'https://www.bilibili.com/video/BV3'
+    assert mock_run.call_args.kwargs['enable_cover'] is True
+    assert json.loads(tmp_path.joinpath('.space_1.json').read_text()) == ['BV1', 'BV3']
+
+    # only the failed one is downloaded again
+    mock_run.reset_mock(side_effect=True)
+    await run_space(mid=1, directory=str(tmp_path))
+
+    assert [call.kwargs['url'] for call in mock_run.call_args_list] == ['https://www.bilibili.com/video/BV2']
+
+
+async def test_run_with_mock_server(tmp_path):
+    async with MockBilibiliServer(media_size=300000) as server:
+        with server.patch_urls():
+            await run(
+                url=server.view_url('BV1X54y1C74U'),
+                directory=str(tmp_path),
+                enable_danmaku=True,
+                enable_cover=True,
+                skip_mux=True
+            )
+
+    page_dir_p = tmp_path.joinpath('BV1X54y1C74U')
+    assert page_dir_p.joinpath('239927346.mp4').read_bytes() == get_media_content(300000, 0, 300000)
+    assert page_dir_p.joinpath('239927346.m4a').stat().st_size == 300000
+    assert page_dir_p.joinpath('239927346.xml').read_bytes() == DANMAKU_CONTENT
+    assert page_dir_p.joinpath('239927346.jpg').exists()
+    assert server.requests['media'] == 2
+
+
+async def test_run_with_budget_and_quality_number(tmp_path):
+    async with MockBilibiliServer(media_scale=0.001) as server:
+        server.add_video('BV17x411w7KC', qn=127)
+        with (
+            server.patch_urls(),
+            patch('bili_jeans.cli.download.download_page', new_callable=AsyncMock) as mock_download_page
+        ):
+            await run(
+                url=server.view_url('BV17x411w7KC'),
+                directory=str(tmp_path),
+                qn=64,
+                bit_rate_id=30232,
+                budget=10 * 1024 * 1024 * 1024,
+                skip_mux=True
+            )
+
+    # the budget fits the best streams, but not beyond the declared quality
+    qn, _, codec_id, _, bit_rate_id, _, _ = mock_download_page.call_args.args[2:9]
+    assert (qn, codec_id, bit_rate_id) == (64, 12, 30232)
+
+
+async def test_run_with_dedup_media_and_mux(tmp_path):
+    async with MockBilibiliServer(media_size=300000) as server:
+        with server.patch_urls():
+            with pytest.raises(ValueError):
+                await run(url=server.view_url('BV1X54y1C74U'), directory=str(tmp_path), dedup_media=True)
+
+    assert server.requests['media'] == 0
+
+
+async def test_run_with_synthetic_video(tmp_path):
+    async with MockBilibiliServer(media_scale=0.001, subtitle_lines=5) as server:
+        server.add_video('BV17x411w7KC', pages=3, qn=127, subtitles=2)
+        with server.patch_urls():
+            await run(
+                url=server.view_url('BV17x411w7KC'),
+                directory=str(tmp_path),
+                qn=127,
+                enable_subtitle=True,
+                skip_mux=True
+            )
+
+    page_dir_p = tmp_path.joinpath('BV17x411w7KC')
+    assert sorted(file_p.name for file_p in page_dir_p.glob('*.mp4')) == [
+        '239927346.mp4', '239927347.mp4', '239927348.mp4'
+    ]
+    # 8K stream has 10x bandwidth of the top one
+    assert page_dir_p.joinpath('239927346.mp4').stat().st_size == 3352406 * 10 * 177 // 8 // 1000
+    assert len(list(page_dir_p.glob('*.srt'))) == 6
+    assert server.requests['subtitle'] == 12
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+from typing import Set
+
+import pytest
+
+
+HEAVY_MODULES = ('aiohttp', 'pydantic', 'prompt_toolkit', 'tzlocal')
+
+
+def _get_imported_modules(code: str) -> Set[str]:
+    """
+    names of modules imported by the code in a fresh interpreter, reported by '-X importtime'
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return {
+        line.rsplit('|', 1)[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:') and '|' in line
+    }
+
+
+@pytest.mark.parametrize('code', [
+    'import bili_jeans.cli',
+    "from bili_jeans.cli import cli; cli(['download', '--help'], standalone_mode=False)"
+])
+def test_cli_without_heavy_modules(code):
+    imported_modules = _get_imported_modules(code)
+
+    assert not [name for name in imported_modules if name.split('.')[0] in HEAVY_MODULES]
+
+
+def test_download_without_prompt_toolkit():
+    imported_modules = _get_imported_modules('import bili_jeans.cli.download')
+
+    assert 'aiohttp' in imported_modules
+    assert not [name for name in imported_modules if name.startswith('prompt_toolkit')]
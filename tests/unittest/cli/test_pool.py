@@ -0,0 +1,93 @@
+import asyncio
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+from bili_jeans.cli.pool import run_pool
+from bili_jeans.core.schemes import PageData
+
+
+def get_mock_page(cid: int) -> PageData:
+    return PageData(
+        idx=cid,
+        bvid='BV1',
+        cid=cid,
+        title=f'P{cid}',
+        cover='',
+        duration=1,
+        description='',
+        owner_name='',
+        pubdate=0
+    )
+
+
+async def mock_download_page(page_data, dir_path, *stream_options, **page_options):
+    if page_data.cid == 2:
+        raise ValueError('mock failure')
+    Path(dir_path).joinpath(f'{page_data.cid}.pid').write_text(str(os.getpid()))
+
+
+async def mock_download_page_failed(page_data, dir_path, *stream_options, **page_options):
+    raise ValueError('mock failure')
+
+
+async def test_run_pool(tmp_path):
+    tasks = [(get_mock_page(cid), (None,) * 7) for cid in range(1, 9)]
+
+    # forked workers inherit the patch
+    with patch('bili_jeans.cli.pool.download_page', new=mock_download_page):
+        manifest = await run_pool(
+            tasks,
+            str(tmp_path),
+            processes=2,
+            concurrency=2,
+            start_method='fork',
+            enable_danmaku=True
+        )
+
+    assert len(manifest) == 8
+    assert [entry.cid for entry in manifest.list('failed')] == [2]
+    assert manifest.get('BV1', 2).error == 'ValueError: mock failure'
+    pids = {int(tmp_path.joinpath(f'{cid}.pid').read_text()) for cid in range(1, 9) if cid != 2}
+    assert os.getpid() not in pids
+    assert pids == {entry.worker for entry in manifest.list('done')}
+
+    # only the failed page is retried on re-run
+    with patch('bili_jeans.cli.pool.download_page', new=mock_download_page_failed):
+        manifest = await run_pool(tasks, str(tmp_path), processes=2, start_method='fork')
+
+    assert [entry.cid for entry in manifest.list('failed')] == [2]
+    assert len(manifest.list('done')) == 7
+
+
+async def test_run_pool_with_worker_killed(tmp_path):
+    async def mock_download_page_killed(page_data, dir_path, *stream_options, **page_options):
+        os._exit(1)
+
+    with patch('bili_jeans.cli.pool.download_page', new=mock_download_page_killed):
+        manifest = await run_pool(
+            [(get_mock_page(1), (None,) * 7)],
+            str(tmp_path),
+            processes=1,
+            start_method='fork'
+        )
+
+    assert manifest.get('BV1', 1).status == 'failed'
+    assert manifest.get('BV1', 1).error == 'Worker exited unexpectedly'
+
+
+async def test_run_pool_with_loop_options(tmp_path):
+    async def mock_download_page_executor(page_data, dir_path, *stream_options, **page_options):
+        executor = asyncio.get_running_loop()._default_executor
+        Path(dir_path).joinpath(f'{page_data.cid}.workers').write_text(str(executor._max_workers))
+
+    with patch('bili_jeans.cli.pool.download_page', new=mock_download_page_executor):
+        await run_pool(
+            [(get_mock_page(1), (None,) * 7)],
+            str(tmp_path),
+            processes=1,
+            loop_options={'loop': 'asyncio', 'executor_workers': 3},
+            start_method='fork'
+        )
+
+    assert tmp_path.joinpath('1.workers').read_text() == '3'
@@ -0,0 +1,79 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+from bili_jeans.cli.worker import enqueue_pages, run_worker
+from bili_jeans.core.manifest import Manifest, ManifestEntry
+from bili_jeans.core.work_queue import open_work_queue
+from tests.redis_stand_in import RedisStandIn
+from tests.unittest.cli.test_pool import get_mock_page
+
+
+async def test_run_worker(tmp_path):
+    queue = str(tmp_path.joinpath('queue.sqlite3'))
+    tasks = [(get_mock_page(cid), (80, False, None, False, None, False, None)) for cid in range(1, 7)]
+    assert await enqueue_pages(queue, tasks, enable_danmaku=True) == 6
+    assert await enqueue_pages(queue, tasks[:2]) == 0
+
+    async def mock_download_page(page_data, dir_path, *stream_options, **page_options):
+        await asyncio.sleep(0.01)
+        if page_data.cid == 2:
+            raise ValueError('mock failure')
+
+    # the workers act as nodes, each of them owns its directory
+    for worker_id in ('w1', 'w2'):
+        tmp_path.joinpath(worker_id).mkdir()
+    with patch('bili_jeans.cli.worker.download_page', new_callable=AsyncMock) as mock_download:
+        mock_download.side_effect = mock_download_page
+        await asyncio.gather(*[
+            run_worker(
+                queue,
+                str(tmp_path.joinpath(worker_id)),
+                worker_id=worker_id,
+                concurrency=2,
+                max_attempts=2,
+                idle_exit=True,
+                poll_interval=0.01,
+                sess_data='mock_sess_data'
+            )
+            for worker_id in ('w1', 'w2')
+        ])
+
+    # each page is downloaded once, except the retried one
+    assert sorted(call.args[0].cid for call in mock_download.call_args_list) == [1, 2, 2, 3, 4, 5, 6]
+    assert mock_download.call_args.args[2:] == (80, False, None, False, None, False, None)
+    assert mock_download.call_args.kwargs == {
+        'cover_store': None,
+        'sess_data': 'mock_sess_data',
+        'enable_danmaku': True
+    }
+    entries = {
+        entry.key: entry
+        for worker_id in ('w1', 'w2')
+        for entry in Manifest(tmp_path.joinpath(worker_id, '.manifest.jsonl')).list()
+    }
+    assert sorted(key for key, entry in entries.items() if entry.status == 'done') == [
+        'BV1/1', 'BV1/3', 'BV1/4', 'BV1/5', 'BV1/6'
+    ]
+    assert entries['BV1/2'].status == 'failed'
+    assert entries['BV1/2'].error == 'ValueError: mock failure'
+
+    work_queue = open_work_queue(queue)
+    assert await work_queue.count() == {'done': 5, 'failed': 1}
+    await work_queue.close()
+
+
+async def test_run_worker_with_downloaded_page(tmp_path):
+    server = RedisStandIn()
+    await server.start()
+    tasks = [(get_mock_page(cid), (None, False, None, False, None, False, None)) for cid in (1, 2)]
+    await enqueue_pages(server.url, tasks)
+    manifest_entry = ManifestEntry(bvid='BV1', cid=1, idx=1, title='P1', status='done', finished_at=1.0)
+    Manifest(tmp_path.joinpath('.manifest.jsonl')).record(manifest_entry)
+
+    with patch('bili_jeans.cli.worker.download_page', new_callable=AsyncMock) as mock_download:
+        await run_worker(server.url, str(tmp_path), idle_exit=True, poll_interval=0.01)
+
+    # the page done in manifest is completed without downloading
+    assert [call.args[0].cid for call in mock_download.call_args_list] == [2]
+    assert Manifest(tmp_path.joinpath('.manifest.jsonl')).get('BV1', 1) == manifest_entry
+    await server.stop()
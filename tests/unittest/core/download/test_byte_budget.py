@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+from bili_jeans.core.constants import RESOURCE_KIND_VIDEO
+from bili_jeans.core.download import byte_budget, ByteBudget, override_chunk_sizes
+from bili_jeans.core.download.download_task import StreamDownloadTask
+
+
+async def test_byte_budget_blocks_until_released():
+    budget = ByteBudget(10)
+    assert await budget.acquire(6) == 6
+
+    waiter = asyncio.create_task(budget.acquire(6))
+    await asyncio.sleep(0)
+    assert waiter.done() is False
+
+    budget.release(6)
+    assert await waiter == 6
+    assert budget.in_use == 6
+    assert budget.peak == 6
+
+
+async def test_byte_budget_grants_oversized_as_limit():
+    budget = ByteBudget(10)
+    assert await budget.acquire(100) == 10
+    budget.release(10)
+    assert budget.in_use == 0
+
+
+async def test_byte_budget_cancelled_waiter():
+    budget = ByteBudget(10)
+    await budget.acquire(10)
+    waiter = asyncio.create_task(budget.acquire(5))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    budget.release(10)
+    assert budget.in_use == 0
+
+
+async def test_byte_budget_released_before_cancellation_delivered():
+    budget = ByteBudget(10)
+    await budget.acquire(10)
+    waiter = asyncio.create_task(budget.acquire(5))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    # before the cancelled waiter runs
+    budget.release(10)
+    assert budget.in_use == 0
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert budget.in_use == 0
+    assert await budget.acquire(10) == 10
+
+
+def test_byte_budget_invalid_limit():
+    with pytest.raises(ValueError):
+        ByteBudget(0)
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_stream_download_task_within_byte_budget(mock_get_req, tmp_path):
+    sample_url = 'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/sample.m4s'
+    sample_file = tmp_path / 'BV1X54y1C74U' / 'sample.m4s'
+    mock_get_req.return_value.__aenter__.return_value.content_length = None
+    mock_get_req.return_value.__aenter__.return_value.content.read = AsyncMock(
+        side_effect=[b'1234', b'5678', b'']
+    )
+
+    with override_chunk_sizes({RESOURCE_KIND_VIDEO: 4}):
+        async with byte_budget(6) as budget:
+            await StreamDownloadTask(sample_url, str(sample_file), kind=RESOURCE_KIND_VIDEO).run()
+
+    assert budget is not None
+    assert budget.peak == 4
+    assert budget.in_use == 0
+    assert sample_file.read_bytes() == b'12345678'
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_stream_download_task_reserves_received_size(mock_get_req, tmp_path):
+    sample_url = 'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/sample.m4s'
+    sample_file = tmp_path / 'BV1X54y1C74U' / 'sample.m4s'
+    mock_get_req.return_value.__aenter__.return_value.content_length = None
+    # fewer bytes than requested are received by each read
+    mock_get_req.return_value.__aenter__.return_value.content.read = AsyncMock(
+        side_effect=[b'12', b'345', b'']
+    )
+
+    async with byte_budget(6) as budget:
+        await StreamDownloadTask(sample_url, str(sample_file), kind=RESOURCE_KIND_VIDEO).run()
+
+    assert budget is not None
+    assert budget.peak == 3
+    assert budget.in_use == 0
+    assert sample_file.read_bytes() == b'12345'
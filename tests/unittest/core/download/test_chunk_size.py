@@ -0,0 +1,46 @@
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+from bili_jeans.core.constants import (
+    CHUNK_SIZE,
+    RESOURCE_KIND_AUDIO,
+    RESOURCE_KIND_COVER,
+    RESOURCE_KIND_VIDEO
+)
+from bili_jeans.core.download import override_chunk_sizes
+from bili_jeans.core.download.chunk_size import get_chunk_size, is_small_resource
+from bili_jeans.core.download.download_task import StreamDownloadTask
+
+
+def test_override_chunk_sizes():
+    with override_chunk_sizes({RESOURCE_KIND_VIDEO: 4 * 1024 * 1024}):
+        assert get_chunk_size(RESOURCE_KIND_VIDEO) == 4 * 1024 * 1024
+        assert get_chunk_size(RESOURCE_KIND_AUDIO) == CHUNK_SIZE
+    assert get_chunk_size(RESOURCE_KIND_VIDEO) == CHUNK_SIZE
+
+
+def test_override_chunk_sizes_with_unknown_kind():
+    with pytest.raises(ValueError):
+        with override_chunk_sizes({'unknown': 1024}):
+            pass
+
+
+def test_is_small_resource():
+    assert is_small_resource(100 * 1024) is True
+    assert is_small_resource(5 * 1024 * 1024 * 1024) is False
+    assert is_small_resource(None) is False
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_stream_download_task_for_small_resource(mock_get_req, tmp_path):
+    sample_url = 'http://i0.hdslb.com/bfs/archive/637b892a9d16daf7220071e4a2090533e3782922.jpg'
+    sample_file = tmp_path / 'BV1X54y1C74U' / '239927346.jpg'
+    mock_resp = mock_get_req.return_value.__aenter__.return_value
+    mock_resp.content_length = 5
+    mock_resp.read = AsyncMock(return_value=b'cover')
+
+    await StreamDownloadTask(sample_url, str(sample_file), kind=RESOURCE_KIND_COVER).run()
+
+    assert sample_file.read_bytes() == b'cover'
+    mock_resp.content.read.assert_not_called()
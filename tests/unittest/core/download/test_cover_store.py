@@ -0,0 +1,87 @@
+from http import HTTPStatus
+from unittest.mock import patch
+
+from multidict import CIMultiDict, CIMultiDictProxy
+
+from bili_jeans.core.download import CoverStore, create_cover_task
+from bili_jeans.core.schemes import PageData
+from tests.utils import get_mock_async_response
+
+
+SAMPLE_COVER_URL = 'http://i0.hdslb.com/bfs/archive/637b892a9d16daf7220071e4a2090533e3782922.jpg'
+SAMPLE_COVER_CONTENT = b'\xff\xd8\xff\xe0 dummy jpeg \xff\xd9'
+SAMPLE_COVER_HEADERS = CIMultiDictProxy(CIMultiDict({
+    'ETag': '"637b892a9d16daf7"',
+    'Last-Modified': 'Thu, 10 Sep 2020 05:51:51 GMT'
+}))
+
+
+def _get_page_data(idx: int, cid: int) -> PageData:
+    return PageData(
+        idx=idx,
+        aid=1256708328,
+        bvid='BV1wE4m1R7cu',
+        cid=cid,
+        title=f'P{idx}',
+        cover=SAMPLE_COVER_URL,
+        duration=7861,
+        description='',
+        owner_name='呼兰hooligan',
+        pubdate=1599717911
+    )
+
+
+@patch('aiohttp.ClientSession.get')
+async def test_cover_store_dedup_pages(mock_get_req, tmp_path):
+    mock_get_req.return_value.__aenter__.return_value = get_mock_async_response(
+        HTTPStatus.OK.value,
+        SAMPLE_COVER_CONTENT,
+        SAMPLE_COVER_HEADERS
+    )
+    cover_store = CoverStore(tmp_path)
+    for idx, cid in enumerate((25681134365, 25681134366), start=1):
+        await create_cover_task(_get_page_data(idx, cid), tmp_path, cover_store).run()
+
+    assert mock_get_req.call_count == 1
+    first_p = tmp_path / 'BV1wE4m1R7cu' / '25681134365.jpg'
+    second_p = tmp_path / 'BV1wE4m1R7cu' / '25681134366.jpg'
+    assert first_p.read_bytes() == SAMPLE_COVER_CONTENT
+    assert first_p.samefile(second_p)
+    assert len(list((tmp_path / '.covers' / 'objects').rglob('*.jpg'))) == 1
+
+
+@patch('aiohttp.ClientSession.get')
+async def test_cover_store_refresh_by_conditional_request(mock_get_req, tmp_path):
+    mock_get_req.return_value.__aenter__.return_value = get_mock_async_response(
+        HTTPStatus.OK.value,
+        SAMPLE_COVER_CONTENT,
+        SAMPLE_COVER_HEADERS
+    )
+    await CoverStore(tmp_path).fetch(SAMPLE_COVER_URL)
+
+    mock_get_req.return_value.__aenter__.return_value = get_mock_async_response(
+        HTTPStatus.NOT_MODIFIED.value,
+        b''
+    )
+    object_p = await CoverStore(tmp_path).fetch(SAMPLE_COVER_URL)
+
+    actual_headers = mock_get_req.call_args.kwargs['headers']
+    assert actual_headers['If-None-Match'] == '"637b892a9d16daf7"'
+    assert actual_headers['If-Modified-Since'] == 'Thu, 10 Sep 2020 05:51:51 GMT'
+    assert object_p.read_bytes() == SAMPLE_COVER_CONTENT
+
+
+@patch('aiohttp.ClientSession.get')
+async def test_cover_store_shared_by_processes(mock_get_req, tmp_path):
+    mock_get_req.return_value.__aenter__.return_value = get_mock_async_response(
+        HTTPStatus.OK.value,
+        SAMPLE_COVER_CONTENT,
+        SAMPLE_COVER_HEADERS
+    )
+    other_url = SAMPLE_COVER_URL.replace('637b892a9d16daf7', '0123456789abcdef')
+    # e.g. each process has its own store on the same directory
+    first_store, second_store = CoverStore(tmp_path), CoverStore(tmp_path)
+    await first_store.fetch(SAMPLE_COVER_URL)
+    await second_store.fetch(other_url)
+
+    assert set(CoverStore(tmp_path)._index.load()) == {SAMPLE_COVER_URL, other_url}
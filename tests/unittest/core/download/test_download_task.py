@@ -1,10 +1,19 @@
-from unittest.mock import patch, AsyncMock
+import gzip
+import json
+from unittest.mock import patch, AsyncMock, MagicMock
+from xml.etree.ElementTree import ParseError
+import zlib
 
-from bili_jeans.core.download.download_task import StreamDownloadTask
-from tests.utils import MockAsyncIterator
+from multidict import CIMultiDict, CIMultiDictProxy
+import pytest
 
+from bili_jeans.core.download import create_danmaku_task
+from bili_jeans.core.download.download_task import DanmakuDownloadTask, StreamDownloadTask
+from bili_jeans.core.schemes import PageData
+from tests.utils import encode_danmaku_segment, MockAsyncIterator
 
-@patch('bili_jeans.core.download.download_task.aiofile.async_open')
+
+@patch('bili_jeans.core.download.storage_sink.aiofile.async_open')
 @patch('bili_jeans.core.download.download_task.Path')
 @patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
 async def test_general_download_task_run(mock_get_req, mock_file_p, mock_async_open):
@@ -12,7 +21,10 @@ async def test_general_download_task_run(mock_get_req, mock_file_p, mock_async_o
     sample_url = 'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/sample.m4s'
     sample_file = '/tmp/sample.mp4'
 
-    mock_get_req.return_value.__aenter__.return_value.content.iter_chunked = MockAsyncIterator
+    mock_get_req.return_value.__aenter__.return_value.content_length = None
+    mock_get_req.return_value.__aenter__.return_value.content.read = AsyncMock(
+        side_effect=[b'dummy content', b'']
+    )
     mock_file_p.return_value.parent.return_value.mkdir.return_value = None
     mock_async_open.return_value.__aenter__.return_value.write = AsyncMock()
     download_task = StreamDownloadTask(
@@ -22,3 +34,79 @@ async def test_general_download_task_run(mock_get_req, mock_file_p, mock_async_o
     await download_task.run()
 
     mock_async_open.return_value.__aenter__.return_value.write.assert_called_once()
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_danmaku_download_task_run_with_compress(mock_get_req, tmp_path):
+    sample_url = 'https://api.bilibili.com/x/v1/dm/list.so?oid=239927346'
+    sample_file = tmp_path / 'BV1X54y1C74U' / '239927346.xml.gz'
+    sample_content = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<i><chatid>239927346</chatid><d p="0.5,1,25,16777215">弹幕</d></i>'
+    ).encode('utf-8')
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    compressed = compressor.compress(sample_content) + compressor.flush()
+
+    mock_resp = mock_get_req.return_value.__aenter__.return_value
+    mock_resp.headers = CIMultiDictProxy(CIMultiDict({'Content-Encoding': 'deflate'}))
+    mock_resp.content.iter_chunked = lambda _: MockAsyncIterator.from_data([compressed[:10], compressed[10:]])
+    download_task = DanmakuDownloadTask(
+        url=sample_url,
+        file=str(sample_file),
+        compress=True
+    )
+    await download_task.run()
+
+    assert gzip.decompress(sample_file.read_bytes()) == sample_content
+    index = json.loads(sample_file.with_name('239927346.xml.gz.idx').read_bytes())
+    assert index['uncompressed_size'] == len(sample_content)
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_danmaku_download_task_run_with_malformed_content(mock_get_req, tmp_path):
+    sample_url = 'https://api.bilibili.com/x/v1/dm/list.so?oid=239927346'
+    sample_file = tmp_path / 'BV1X54y1C74U' / '239927346.xml.gz'
+
+    mock_resp = mock_get_req.return_value.__aenter__.return_value
+    mock_resp.headers = CIMultiDictProxy(CIMultiDict())
+    mock_resp.content.iter_chunked = lambda _: MockAsyncIterator.from_data([b'<i><d>'])
+    download_task = DanmakuDownloadTask(
+        url=sample_url,
+        file=str(sample_file),
+        compress=True
+    )
+    with pytest.raises(ParseError):
+        await download_task.run()
+    assert not sample_file.exists()
+    assert not sample_file.with_name('239927346.xml.gz.idx').exists()
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_segmented_danmaku_download_task_run(mock_get_req, tmp_path):
+    page_data = PageData(
+        idx=1,
+        aid=842089940,
+        bvid='BV1X54y1C74U',
+        cid=239927346,
+        title='呼兰：社保',
+        cover='http://i0.hdslb.com/bfs/archive/637b892a9d16daf7220071e4a2090533e3782922.jpg',
+        duration=725,
+        description='-',
+        owner_name='呼兰hooligan',
+        pubdate=1599717911
+    )
+    mock_resp = mock_get_req.return_value.__aenter__.return_value
+    mock_resp.raise_for_status = MagicMock()
+    mock_resp.read = AsyncMock(return_value=encode_danmaku_segment([
+        [(1, 1569), (2, 12500), (7, '前方高能')],
+        [(1, 1234), (2, 3000), (7, '第一')]
+    ]))
+    download_task = create_danmaku_task(page_data, tmp_path, segmented=True)
+    await download_task.run()
+
+    # 3 segments for 725 seconds
+    assert mock_get_req.call_count == 3
+    assert 'segment_index=3' in mock_get_req.call_args.args[0]
+    actual = (tmp_path / 'BV1X54y1C74U' / '239927346.xml').read_bytes()
+    assert b'<maxlimit>6</maxlimit>' in actual
+    assert actual.count(b'<d p=') == 6
@@ -0,0 +1,130 @@
+import hashlib
+from unittest.mock import patch, AsyncMock
+
+from bili_jeans.core.constants import RESOURCE_KIND_VIDEO
+from bili_jeans.core.download import media_store
+from bili_jeans.core.download.download_task import StreamDownloadTask
+from bili_jeans.core.download.media_store import materialize, MediaStore
+from bili_jeans.core.integrity import record_digests
+
+
+SAMPLE_STREAM_URL = (
+    'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/46/73/239927346/239927346-1-30080.m4s'
+    '?e=ig8euxZM2rNcNbdlhoNvNC8BqJIzNbfqXBvEqxTEto8BTrNvN0GvT90W5JZMkX_YN0MvXg8gNEV4NC8xNEV4N03eN0B5tZlqNxTEto8BTrNvN'
+)
+SAMPLE_STREAM_CONTENT = b'\x00\x00\x00\x0cftypiso5' + b'\x00\x00\x00\x10mdat' + b'\x00' * 8
+
+
+def _mock_stream(mock_get_req, content: bytes) -> None:
+    mock_resp = mock_get_req.return_value.__aenter__.return_value
+    mock_resp.content_length = None
+    mock_resp.content.read = AsyncMock(side_effect=[content, b''] * 2)
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_media_store_dedup_by_url_path(mock_get_req, tmp_path):
+    _mock_stream(mock_get_req, SAMPLE_STREAM_CONTENT)
+    first_p = tmp_path / 'BV1X54y1C74U' / '239927346.mp4'
+    second_p = tmp_path / 'BV1wE4m1R7cu' / '239927346.mp4'
+
+    with media_store(tmp_path), record_digests(tmp_path) as digest_log:
+        await StreamDownloadTask(SAMPLE_STREAM_URL, str(first_p), kind=RESOURCE_KIND_VIDEO).run()
+        # the query is signed again for another request
+        await StreamDownloadTask(
+            SAMPLE_STREAM_URL.replace('mirror08c', 'mirrorcos').split('?')[0] + '?e=other',
+            str(second_p),
+            kind=RESOURCE_KIND_VIDEO
+        ).run()
+
+    assert mock_get_req.call_count == 1
+    assert first_p.read_bytes() == SAMPLE_STREAM_CONTENT
+    assert first_p.samefile(second_p)
+    objects = list((tmp_path / '.media' / 'objects').rglob('*.mp4'))
+    assert [p.stem for p in objects] == [hashlib.sha256(SAMPLE_STREAM_CONTENT).hexdigest()]
+    assert digest_log is not None
+    assert set(digest_log.load()) == {'BV1X54y1C74U/239927346.mp4', 'BV1wE4m1R7cu/239927346.mp4'}
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_media_store_dedup_by_content(mock_get_req, tmp_path):
+    _mock_stream(mock_get_req, SAMPLE_STREAM_CONTENT)
+    first_p = tmp_path / 'BV1X54y1C74U' / '239927346.mp4'
+    second_p = tmp_path / 'BV1wE4m1R7cu' / '25681134365.mp4'
+
+    with media_store(tmp_path):
+        await StreamDownloadTask(SAMPLE_STREAM_URL, str(first_p), kind=RESOURCE_KIND_VIDEO).run()
+        await StreamDownloadTask(
+            'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/65/43/25681134365/25681134365-1-30080.m4s',
+            str(second_p),
+            kind=RESOURCE_KIND_VIDEO
+        ).run()
+
+    assert mock_get_req.call_count == 2
+    assert first_p.samefile(second_p)
+    assert list((tmp_path / '.media' / 'tmp').iterdir()) == []
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_media_store_shared_by_processes(mock_get_req, tmp_path):
+    _mock_stream(mock_get_req, SAMPLE_STREAM_CONTENT)
+    other_url = 'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/65/43/25681134365/25681134365-1-30080.m4s'
+    # e.g. each process has its own store on the same directory
+    first_store, second_store = MediaStore(tmp_path), MediaStore(tmp_path)
+    assert second_store._index.load() == {}
+
+    await first_store.fetch(StreamDownloadTask(SAMPLE_STREAM_URL, str(tmp_path / '1.mp4'), kind=RESOURCE_KIND_VIDEO))
+    await second_store.fetch(StreamDownloadTask(other_url, str(tmp_path / '2.mp4'), kind=RESOURCE_KIND_VIDEO))
+    # stored by the other process already
+    await second_store.fetch(StreamDownloadTask(SAMPLE_STREAM_URL, str(tmp_path / '3.mp4'), kind=RESOURCE_KIND_VIDEO))
+
+    assert mock_get_req.call_count == 2
+    assert set(MediaStore(tmp_path)._index.load()) == {
+        MediaStore.get_key(SAMPLE_STREAM_URL),
+        MediaStore.get_key(other_url)
+    }
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_media_store_object_kept_by_plain_run(mock_get_req, tmp_path):
+    _mock_stream(mock_get_req, SAMPLE_STREAM_CONTENT)
+    first_p = tmp_path / 'BV1X54y1C74U' / '239927346.mp4'
+    second_p = tmp_path / 'BV1wE4m1R7cu' / '239927346.mp4'
+    other_url = SAMPLE_STREAM_URL.replace('mirror08c', 'mirrorcos')
+    with media_store(tmp_path):
+        await StreamDownloadTask(SAMPLE_STREAM_URL, str(first_p), kind=RESOURCE_KIND_VIDEO).run()
+        await StreamDownloadTask(other_url, str(second_p), kind=RESOURCE_KIND_VIDEO).run()
+
+    # the page sharing the object is downloaded again without the store, e.g. in another quality
+    other_content = SAMPLE_STREAM_CONTENT.replace(b'\x00' * 8, b'\x01' * 8)
+    _mock_stream(mock_get_req, other_content)
+    await StreamDownloadTask(other_url, str(second_p), kind=RESOURCE_KIND_VIDEO).run()
+
+    assert second_p.read_bytes() == other_content
+    assert first_p.read_bytes() == SAMPLE_STREAM_CONTENT
+    object_p, = (tmp_path / '.media' / 'objects').rglob('*.mp4')
+    assert object_p.read_bytes() == SAMPLE_STREAM_CONTENT
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_media_store_skip_other_kinds(mock_get_req, tmp_path):
+    _mock_stream(mock_get_req, b'dummy content')
+    sample_file = tmp_path / 'BV1X54y1C74U' / '239927346.xml'
+
+    with media_store(tmp_path):
+        await StreamDownloadTask('https://api.bilibili.com/x/v1/dm/list.so?oid=239927346', str(sample_file)).run()
+
+    assert sample_file.read_bytes() == b'dummy content'
+    assert (tmp_path / '.media').exists() is False
+
+
+def test_materialize_replaces_existing_file(tmp_path):
+    object_p = tmp_path / 'object.m4a'
+    object_p.write_bytes(b'audio')
+    file_p = tmp_path / 'BV1X54y1C74U' / '239927346.m4a'
+    file_p.parent.mkdir()
+    file_p.write_bytes(b'stale')
+
+    materialize(object_p, file_p)
+    materialize(object_p, file_p)
+
+    assert file_p.samefile(object_p)
@@ -0,0 +1,188 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+from aiohttp import ClientResponseError
+import pytest
+
+from bili_jeans.core.download import create_storage_sink, FileSystemSink, S3Sink, storage_sink
+from bili_jeans.core.download.download_task import StreamDownloadTask
+from bili_jeans.core.download.storage_sink import S3_MIN_PART_SIZE
+from tests.s3_stand_in import S3StandIn
+
+
+SAMPLE_STREAM_URL = 'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/46/73/239927346/239927346-1-30080.m4s'
+SAMPLE_FILE_PATH = 'BV1X54y1C74U/239927346.m4s'
+READ_SIZE = 1024 * 1024
+
+
+def _mock_stream(mock_get_req, content: bytes, content_length: int) -> None:
+    mock_resp = mock_get_req.return_value.__aenter__.return_value
+    mock_resp.content_length = content_length
+    mock_resp.headers = {}
+    mock_resp.read = AsyncMock(return_value=content)
+    mock_resp.content.read = AsyncMock(side_effect=[
+        *[content[i:i + READ_SIZE] for i in range(0, len(content), READ_SIZE)],
+        b''
+    ])
+
+
+async def test_file_system_sink_publishes_on_success(tmp_path):
+    file_p = tmp_path / SAMPLE_FILE_PATH
+    file_p.parent.mkdir()
+    file_p.write_bytes(b'existing')
+    linked_p = tmp_path / 'linked.m4s'
+    linked_p.hardlink_to(file_p)
+    sink = FileSystemSink()
+
+    with pytest.raises(ValueError):
+        async with sink.open(file_p) as writer:
+            await writer.write(b'incomplete')
+            raise ValueError('dummy failure')
+    assert file_p.read_bytes() == b'existing'
+
+    async with sink.open(file_p) as writer:
+        await writer.write(b'written')
+        assert file_p.read_bytes() == b'existing'
+    assert file_p.read_bytes() == b'written'
+    # replaced instead of being truncated in place
+    assert linked_p.read_bytes() == b'existing'
+    assert sorted(p.name for p in file_p.parent.iterdir()) == ['239927346.m4s']
+
+
+def _get_s3_sink(server: S3StandIn, tmp_path) -> S3Sink:
+    return S3Sink(
+        server.endpoint,
+        'bucket',
+        tmp_path,
+        server.access_key,
+        server.secret_key,
+        prefix='/videos/',
+        part_size=S3_MIN_PART_SIZE,
+        concurrency=2
+    )
+
+
+@pytest.fixture
+async def s3_server():
+    server = S3StandIn()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_s3_sink_uploads_stream_in_parallel_parts(mock_get_req, s3_server, tmp_path):
+    content = bytes(range(256)) * (11 * 1024 * 1024 // 256)
+    _mock_stream(mock_get_req, content, len(content))
+    file_p = tmp_path / SAMPLE_FILE_PATH
+
+    with storage_sink(_get_s3_sink(s3_server, tmp_path)):
+        await StreamDownloadTask(SAMPLE_STREAM_URL, str(file_p)).run()
+
+    assert s3_server.objects[('bucket', f'videos/{SAMPLE_FILE_PATH}')] == content
+    assert [method for method, _ in s3_server.requests] == ['POST', 'PUT', 'PUT', 'PUT', 'POST']
+    assert s3_server.peak_parts == 2
+    assert not s3_server.uploads
+    assert not file_p.exists()
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_s3_sink_puts_small_stream_at_once(mock_get_req, s3_server, tmp_path):
+    content = b'\x00' * 1024
+    _mock_stream(mock_get_req, content, len(content))
+
+    with storage_sink(_get_s3_sink(s3_server, tmp_path)):
+        await StreamDownloadTask(SAMPLE_STREAM_URL, str(tmp_path / SAMPLE_FILE_PATH)).run()
+
+    assert s3_server.objects[('bucket', f'videos/{SAMPLE_FILE_PATH}')] == content
+    assert s3_server.requests == [('PUT', '')]
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_s3_sink_aborts_upload_with_failed_part(mock_get_req, s3_server, tmp_path):
+    content = b'\x00' * (11 * 1024 * 1024)
+    _mock_stream(mock_get_req, content, len(content))
+    s3_server.fail_part = 2
+
+    with storage_sink(_get_s3_sink(s3_server, tmp_path)):
+        with pytest.raises(ClientResponseError):
+            await StreamDownloadTask(SAMPLE_STREAM_URL, str(tmp_path / SAMPLE_FILE_PATH)).run()
+
+    assert not s3_server.objects
+    assert not s3_server.uploads
+    assert s3_server.requests[-1] == ('DELETE', 'uploadId')
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_s3_sink_aborts_upload_with_incomplete_stream(mock_get_req, s3_server, tmp_path):
+    content = b'\x00' * (6 * 1024 * 1024)
+    _mock_stream(mock_get_req, content, len(content) + 1)
+
+    with storage_sink(_get_s3_sink(s3_server, tmp_path)):
+        with pytest.raises(ValueError, match='Incomplete stream'):
+            await StreamDownloadTask(SAMPLE_STREAM_URL, str(tmp_path / SAMPLE_FILE_PATH)).run()
+
+    assert not s3_server.objects
+    assert not s3_server.uploads
+
+
+async def test_s3_sink_shares_upload_slots_by_streams(s3_server, tmp_path):
+    sink = _get_s3_sink(s3_server, tmp_path)
+    content = b'\x00' * (3 * S3_MIN_PART_SIZE)
+
+    async def _upload(file_p):
+        async with sink.open(file_p) as writer:
+            for i in range(0, len(content), READ_SIZE):
+                await writer.write(content[i:i + READ_SIZE])
+
+    await asyncio.gather(_upload(tmp_path / '1.m4s'), _upload(tmp_path / '2.m4s'))
+
+    assert s3_server.objects[('bucket', 'videos/1.m4s')] == content
+    assert s3_server.objects[('bucket', 'videos/2.m4s')] == content
+    # not 2 parts of each stream
+    assert s3_server.peak_parts == 2
+    assert sink.upload_slots.locked() is False
+
+
+async def test_s3_sink_rejects_request_with_wrong_credentials(s3_server, tmp_path):
+    sink = S3Sink(s3_server.endpoint, 'bucket', tmp_path, s3_server.access_key, 'wrong')
+
+    with pytest.raises(ClientResponseError):
+        async with sink.open(tmp_path / SAMPLE_FILE_PATH) as writer:
+            await writer.write(b'\x00')
+
+    assert not s3_server.objects
+
+
+def test_s3_sink_key_out_of_directory(tmp_path):
+    sink = S3Sink('http://127.0.0.1:9000', 'bucket', tmp_path / 'root', 'key', 'secret')
+
+    assert sink.get_key(tmp_path / 'root' / 'a b' / 'c.m4s') == 'a b/c.m4s'
+    with pytest.raises(ValueError):
+        sink.get_key(tmp_path / 'other.m4s')
+
+
+def test_s3_sink_with_small_part_size(tmp_path):
+    with pytest.raises(ValueError):
+        S3Sink('http://127.0.0.1:9000', 'bucket', tmp_path, 'key', 'secret', part_size=1024)
+
+
+def test_create_storage_sink(tmp_path, monkeypatch):
+    monkeypatch.setenv('AWS_ENDPOINT_URL', 'http://127.0.0.1:9000')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'key')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'secret')
+
+    assert isinstance(create_storage_sink(None, tmp_path), FileSystemSink)
+    assert isinstance(create_storage_sink('file://', tmp_path), FileSystemSink)
+    sink = create_storage_sink('s3://bucket/videos', tmp_path)
+    assert isinstance(sink, S3Sink)
+    assert sink.is_local is False
+    assert sink.get_key(tmp_path / SAMPLE_FILE_PATH) == f'videos/{SAMPLE_FILE_PATH}'
+    with pytest.raises(ValueError):
+        create_storage_sink('ftp://bucket', tmp_path)
+    with pytest.raises(ValueError):
+        create_storage_sink('s3:///videos', tmp_path)
+
+    monkeypatch.delenv('AWS_SECRET_ACCESS_KEY')
+    with pytest.raises(ValueError):
+        create_storage_sink('s3://bucket', tmp_path)
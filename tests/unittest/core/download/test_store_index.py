@@ -0,0 +1,25 @@
+from bili_jeans.core.download.store_index import StoreIndex
+
+
+def test_store_index(tmp_path):
+    index_p = tmp_path / 'index.jsonl'
+    index = StoreIndex(index_p)
+    assert index.load() == {}
+
+    index.append('a', {'digest': '1'})
+    other = StoreIndex(index_p)
+    other.append('b', {'digest': '2'})
+    other.append('a', {'digest': '3'})
+    assert index.load() == {'a': {'digest': '3'}, 'b': {'digest': '2'}}
+
+
+def test_store_index_with_broken_lines(tmp_path):
+    index_p = tmp_path / 'index.jsonl'
+    index_p.write_bytes(b'{"key": "a", "digest": "1"}\nbroken\n{"key": "b", ')
+    index = StoreIndex(index_p)
+    assert index.load() == {'a': {'digest': '1'}}
+
+    # the last line is being appended
+    with index_p.open('ab') as fp:
+        fp.write(b'"digest": "2"}\n')
+    assert index.load() == {'a': {'digest': '1'}, 'b': {'digest': '2'}}
@@ -357,3 +357,19 @@ async def test_get_ugc_view_by_aid(mock_get_req):
 
     assert actual_data.aid == 842089940
     assert actual_data.bvid == 'BV1X54y1C74U'
+
+
+@patch('aiohttp.ClientSession.get')
+async def test_get_ugc_view_ugc_season_validated_on_access(mock_get_req):
+    data = json.loads(json.dumps(DATA_VIEW_WITH_SEASON))
+    del data['data']['ugc_season']['sections'][0]['episodes'][0]['arc']
+    mock_get_req.return_value.__aenter__.return_value = get_mock_async_response(
+        HTTPStatus.OK.value,
+        json.dumps(data, ensure_ascii=False).encode('utf-8')
+    )
+    actual_dm = await get_ugc_view(bvid='BV1tN4y1F79k')
+
+    # the pages are still available without touching the season
+    assert len(actual_dm.data.pages) > 0
+    with pytest.raises(ValueError):
+        _ = actual_dm.data.ugc_season
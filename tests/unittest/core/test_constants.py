@@ -1,6 +1,7 @@
 import pytest
 
 from bili_jeans.core.constants import (
+    _QUALITY_ID_INDEXES,
     BitRateId,
     CodecId,
     FormatNumberValue,
@@ -80,3 +81,28 @@ def test_bit_rate_id_from_invalid_value():
         match='Invalid given BitRateId: 0'
     ):
         BitRateId.from_value(0)
+
+
+def test_quality_number_from_values():
+    assert QualityNumber.from_values([127, 16]) == [
+        QualityNumber.EIGHT_K,
+        QualityNumber.P360
+    ]
+
+
+def test_quality_number_from_invalid_values():
+    with pytest.raises(
+        ValueError,
+        match='Invalid given QualityNumber: 0'
+    ):
+        QualityNumber.from_values([127, 0])
+
+
+def test_quality_id_indexes_built_at_import():
+    assert set(_QUALITY_ID_INDEXES) == {QualityNumber, CodecId, BitRateId}
+    assert _QUALITY_ID_INDEXES[QualityNumber][127] is QualityNumber.EIGHT_K
+
+
+def test_codec_id_is_valid():
+    assert CodecId.is_valid(13) is True
+    assert CodecId.is_valid(127) is False
@@ -5,7 +5,13 @@ from aiohttp import InvalidUrlClientError
 from multidict import CIMultiDict, CIMultiDictProxy
 import pytest
 
-from bili_jeans.core.factory import parse_web_view_url
+from bili_jeans.core.factory import (
+    is_short_link,
+    parse_web_view_url,
+    resolve_web_view_url,
+    resolve_web_view_urls,
+    ShortLinkCache
+)
 from tests.utils import get_mock_async_response
 
 
@@ -114,3 +120,51 @@ async def test_parse_web_view_url_of_pgc_resource_with_aid(mock_get_req):
         match=f'Invalid Url. source Url: {sample_url}, destination Url: {dest_url}'
     ):
         await parse_web_view_url(sample_url)
+
+
+@patch('aiohttp.ClientSession.get')
+async def test_resolve_web_view_url_without_request(mock_get_req):
+    actual_metadata = await resolve_web_view_url(
+        'https://www.bilibili.com/video/BV1tN4y1F79k?spm_id_from=333.788.videopod.sections'
+    )
+
+    assert actual_metadata.bvid == 'BV1tN4y1F79k'
+    assert mock_get_req.call_count == 0
+
+
+def test_is_short_link():
+    assert is_short_link('https://b23.tv/AbCdEf1')
+    assert is_short_link('b23.tv/AbCdEf1')
+    assert is_short_link('https://bili2233.cn/AbCdEf1')
+    assert not is_short_link('https://www.bilibili.com/video/BV1tN4y1F79k')
+    assert not is_short_link('https://notb23.tv/AbCdEf1')
+
+
+@patch('aiohttp.ClientSession.get')
+async def test_resolve_web_view_urls(mock_get_req, tmp_path):
+    mock_get_req.return_value.__aenter__.return_value = get_mock_async_response(
+        HTTPStatus.FOUND.value,
+        HTML_CONTENT,
+        CIMultiDictProxy(CIMultiDict(location='https://www.bilibili.com/video/BV1tN4y1F79k?p=1'))
+    )
+    urls = [
+        'https://www.bilibili.com/video/av2271112/',
+        'https://b23.tv/AbCdEf1',
+        'https://b23.tv/AbCdEf1'
+    ]
+    cache_p = tmp_path.joinpath('short_links.json')
+    actual_results = await resolve_web_view_urls(urls, ShortLinkCache(cache_p))
+
+    assert actual_results[0].aid == 2271112
+    assert actual_results[1].bvid == 'BV1tN4y1F79k'
+    assert actual_results[2].bvid == 'BV1tN4y1F79k'
+    # only the distinct short link is requested
+    assert mock_get_req.call_count == 1
+
+    # short links are resolved from the persistent cache
+    mock_get_req.reset_mock()
+    cache = ShortLinkCache(cache_p)
+    assert len(cache) == 1
+    actual_metadata = await resolve_web_view_url('b23.tv/AbCdEf1', cache)
+    assert actual_metadata.bvid == 'BV1tN4y1F79k'
+    assert mock_get_req.call_count == 0
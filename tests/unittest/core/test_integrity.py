@@ -0,0 +1,130 @@
+import hashlib
+import struct
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+from bili_jeans.core.constants import RESOURCE_KIND_VIDEO
+from bili_jeans.core.download.download_task import StreamDownloadTask
+from bili_jeans.core.integrity import (
+    DigestLog,
+    record_digests,
+    StreamDigest,
+    validate_mp4_boxes
+)
+
+
+def _box(box_type: bytes, payload: bytes = b'') -> bytes:
+    return struct.pack('>I', len(payload) + 8) + box_type + payload
+
+
+def test_stream_digest():
+    digest = StreamDigest()
+    digest.update(b'dummy ')
+    digest.update(b'content')
+
+    assert digest.size == 13
+    assert digest.sha256 == hashlib.sha256(b'dummy content').hexdigest()
+    digest.verify_size(13)
+    digest.verify_size(None)
+    with pytest.raises(ValueError):
+        digest.verify_size(14)
+
+
+def test_stream_digest_without_hashing():
+    digest = StreamDigest(hashing=False)
+    digest.update(b'dummy content')
+
+    assert digest.size == 13
+    assert digest.hexdigests() == {}
+    with pytest.raises(ValueError):
+        digest.sha256
+
+
+def test_validate_mp4_boxes(tmp_path):
+    sample_file = tmp_path / 'sample.m4s'
+    content = _box(b'ftyp', b'iso5') + _box(b'moov', b'\x00' * 16)
+    large_mdat = struct.pack('>I', 1) + b'mdat' + struct.pack('>Q', 16 + 4) + b'data'
+    sample_file.write_bytes(content + large_mdat)
+
+    validate_mp4_boxes(sample_file)
+
+
+def test_validate_mp4_boxes_truncated(tmp_path):
+    sample_file = tmp_path / 'sample.m4s'
+    sample_file.write_bytes(_box(b'ftyp', b'iso5') + _box(b'mdat', b'\x00' * 16)[:-1])
+
+    with pytest.raises(ValueError):
+        validate_mp4_boxes(sample_file)
+
+
+def test_validate_mp4_boxes_skip_other_format(tmp_path):
+    sample_file = tmp_path / 'sample.flv'
+    sample_file.write_bytes(b'FLV\x01\x05\x00\x00\x00\x09')
+
+    validate_mp4_boxes(sample_file)
+
+
+def test_digest_log(tmp_path):
+    digest_log = DigestLog(tmp_path)
+    digest = StreamDigest()
+    digest.update(b'dummy content')
+    digest_log.record(tmp_path / 'BV1X54y1C74U' / '239927346.mp4', digest, 'https://example.com/1.m4s')
+    with digest_log.file_path.open('ab') as fp:
+        fp.write(b'{"file": "broken')
+
+    records = digest_log.load()
+    assert list(records) == ['BV1X54y1C74U/239927346.mp4']
+    assert records['BV1X54y1C74U/239927346.mp4'].size == 13
+    assert records['BV1X54y1C74U/239927346.mp4'].digests['sha256'] == digest.sha256
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_stream_download_task_records_digest(mock_get_req, tmp_path):
+    sample_url = 'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/sample.m4s'
+    sample_file = tmp_path / 'BV1X54y1C74U' / '239927346.mp4'
+    content = _box(b'ftyp', b'iso5') + _box(b'mdat', b'\x00' * 16)
+    mock_resp = mock_get_req.return_value.__aenter__.return_value
+    mock_resp.content_length = None
+    mock_resp.content.read = AsyncMock(side_effect=[content[:10], content[10:], b''])
+
+    with record_digests(tmp_path) as digest_log:
+        task = StreamDownloadTask(sample_url, str(sample_file), kind=RESOURCE_KIND_VIDEO)
+        await task.run()
+
+    assert task.digest is not None
+    assert task.digest.sha256 == hashlib.sha256(content).hexdigest()
+    assert digest_log is not None
+    assert digest_log.load()['BV1X54y1C74U/239927346.mp4'].url == sample_url
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_stream_download_task_without_digest_log(mock_get_req, tmp_path):
+    sample_url = 'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/sample.m4s'
+    sample_file = tmp_path / 'BV1X54y1C74U' / '239927346.mp4'
+    content = _box(b'ftyp', b'iso5') + _box(b'mdat', b'\x00' * 16)
+    mock_resp = mock_get_req.return_value.__aenter__.return_value
+    mock_resp.content_length = None
+    mock_resp.content.read = AsyncMock(side_effect=[content[:10], content[10:], b''])
+
+    task = StreamDownloadTask(sample_url, str(sample_file), kind=RESOURCE_KIND_VIDEO)
+    await task.run()
+
+    # nothing consumes the digests, so only the bytes are counted
+    assert task.digest is not None
+    assert task.digest.size == len(content)
+    assert task.digest.hexdigests() == {}
+
+
+@patch('bili_jeans.core.download.download_task.aiohttp.ClientSession.get')
+async def test_stream_download_task_with_truncated_response(mock_get_req, tmp_path):
+    sample_url = 'https://upos-sz-mirror08c.bilivideo.com/upgcxcode/sample.m4s'
+    sample_file = tmp_path / 'BV1X54y1C74U' / '239927346.mp4'
+    content = _box(b'ftyp', b'iso5') + _box(b'mdat', b'\x00' * 1024 * 1024)
+    mock_resp = mock_get_req.return_value.__aenter__.return_value
+    mock_resp.content_length = len(content)
+    mock_resp.content.read = AsyncMock(side_effect=[content[:1024], b''])
+
+    with pytest.raises(ValueError):
+        await StreamDownloadTask(sample_url, str(sample_file), kind=RESOURCE_KIND_VIDEO).run()
+    assert sample_file.exists() is False
@@ -0,0 +1,59 @@
+import asyncio
+
+from bili_jeans.core.jobs import JobStore
+
+
+def test_job_store_claim_by_priority(tmp_path):
+    store = JobStore(tmp_path.joinpath('jobs.sqlite3'))
+    low = store.submit('https://www.bilibili.com/video/BV1X54y1C74U')
+    high = store.submit('https://www.bilibili.com/video/BV1tN4y1F79k', {'enable_cover': True}, priority=10)
+
+    claimed = store.claim()
+    assert claimed.id_field == high.id_field
+    assert claimed.status == 'running'
+    assert claimed.options == {'enable_cover': True}
+    assert claimed.attempts == 1
+    assert store.claim().id_field == low.id_field
+    assert store.claim() is None
+
+
+def test_job_store_finish_and_cancel(tmp_path):
+    store = JobStore(tmp_path.joinpath('jobs.sqlite3'))
+    jobs = store.submit_many([
+        ('https://www.bilibili.com/video/BV1X54y1C74U', {}, 0),
+        ('https://www.bilibili.com/video/BV1tN4y1F79k', {}, 0),
+        ('https://www.bilibili.com/video/BV1Ye4y1f7kA', {}, 0)
+    ])
+    first, second = store.claim(), store.claim()
+    store.finish(first.id_field)
+    store.finish(second.id_field, error='dummy failure')
+
+    assert store.cancel(jobs[2].id_field) is True
+    assert store.cancel(jobs[0].id_field) is False
+    assert store.get(second.id_field).error == 'dummy failure'
+    assert store.count() == {'done': 1, 'failed': 1, 'cancelled': 1}
+    assert [job.id_field for job in store.list('failed')] == [second.id_field]
+
+
+def test_job_store_requeue_running_on_reopen(tmp_path):
+    db_p = tmp_path.joinpath('jobs.sqlite3')
+    store = JobStore(db_p)
+    job = store.submit('https://www.bilibili.com/video/BV1X54y1C74U')
+    store.claim()
+    store.close()
+
+    reopened = JobStore(db_p)
+    assert reopened.get(job.id_field).status == 'queued'
+    assert reopened.claim().attempts == 2
+
+
+async def test_job_store_on_threads(tmp_path):
+    store = JobStore(tmp_path.joinpath('jobs.sqlite3'))
+    await asyncio.gather(*(
+        asyncio.to_thread(store.submit_many, [(f'https://www.bilibili.com/video/BV{i}', {}, 0)] * 10)
+        for i in range(8)
+    ))
+    claimed = await asyncio.gather(*(asyncio.to_thread(store.claim) for _ in range(100)))
+
+    assert len({job.id_field for job in claimed if job is not None}) == 80
+    assert await asyncio.to_thread(store.count) == {'running': 80}
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from bili_jeans.core.loop import get_loop_factory, run_coroutine
+
+
+async def get_executor_thread_names():
+    return await asyncio.gather(*[
+        asyncio.to_thread(lambda: threading.current_thread().name) for _ in range(4)
+    ])
+
+
+def test_get_loop_factory():
+    mock_uvloop = MagicMock()
+    with patch('bili_jeans.core.loop.uvloop', new=mock_uvloop):
+        assert get_loop_factory('auto') is mock_uvloop.new_event_loop
+        assert get_loop_factory('uvloop') is mock_uvloop.new_event_loop
+        assert get_loop_factory('asyncio') is None
+
+    with patch('bili_jeans.core.loop.uvloop', new=None):
+        assert get_loop_factory('auto') is None
+        with pytest.raises(ValueError):
+            get_loop_factory('uvloop')
+
+    with pytest.raises(ValueError):
+        get_loop_factory('trio')
+
+
+def test_run_coroutine():
+    thread_names = run_coroutine(get_executor_thread_names(), loop='asyncio', executor_workers=1)
+
+    assert set(thread_names) == {'bili_jeans_0'}
+
+
+def test_run_coroutine_on_loop_factory():
+    mock_uvloop = MagicMock()
+    mock_uvloop.new_event_loop.side_effect = asyncio.new_event_loop
+    with patch('bili_jeans.core.loop.uvloop', new=mock_uvloop):
+        assert run_coroutine(asyncio.sleep(0, result=1)) == 1
+
+    mock_uvloop.new_event_loop.assert_called_once()
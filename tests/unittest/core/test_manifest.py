@@ -0,0 +1,33 @@
+from bili_jeans.core.manifest import Manifest, ManifestEntry
+
+
+def test_manifest(tmp_path):
+    manifest_p = tmp_path.joinpath('manifest.jsonl')
+    manifest = Manifest(manifest_p)
+    manifest.record(ManifestEntry(
+        bvid='BV1', cid=1, idx=1, title='P1', status='failed', error='ValueError', finished_at=1.0
+    ))
+    manifest.record(ManifestEntry(bvid='BV1', cid=2, idx=2, title='P2', status='done', finished_at=1.0))
+    # the later record of the same page replaces the former
+    manifest.record(ManifestEntry(bvid='BV1', cid=1, idx=1, title='P1', status='done', finished_at=2.0))
+
+    resumed = Manifest(manifest_p)
+    assert len(resumed) == 2
+    assert resumed.is_done('BV1', 1) is True
+    assert resumed.is_done('BV1', 3) is False
+    assert 'BV1/2' in resumed
+    assert resumed.list('failed') == []
+    assert list(tmp_path.iterdir()) == [manifest_p]
+
+
+def test_manifest_broken(tmp_path):
+    manifest_p = tmp_path.joinpath('manifest.jsonl')
+    manifest_p.write_text(
+        '{"bvid": "BV1", "cid": 1, "idx": 1, "title": "P1", "status": "done", "finished_at": 1.0}\n'
+        '{"bvid": "BV1", "cid": "x"}\n'
+        '{"bvid": "BV1", "cid": 2, "idx": 2, "ti'
+    )
+
+    manifest = Manifest(manifest_p)
+    assert len(manifest) == 1
+    assert manifest.is_done('BV1', 1) is True
@@ -4,7 +4,7 @@ from unittest.mock import patch
 
 import pytest
 
-from bili_jeans.core.pages import get_ugc_pages
+from bili_jeans.core.pages import get_ugc_pages, get_ugc_season_pages
 from bili_jeans.core.schemes import WebViewMetaData
 from tests.utils import get_mock_async_response, MOCK_SESS_DATA
 
@@ -94,3 +94,47 @@ async def test_get_ugc_pages_with_timeout_error(mock_get_req):
             view_meta=WebViewMetaData(bvid='BV1X54y1C74U'),
             sess_data=MOCK_SESS_DATA
         )
+
+
+@patch('aiohttp.ClientSession.get')
+async def test_get_ugc_season_pages(mock_get_req):
+    mock_get_req.return_value.__aenter__.return_value = get_mock_async_response(
+        HTTPStatus.OK.value,
+        json.dumps(
+            DATA_VIEW_WITH_SEASON,
+            ensure_ascii=False
+        ).encode('utf-8')
+    )
+    actual_pages = await get_ugc_season_pages(
+        view_meta=WebViewMetaData(bvid='BV1tN4y1F79k'),
+        sess_data=MOCK_SESS_DATA
+    )
+
+    # only the view of given video is requested
+    assert mock_get_req.call_count == 1
+    assert [(page.episode_idx, page.bvid, page.cid) for page in actual_pages] == [
+        (1, 'BV1tN4y1F79k', 808240617),
+        (2, 'BV1Ye4y1f7kA', 808242611)
+    ]
+    assert actual_pages[1].idx == 1
+    assert actual_pages[1].aid == 557178878
+    assert actual_pages[1].title == '戒网（《黑神话：悟空》游戏插曲）'
+    assert actual_pages[1].pubdate == 1660960800
+
+
+@patch('aiohttp.ClientSession.get')
+async def test_get_ugc_season_pages_without_season(mock_get_req):
+    mock_get_req.return_value.__aenter__.return_value = get_mock_async_response(
+        HTTPStatus.OK.value,
+        json.dumps(
+            DATA_VIEW_WITH_MULTI_PAGES,
+            ensure_ascii=False
+        ).encode('utf-8')
+    )
+    actual_pages = await get_ugc_season_pages(
+        view_meta=WebViewMetaData(bvid='BV1wE4m1R7cu')
+    )
+
+    assert mock_get_req.call_count == 1
+    assert len(actual_pages) == len(DATA_VIEW_WITH_MULTI_PAGES['data']['pages'])
+    assert all(page.episode_idx is None for page in actual_pages)
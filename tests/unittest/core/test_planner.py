@@ -0,0 +1,66 @@
+import json
+
+from bili_jeans.core.planner import estimate_bytes, plan_storage
+from bili_jeans.core.schemes import GetUGCPlayResponse, PageData
+from bili_jeans.core.selection import StreamPolicy
+
+
+with open('tests/data/ugc_play/ugc_play_BV13L4y1K7th.json', 'r') as fp:
+    DATA_PLAY_WITH_DOLBY = json.load(fp)
+DASH_WITH_DOLBY = GetUGCPlayResponse.model_validate(DATA_PLAY_WITH_DOLBY).data.dash
+PAGE = PageData(
+    idx=1,
+    bvid='BV13L4y1K7th',
+    cid=1,
+    title='dummy',
+    cover='',
+    duration=DASH_WITH_DOLBY.duration,
+    description='',
+    owner_name='',
+    pubdate=0
+)
+
+
+def test_plan_storage_without_budget():
+    plan = plan_storage([(PAGE, DASH_WITH_DOLBY)], StreamPolicy())
+
+    page_plan = plan.pages[0]
+    assert plan.fits
+    assert (page_plan.video.quality_id, page_plan.video.codec_id) == (126, 12)
+    assert page_plan.audio.quality_id == 30250
+    assert page_plan.video.estimated_bytes == estimate_bytes(
+        page_plan.video.bandwidth,
+        DASH_WITH_DOLBY.duration
+    )
+    assert page_plan.estimated_bytes == page_plan.video.estimated_bytes + page_plan.audio.estimated_bytes
+    assert plan.total_bytes == page_plan.estimated_bytes
+
+
+def test_plan_storage_downgrade_to_fit_budget():
+    full_plan = plan_storage([(PAGE, DASH_WITH_DOLBY), (PAGE, DASH_WITH_DOLBY)], StreamPolicy())
+    budget = full_plan.total_bytes // 3
+    plan = plan_storage([(PAGE, DASH_WITH_DOLBY), (PAGE, DASH_WITH_DOLBY)], StreamPolicy(), budget)
+
+    assert plan.fits
+    assert plan.total_bytes <= budget
+    assert plan.total_bytes == sum(page_plan.estimated_bytes for page_plan in plan.pages)
+    for page_plan in plan.pages:
+        assert page_plan.video.bandwidth < full_plan.pages[0].video.bandwidth
+
+
+def test_plan_storage_with_unreachable_budget():
+    plan = plan_storage([(PAGE, DASH_WITH_DOLBY)], StreamPolicy(), budget=1)
+
+    # the smallest streams are planned
+    assert not plan.fits
+    assert plan.pages[0].video.bandwidth == min(video.bandwidth for video in DASH_WITH_DOLBY.video)
+
+
+def test_plan_storage_export():
+    plan = plan_storage([(PAGE, DASH_WITH_DOLBY), (PAGE, None)], StreamPolicy(), budget=1 << 30)
+    exported = json.loads(plan.model_dump_json())
+
+    assert exported['budget'] == 1 << 30
+    assert len(exported['pages']) == 2
+    assert exported['pages'][1]['video'] is None
+    assert exported['pages'][1]['estimated_bytes'] == 0
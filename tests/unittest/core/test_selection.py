@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from bili_jeans.core.schemes import GetUGCPlayResponse
+from bili_jeans.core.selection import select_dash_streams, StreamPolicy
+
+
+with open('tests/data/ugc_play/ugc_play_BV13L4y1K7th.json', 'r') as fp:
+    DATA_PLAY_WITH_DOLBY = json.load(fp)
+DASH_WITH_DOLBY = GetUGCPlayResponse.model_validate(DATA_PLAY_WITH_DOLBY).data.dash
+
+
+def test_select_dash_streams_by_default():
+    video, audio = select_dash_streams(DASH_WITH_DOLBY, StreamPolicy())
+
+    assert (video.id_field, video.codecid) == (126, 12)
+    assert audio.id_field == 30250
+
+
+def test_select_dash_streams_with_lowest_quality():
+    video, audio = select_dash_streams(DASH_WITH_DOLBY, StreamPolicy(prefer_higher=False))
+
+    # codec preference is still the efficient one
+    assert (video.id_field, video.codecid) == (16, 13)
+    assert audio.id_field == 30216
+
+
+def test_select_dash_streams_with_limited_av1():
+    """
+    best AV1 at or below 1080P60 unless bandwidth > 1.2 Mbps
+    """
+    policy = StreamPolicy(max_qn=116, codecs=[13, 12, 7], max_video_bandwidth=1200000)
+    video, _ = select_dash_streams(DASH_WITH_DOLBY, policy)
+
+    # AV1 of 1080P60 exceeds, HEVC of 1080P60 is prior to any AV1 of lower quality
+    assert (video.id_field, video.codecid) == (116, 12)
+
+
+def test_select_dash_streams_with_codec_as_first_criterion():
+    policy = StreamPolicy(
+        max_qn=116,
+        codecs=[13],
+        max_video_bandwidth=1200000,
+        priority=['codec', 'qn', 'frame_rate', 'resolution', 'bandwidth']
+    )
+    video, _ = select_dash_streams(DASH_WITH_DOLBY, policy)
+
+    assert (video.id_field, video.codecid) == (80, 13)
+
+
+def test_select_dash_streams_with_total_bandwidth():
+    policy = StreamPolicy(codecs=[12], max_bandwidth=1000000)
+    video, audio = select_dash_streams(DASH_WITH_DOLBY, policy)
+
+    assert (video.id_field, video.codecid) == (116, 12)
+    assert audio.id_field == 30232
+    assert video.bandwidth + audio.bandwidth <= 1000000
+
+
+def test_select_dash_streams_with_unsatisfied_policy():
+    video, audio = select_dash_streams(DASH_WITH_DOLBY, StreamPolicy(max_bandwidth=1))
+
+    assert (video.id_field, video.codecid) == (16, 12)
+    assert audio.id_field == 30216
+
+
+def test_stream_policy_load_from_json():
+    policy = StreamPolicy.load('{"max_qn": 116, "codecs": [13]}')
+
+    assert policy.max_qn == 116
+    assert policy.codecs == [13]
+
+
+def test_stream_policy_load_from_file(tmp_path):
+    policy_p = tmp_path / 'policy.json'
+    policy_p.write_text('{"max_bandwidth": 2000000}')
+
+    assert StreamPolicy.load(str(policy_p)).max_bandwidth == 2000000
+
+
+def test_stream_policy_load_with_invalid_criterion():
+    with pytest.raises(ValueError):
+        StreamPolicy.load('{"priority": ["size"]}')
@@ -0,0 +1,54 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+from bili_jeans.core.space import iter_space_videos, SpaceCheckpoint
+from tests.utils import get_mock_nav_response, get_mock_space_videos_response
+
+
+@patch('bili_jeans.core.proxy.get_space_videos_response', new_callable=AsyncMock)
+@patch('bili_jeans.core.proxy.get_nav_response', new_callable=AsyncMock)
+async def test_iter_space_videos(mock_get_nav_resp_req, mock_get_space_videos_resp_req):
+    mock_get_nav_resp_req.return_value = get_mock_nav_response()
+    mock_get_space_videos_resp_req.side_effect = [
+        get_mock_space_videos_response(['BV1', 'BV2'], 1, 2, 3),
+        get_mock_space_videos_response(['BV3'], 2, 2, 3)
+    ]
+
+    bvids = []
+    async for video in iter_space_videos(1, page_size=2):
+        bvids.append(video.bvid)
+        if video.bvid == 'BV1':
+            # the next page is prefetched before the current one is consumed
+            await asyncio.sleep(0)
+            assert mock_get_space_videos_resp_req.call_count == 2
+
+    assert bvids == ['BV1', 'BV2', 'BV3']
+    assert [call.args[2] for call in mock_get_space_videos_resp_req.call_args_list] == [1, 2]
+    # signed by the mixin key from nav
+    assert mock_get_space_videos_resp_req.call_args.args[1] == 'ea1db124af3c7062474693fa704f4ff8'
+
+
+@patch('bili_jeans.core.proxy.get_space_videos_response', new_callable=AsyncMock)
+@patch('bili_jeans.core.proxy.get_nav_response', new_callable=AsyncMock)
+async def test_iter_space_videos_with_risk_control(mock_get_nav_resp_req, mock_get_space_videos_resp_req):
+    mock_get_nav_resp_req.return_value = get_mock_nav_response()
+    mock_get_space_videos_resp_req.return_value = {'code': -352, 'message': '风控校验失败', 'ttl': 1}
+
+    with pytest.raises(ValueError):
+        async for _ in iter_space_videos(1):
+            pass
+
+
+def test_space_checkpoint(tmp_path):
+    checkpoint_p = tmp_path.joinpath('checkpoint.json')
+    checkpoint = SpaceCheckpoint(checkpoint_p)
+    checkpoint.mark_done('BV1')
+    checkpoint.mark_done('BV2')
+
+    resumed = SpaceCheckpoint(checkpoint_p)
+    assert 'BV1' in resumed
+    assert 'BV3' not in resumed
+    assert len(resumed) == 2
+    assert list(tmp_path.iterdir()) == [checkpoint_p]
@@ -0,0 +1,230 @@
+import asyncio
+from contextlib import asynccontextmanager
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from bili_jeans.core.work_queue import open_work_queue, RedisWorkQueue, SQLiteWorkQueue, WorkItem
+from bili_jeans.core.schemes import PageData
+from tests.redis_stand_in import RedisStandIn
+
+
+def get_mock_item(cid: int) -> WorkItem:
+    return WorkItem(
+        key=f'BV1/{cid}',
+        page=PageData(
+            idx=cid,
+            bvid='BV1',
+            cid=cid,
+            title=f'P{cid}',
+            cover='',
+            duration=1,
+            description='',
+            owner_name='',
+            pubdate=0
+        ),
+        qn=80,
+        options={'enable_danmaku': True}
+    )
+
+
+@asynccontextmanager
+async def open_mock_queue(backend, tmp_path):
+    if backend == 'sqlite':
+        work_queue = open_work_queue(str(tmp_path.joinpath('queue.sqlite3')))
+        try:
+            yield work_queue
+        finally:
+            await work_queue.close()
+        return
+
+    server = RedisStandIn()
+    await server.start()
+    work_queue = open_work_queue(f'{server.url}?prefix=test')
+    try:
+        yield work_queue
+    finally:
+        await work_queue.close()
+        await server.stop()
+
+
+def test_open_work_queue(tmp_path):
+    assert isinstance(open_work_queue(f'sqlite://{tmp_path}/queue.sqlite3'), SQLiteWorkQueue)
+    assert isinstance(open_work_queue('redis://127.0.0.1:6379/1'), RedisWorkQueue)
+    with pytest.raises(ValueError):
+        open_work_queue('amqp://127.0.0.1')
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'redis'])
+async def test_work_queue(backend, tmp_path):
+    async with open_mock_queue(backend, tmp_path) as work_queue:
+        assert await work_queue.put(get_mock_item(1)) is True
+        assert await work_queue.put(get_mock_item(2)) is True
+        assert await work_queue.put(get_mock_item(1)) is False
+
+        item = await work_queue.lease('w1', 60)
+        assert item.key == 'BV1/1'
+        assert item.attempts == 1
+        assert item.stream_options == (80, False, None, False, None, False, None)
+        assert item.options == {'enable_danmaku': True}
+        assert await work_queue.heartbeat('BV1/1', 'w1', 60) is True
+        assert await work_queue.heartbeat('BV1/1', 'w2', 60) is False
+        assert await work_queue.count() == {'queued': 1, 'leased': 1}
+
+        assert (await work_queue.lease('w2', 60)).key == 'BV1/2'
+        assert await work_queue.lease('w2', 60) is None
+        assert await work_queue.complete('BV1/1', 'w1') is True
+        # completion is idempotent
+        assert await work_queue.complete('BV1/1', 'w2') is False
+        assert await work_queue.count() == {'leased': 1, 'done': 1}
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'redis'])
+async def test_work_queue_with_expired_lease(backend, tmp_path):
+    async with open_mock_queue(backend, tmp_path) as work_queue:
+        await work_queue.put(get_mock_item(1))
+        assert (await work_queue.lease('w1', -1)).attempts == 1
+
+        # taken over by another worker
+        item = await work_queue.lease('w2', 60)
+        assert item.key == 'BV1/1'
+        assert item.attempts == 2
+        assert await work_queue.heartbeat('BV1/1', 'w1', 60) is False
+        assert await work_queue.fail('BV1/1', 'w1', 'ValueError') is False
+        assert await work_queue.complete('BV1/1', 'w1') is True
+        assert await work_queue.complete('BV1/1', 'w2') is False
+        assert await work_queue.lease('w1', 60) is None
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'redis'])
+async def test_work_queue_with_failure(backend, tmp_path):
+    async with open_mock_queue(backend, tmp_path) as work_queue:
+        await work_queue.put(get_mock_item(1))
+
+        await work_queue.lease('w1', 60)
+        assert await work_queue.fail('BV1/1', 'w1', 'ValueError', max_attempts=2) is False
+        await work_queue.lease('w1', 60)
+        assert await work_queue.fail('BV1/1', 'w1', 'ValueError', max_attempts=2) is True
+        assert await work_queue.lease('w1', 60) is None
+        assert await work_queue.count() == {'failed': 1}
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'redis'])
+async def test_work_queue_with_expired_last_lease(backend, tmp_path):
+    async with open_mock_queue(backend, tmp_path) as work_queue:
+        await work_queue.put(get_mock_item(1))
+        assert (await work_queue.lease('w1', -1, max_attempts=2)).attempts == 1
+        assert (await work_queue.lease('w2', -1, max_attempts=2)).attempts == 2
+
+        # the worker crashed at the last attempt
+        assert await work_queue.lease('w3', 60, max_attempts=2) is None
+        assert await work_queue.count() == {'failed': 1}
+        assert await work_queue.fail('BV1/1', 'w2', 'ValueError', max_attempts=2) is False
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'redis'])
+async def test_work_queue_completed_by_another_worker(backend, tmp_path):
+    async with open_mock_queue(backend, tmp_path) as work_queue:
+        await work_queue.put(get_mock_item(1))
+        await work_queue.lease('w1', -1)
+        await work_queue.lease('w2', -1)
+        # completed by the worker whose lease expired, then the lease of holder expires too
+        assert await work_queue.complete('BV1/1', 'w1') is True
+        assert await work_queue.lease('w3', 60) is None
+        assert await work_queue.count() == {'done': 1}
+
+
+async def test_redis_work_queue_heartbeat_races_with_requeue():
+    server = RedisStandIn()
+    await server.start()
+    work_queue = open_work_queue(f'{server.url}?prefix=test')
+    try:
+        await work_queue.put(get_mock_item(1))
+        await work_queue.lease('w1', -1)
+        execute = work_queue._client._execute
+        requeued = False
+
+        async def requeue_before_exec(*args):
+            nonlocal requeued
+            if args[0] == 'EXEC' and not requeued:
+                requeued = True
+                # the expired lease is re-queued by another worker, on another connection
+                other = open_work_queue(f'{server.url}?prefix=test')
+                try:
+                    assert (await other.lease('w2', 60)).attempts == 2
+                finally:
+                    await other.close()
+            return await execute(*args)
+
+        with patch.object(work_queue._client, '_execute', requeue_before_exec):
+            assert await work_queue.heartbeat('BV1/1', 'w1', 60) is False
+        assert await work_queue.heartbeat('BV1/1', 'w2', 60) is True
+        assert await work_queue.count() == {'leased': 1}
+    finally:
+        await work_queue.close()
+        await server.stop()
+
+
+async def test_redis_work_queue_with_concurrent_lease():
+    server = RedisStandIn()
+    await server.start()
+    work_queues = [open_work_queue(f'{server.url}?prefix=test') for _ in range(3)]
+    try:
+        for cid in range(1, 7):
+            await work_queues[0].put(get_mock_item(cid))
+        items = await asyncio.gather(*[
+            work_queue.lease(f'w{idx}', 60)
+            for _ in range(3) for idx, work_queue in enumerate(work_queues)
+        ])
+        # each item is leased by only one worker
+        assert sorted(item.key for item in items if item is not None) == [f'BV1/{cid}' for cid in range(1, 7)]
+        assert await work_queues[0].count() == {'leased': 6}
+    finally:
+        for work_queue in work_queues:
+            await work_queue.close()
+        await server.stop()
+
+
+async def test_redis_work_queue_crashed_in_lease():
+    server = RedisStandIn()
+    await server.start()
+    work_queue = open_work_queue(f'{server.url}?prefix=test')
+    try:
+        await work_queue.put(get_mock_item(1))
+        execute = work_queue._client._execute
+
+        async def crash_on_exec(*args):
+            if args[0] == 'EXEC':
+                raise ConnectionResetError()
+            return await execute(*args)
+
+        with patch.object(work_queue._client, '_execute', crash_on_exec):
+            with pytest.raises(ConnectionResetError):
+                await work_queue.lease('w1', 60)
+        # none of the steps is applied
+        assert await work_queue.count() == {'queued': 1}
+        assert (await work_queue.lease('w2', 60)).attempts == 1
+    finally:
+        await work_queue.close()
+        await server.stop()
+
+
+async def test_sqlite_work_queue_waits_for_lock_off_loop(tmp_path):
+    db_p = tmp_path.joinpath('queue.sqlite3')
+    work_queue = open_work_queue(str(db_p))
+    try:
+        await work_queue.put(get_mock_item(1))
+        # e.g. another node is writing
+        other = sqlite3.connect(str(db_p), isolation_level=None)
+        other.execute('BEGIN IMMEDIATE')
+        lease_task = asyncio.create_task(work_queue.lease('w1', 60))
+        # the loop keeps running while the lease waits for the lock
+        await asyncio.sleep(0.05)
+        assert not lease_task.done()
+
+        other.execute('COMMIT')
+        other.close()
+        assert (await lease_task).key == 'BV1/1'
+    finally:
+        await work_queue.close()
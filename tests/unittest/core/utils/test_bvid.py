@@ -0,0 +1,44 @@
+import pytest
+
+from bili_jeans.core.schemes import WebViewMetaData
+from bili_jeans.core.utils.bvid import aid_to_bvid, bvid_to_aid, MAX_AID, normalize_view_meta
+
+
+ID_PAIRS = [
+    ('BV1X54y1C74U', 842089940),
+    ('BV1tN4y1F79k', 899743670),
+    ('BV1Ye4y1f7kA', 557178878)
+]
+
+
+@pytest.mark.parametrize('bvid, aid', ID_PAIRS)
+def test_bvid_to_aid(bvid, aid):
+    assert bvid_to_aid(bvid) == aid
+
+
+@pytest.mark.parametrize('bvid, aid', ID_PAIRS)
+def test_aid_to_bvid(bvid, aid):
+    assert aid_to_bvid(aid) == bvid
+
+
+@pytest.mark.parametrize('aid', [1, 2271112, MAX_AID - 1])
+def test_round_trip(aid):
+    assert bvid_to_aid(aid_to_bvid(aid)) == aid
+
+
+@pytest.mark.parametrize('bvid', ['BV1X54y1C74', 'AV1X54y1C74U', 'BV1X54y1C740'])
+def test_bvid_to_aid_with_invalid_bvid(bvid):
+    with pytest.raises(ValueError):
+        bvid_to_aid(bvid)
+
+
+@pytest.mark.parametrize('aid', [0, -1, MAX_AID])
+def test_aid_to_bvid_with_invalid_aid(aid):
+    with pytest.raises(ValueError):
+        aid_to_bvid(aid)
+
+
+def test_normalize_view_meta():
+    assert normalize_view_meta(WebViewMetaData(bvid='BV1X54y1C74U')).aid == 842089940
+    assert normalize_view_meta(WebViewMetaData(aid=842089940)).bvid == 'BV1X54y1C74U'
+    assert normalize_view_meta(WebViewMetaData()) == WebViewMetaData()
@@ -0,0 +1,81 @@
+import gzip
+import zlib
+
+import pytest
+
+from bili_jeans.core.utils import ContentDecoder, read_seekable_gzip, SeekableGzipEncoder
+
+
+SAMPLE_CONTENT = (
+    '<?xml version="1.0" encoding="UTF-8"?><i>'
+    + ''.join(f'<d p="{idx}.0,1,25,16777215">弹幕{idx}</d>' for idx in range(1000))
+    + '</i>'
+).encode('utf-8')
+
+
+def _compress_raw_deflate(content: bytes) -> bytes:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(content) + compressor.flush()
+
+
+def test_content_decoder_with_raw_deflate():
+    compressed = _compress_raw_deflate(SAMPLE_CONTENT)
+    decoder = ContentDecoder('deflate')
+
+    actual = b''.join(
+        decoder.decompress(compressed[idx:idx + 100])
+        for idx in range(0, len(compressed), 100)
+    ) + decoder.flush()
+    assert actual == SAMPLE_CONTENT
+
+
+def test_content_decoder_with_zlib_wrapped_deflate():
+    decoder = ContentDecoder('deflate')
+    actual = decoder.decompress(zlib.compress(SAMPLE_CONTENT)) + decoder.flush()
+    assert actual == SAMPLE_CONTENT
+
+
+def test_content_decoder_with_gzip():
+    decoder = ContentDecoder('gzip')
+    actual = decoder.decompress(gzip.compress(SAMPLE_CONTENT)) + decoder.flush()
+    assert actual == SAMPLE_CONTENT
+
+
+def test_content_decoder_with_identity():
+    decoder = ContentDecoder(None)
+    assert decoder.decompress(SAMPLE_CONTENT) + decoder.flush() == SAMPLE_CONTENT
+
+
+def test_content_decoder_with_truncated_stream():
+    compressed = _compress_raw_deflate(SAMPLE_CONTENT)
+    decoder = ContentDecoder('deflate')
+    decoder.decompress(compressed[:len(compressed) // 2])
+    with pytest.raises(ValueError, match='Truncated deflate stream'):
+        decoder.flush()
+
+
+def test_content_decoder_with_unsupported_encoding():
+    with pytest.raises(ValueError, match='Unsupported content encoding: br'):
+        ContentDecoder('br')
+
+
+def test_seekable_gzip_encoder(tmp_path):
+    encoder = SeekableGzipEncoder(frame_size=4096)
+    compressed = b''.join(
+        encoder.feed(SAMPLE_CONTENT[idx:idx + 1000])
+        for idx in range(0, len(SAMPLE_CONTENT), 1000)
+    ) + encoder.flush()
+    index = encoder.index
+
+    # still a regular gzip file
+    assert gzip.decompress(compressed) == SAMPLE_CONTENT
+    assert index['uncompressed_size'] == len(SAMPLE_CONTENT)
+    assert index['compressed_size'] == len(compressed)
+    assert len(index['frames']) == (len(SAMPLE_CONTENT) + 4095) // 4096
+    assert len(compressed) < len(SAMPLE_CONTENT)
+
+    file_p = tmp_path / 'sample.xml.gz'
+    file_p.write_bytes(compressed)
+    assert read_seekable_gzip(str(file_p), index, 5000, 3000) == SAMPLE_CONTENT[5000:8000]
+    assert read_seekable_gzip(str(file_p), index, 4096) == SAMPLE_CONTENT[4096:]
+    assert read_seekable_gzip(str(file_p), index, len(SAMPLE_CONTENT)) == b''
@@ -0,0 +1,53 @@
+import pytest
+
+from bili_jeans.core.utils import convert_to_xml, decode_danmaku_segment
+from bili_jeans.core.utils.protobuf import decode_varint
+from tests.utils import encode_danmaku_segment
+
+
+SAMPLE_SEGMENT = encode_danmaku_segment([
+    [(1, 1569), (2, 12500), (3, 1), (4, 25), (5, 16777215), (6, 'a1b2c3d4'),
+     (7, '前方高能 & <警告>'), (8, 1599717912), (9, 3), (11, 0), (12, '1569')],
+    [(1, 1234), (2, 3000), (3, 5), (4, 18), (5, 65280), (6, 'e5f6'),
+     (7, '第一'), (8, 1599717900), (9, 1), (11, 1), (12, '1234'), (99, 7)],
+])
+
+
+def test_decode_varint():
+    assert decode_varint(b'\xac\x02', 0) == (300, 2)
+
+
+def test_decode_truncated_varint():
+    with pytest.raises(ValueError, match='Truncated varint'):
+        decode_varint(b'\xac', 0)
+
+
+def test_decode_danmaku_segment():
+    actual = decode_danmaku_segment(SAMPLE_SEGMENT)
+
+    assert len(actual) == 2
+    sample_elem, *_ = actual
+    assert sample_elem.id_field == 1569
+    assert sample_elem.progress == 12500
+    assert sample_elem.mid_hash == 'a1b2c3d4'
+    assert sample_elem.content == '前方高能 & <警告>'
+    assert sample_elem.ctime == 1599717912
+    assert sample_elem.action == ''
+
+
+def test_decode_truncated_danmaku_segment():
+    with pytest.raises(ValueError):
+        decode_danmaku_segment(SAMPLE_SEGMENT[:-3])
+
+
+def test_convert_to_xml():
+    actual = convert_to_xml(239927346, decode_danmaku_segment(SAMPLE_SEGMENT))
+
+    assert actual.startswith(b'<?xml version="1.0" encoding="UTF-8"?><i>')
+    assert b'<chatid>239927346</chatid><mission>0</mission><maxlimit>2</maxlimit>' in actual
+    # sorted by appearance time
+    assert actual.endswith(
+        '<d p="3.00000,5,18,65280,1599717900,1,e5f6,1234,1">第一</d>'
+        '<d p="12.50000,1,25,16777215,1599717912,0,a1b2c3d4,1569,3">前方高能 &amp; &lt;警告&gt;</d>'
+        '</i>'.encode('utf-8')
+    )
@@ -0,0 +1,24 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from bili_jeans.core.schemes import GetUGCPlayResponse, GetUGCPlayerResponse, GetUGCViewResponse
+from bili_jeans.core.utils.json_codec import loads, validate_json
+
+
+@pytest.mark.parametrize(
+    'dirname, model_class',
+    [
+        ('ugc_play', GetUGCPlayResponse),
+        ('ugc_player', GetUGCPlayerResponse),
+        ('ugc_view', GetUGCViewResponse)
+    ]
+)
+def test_validate_json(dirname, model_class):
+    for file_p in Path('tests/data', dirname).glob('*.json'):
+        content = file_p.read_bytes()
+        expected = model_class.model_validate(json.loads(content.decode('utf-8')))
+
+        assert validate_json(model_class, content) == expected
+        assert validate_json(model_class, loads(content)) == expected
@@ -0,0 +1,34 @@
+import pytest
+
+from bili_jeans.core.constants import BitRateId, CodecId, QualityNumber
+from bili_jeans.core.utils import filter_avail_quality_id
+
+
+def test_filter_avail_quality_id_without_declared():
+    assert filter_avail_quality_id(QualityNumber, {16, 32, 80}) == 16
+
+
+def test_filter_avail_quality_id_without_declared_reversely():
+    assert filter_avail_quality_id(QualityNumber, {16, 32, 80}, reverse=True) == 80
+
+
+def test_filter_avail_quality_id_with_existed():
+    assert filter_avail_quality_id(CodecId, {7, 12, 13}, 12) == 12
+
+
+def test_filter_avail_quality_id_with_nearest_lesser():
+    assert filter_avail_quality_id(QualityNumber, {16, 32, 80}, 64) == 32
+
+
+def test_filter_avail_quality_id_with_nearest_greater():
+    assert filter_avail_quality_id(QualityNumber, {64, 80}, 16) == 64
+
+
+def test_filter_avail_quality_id_with_invalid_declared():
+    # Dolby is greater than 192Kbps on order, though its ID is less
+    assert filter_avail_quality_id(BitRateId, {30280, 30250}, 1, reverse=True) == 30250
+
+
+def test_filter_avail_quality_id_without_alternatives():
+    with pytest.raises(ValueError, match='No alternative quality IDs'):
+        filter_avail_quality_id(QualityNumber, set())
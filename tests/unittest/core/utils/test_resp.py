@@ -0,0 +1,42 @@
+import asyncio
+
+from bili_jeans.core.utils.resp import read_reply, RespClient
+
+
+async def test_resp_client_cancelled_before_reply():
+    handlers = []
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        handlers.append(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    args = await read_reply(reader)
+                except asyncio.IncompleteReadError:
+                    return
+                assert isinstance(args, list)
+                if args[0] == b'SLOW':
+                    await asyncio.sleep(0.1)
+                writer.write(b'$%d\r\n%s\r\n' % (len(args[-1]), args[-1]))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    client = RespClient(f'redis://{host}:{port}/0')
+    try:
+        task = asyncio.create_task(client.execute('SLOW', 'late'))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        # the reply of cancelled command isn't taken by the next one
+        assert await client.execute('ECHO', 'next') == b'next'
+    finally:
+        await client.close()
+        server.close()
+        for handler in handlers:
+            handler.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        await server.wait_closed()
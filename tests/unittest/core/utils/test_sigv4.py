@@ -0,0 +1,38 @@
+import datetime
+
+from bili_jeans.core.utils.sigv4 import sign_request
+
+
+SAMPLE_URL = 'http://127.0.0.1:9000/bucket/a%20b/c.m4s?partNumber=2&uploadId=x%2By'
+SAMPLE_NOW = datetime.datetime(2026, 10, 19, 12, 0, 0, tzinfo=datetime.timezone.utc)
+
+
+def test_sign_request():
+    # the same as signed by botocore with unsigned payload
+    headers = sign_request(
+        'PUT',
+        SAMPLE_URL,
+        'AK',
+        'SK',
+        'us-east-1',
+        headers={'Content-Type': 'video/mp4'},
+        now=SAMPLE_NOW
+    )
+
+    assert headers['Content-Type'] == 'video/mp4'
+    assert headers['x-amz-content-sha256'] == 'UNSIGNED-PAYLOAD'
+    assert headers['x-amz-date'] == '20261019T120000Z'
+    assert headers['Authorization'] == (
+        'AWS4-HMAC-SHA256 Credential=AK/20261019/us-east-1/s3/aws4_request, '
+        'SignedHeaders=content-type;host;x-amz-content-sha256;x-amz-date, '
+        'Signature=3601d226d0589377f42aa1e95b1dd0d56273d257143421fbb906667655208039'
+    )
+
+
+def test_sign_request_with_query_order():
+    reordered_url = SAMPLE_URL.replace('partNumber=2&uploadId=x%2By', 'uploadId=x%2By&partNumber=2')
+
+    assert (
+        sign_request('PUT', SAMPLE_URL, 'AK', 'SK', 'us-east-1', now=SAMPLE_NOW) ==
+        sign_request('PUT', reordered_url, 'AK', 'SK', 'us-east-1', now=SAMPLE_NOW)
+    )
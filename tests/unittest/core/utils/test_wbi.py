@@ -0,0 +1,29 @@
+from bili_jeans.core.utils.wbi import get_mixin_key, sign_params
+
+
+IMG_KEY = '7cd084941338484aae1ad9425b84077c'
+SUB_KEY = '4932caff0ff746eab6f01bf08b70ac45'
+
+
+def test_get_mixin_key():
+    assert get_mixin_key(IMG_KEY, SUB_KEY) == 'ea1db124af3c7062474693fa704f4ff8'
+
+
+def test_sign_params():
+    signed = sign_params(
+        {'foo': '114', 'bar': '514', 'zab': 1919810},
+        get_mixin_key(IMG_KEY, SUB_KEY),
+        wts=1702204169
+    )
+
+    assert list(signed) == ['bar', 'foo', 'wts', 'zab', 'w_rid']
+    assert signed['w_rid'] == '8f6f2b5b3d485fe1886cec6a0be8c5d4'
+
+
+def test_sign_params_filter_chars():
+    mixin_key = get_mixin_key(IMG_KEY, SUB_KEY)
+
+    assert (
+        sign_params({'keyword': "(it's)*"}, mixin_key, wts=1) ==
+        sign_params({'keyword': 'its'}, mixin_key, wts=1)
+    )
@@ -0,0 +1,69 @@
+import struct
+
+import aiohttp
+import pytest
+
+from tests.mock_server import get_media_content, MEDIA_HEADER_SIZE, MockBilibiliServer
+
+
+def test_get_media_content():
+    content = get_media_content(MEDIA_HEADER_SIZE + 1000, 0, MEDIA_HEADER_SIZE + 1000)
+
+    assert content[4:8] == b'ftyp'
+    assert struct.unpack('>I4sQ', content[24:MEDIA_HEADER_SIZE]) == (1, b'mdat', 1016)
+    assert content[MEDIA_HEADER_SIZE:] == bytes(i % 256 for i in range(1000))
+    assert get_media_content(MEDIA_HEADER_SIZE + 1000, 30, 300) == content[30:300]
+
+
+async def test_mock_server_api():
+    async with MockBilibiliServer(media_size=4096) as server:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'{server.url}/x/web-interface/view', params={'bvid': 'BV1X54y1C74U'}) as resp:
+                view = await resp.json()
+            async with session.get(
+                f'{server.url}/x/player/wbi/playurl',
+                params={'bvid': 'BV1X54y1C74U', 'cid': 239927346}
+            ) as resp:
+                play = await resp.json()
+            async with session.get(f'{server.url}/x/web-interface/view', params={'bvid': 'BV1None'}) as resp:
+                not_found = await resp.json()
+
+    assert view['data']['pic'] == f'{server.url}/cover/BV1X54y1C74U.jpg'
+    video = play['data']['dash']['video'][0]
+    assert video['base_url'] == f'{server.url}/media/BV1X54y1C74U/239927346/112-7-4096.m4s'
+    assert video['backup_url'] == [video['base_url']]
+    assert not_found['code'] == -404
+    assert server.requests == {'ugc_view': 2, 'ugc_play': 1}
+
+
+async def test_mock_server_media_range():
+    async with MockBilibiliServer() as server:
+        url = f'{server.url}/media/BV1/1/112-7-100000.m4s'
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as resp:
+                assert resp.status == 200
+                content = await resp.read()
+            async with session.get(url, headers={'Range': 'bytes=100-199'}) as resp:
+                assert resp.status == 206
+                assert resp.headers['Content-Range'] == 'bytes 100-199/100000'
+                assert await resp.read() == content[100:200]
+            async with session.get(url, headers={'Range': 'bytes=-10'}) as resp:
+                assert await resp.read() == content[-10:]
+            async with session.get(url, headers={'Range': 'bytes=100000-'}) as resp:
+                assert resp.status == 416
+
+    assert len(content) == 100000
+    assert server.bytes_sent == 100000 + 100 + 10
+
+
+async def test_mock_server_failure():
+    async with MockBilibiliServer(failure_rate=1.0) as server:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'{server.url}/media/BV1/1/112-7-100000.m4s') as resp:
+                assert resp.status == 503
+
+    async with MockBilibiliServer(failure_rate=1.0, failure_mode='truncate') as server:
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(aiohttp.ClientPayloadError):
+                async with session.get(f'{server.url}/media/BV1/1/112-7-1000000.m4s') as resp:
+                    await resp.read()
@@ -1,10 +1,29 @@
 """
 Utilities for unit test and functional test
 """
-from typing import cast, List, Optional
+from typing import cast, Dict, List, Optional, Sequence, Tuple, Union
 
+from aiohttp import ClientResponseError, RequestInfo
 from aiohttp.client import _RequestContextManager
-from multidict import CIMultiDictProxy
+from multidict import CIMultiDict, CIMultiDictProxy
+
+
+class MockStreamReader(object):
+
+    def __init__(self, content: bytes) -> None:
+        self._content = content
+        self._offset = 0
+
+    async def read(self, n: int = -1) -> bytes:
+        end = len(self._content) if n < 0 else self._offset + n
+        result = self._content[self._offset:end]
+        self._offset += len(result)
+        return result
+
+    def iter_chunked(self, n: int) -> 'MockAsyncIterator':
+        data = self._content[self._offset:]
+        self._offset = len(self._content)
+        return MockAsyncIterator.from_data([data[i:i + n] for i in range(0, len(data), n)])
 
 
 class MockAsyncResponse(object):
@@ -18,10 +37,27 @@ class MockAsyncResponse(object):
         self._status_code = status_code
         self._content = content
         self._headers = headers
+        self.content = MockStreamReader(content)
 
     async def read(self) -> bytes:
         return self._content
 
+    @property
+    def content_length(self) -> int:
+        return len(self._content)
+
+    @property
+    def status(self) -> int:
+        return self._status_code
+
+    def raise_for_status(self) -> None:
+        if self._status_code >= 400:
+            raise ClientResponseError(
+                cast(RequestInfo, None),
+                (),
+                status=self._status_code
+            )
+
     async def __aexit__(self, exc_type, exc, tb) -> None:
         pass
 
@@ -29,8 +65,8 @@ class MockAsyncResponse(object):
         return self
 
     @property
-    def headers(self) -> Optional[CIMultiDictProxy]:
-        return self._headers
+    def headers(self) -> CIMultiDictProxy:
+        return self._headers if self._headers is not None else CIMultiDictProxy(CIMultiDict())
 
 
 class MockAsyncIterator:
@@ -42,6 +78,12 @@ class MockAsyncIterator:
         self._index: int = 0
         self._chunk_size = chunk_size
 
+    @classmethod
+    def from_data(cls, data: Sequence[bytes]) -> 'MockAsyncIterator':
+        iterator = cls(0)
+        iterator._data = list(data)
+        return iterator
+
     def __aiter__(self):
         return self
 
@@ -65,4 +107,81 @@ def get_mock_async_response(
     return mock_resp
 
 
+def mock_stream_request(*args, **kwargs) -> _RequestContextManager:
+    """
+    side effect of mocked 'ClientSession.get', which responds a new stream on each request
+    """
+    return get_mock_async_response(200, b'dummy content')
+
+
+def _encode_varint(value: int) -> bytes:
+    result = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+
+def _encode_field(field_number: int, value: Union[int, str, bytes]) -> bytes:
+    if isinstance(value, int):
+        return _encode_varint(field_number << 3) + _encode_varint(value)
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return _encode_varint(field_number << 3 | 2) + _encode_varint(len(value)) + value
+
+
+def encode_danmaku_segment(elems: List[List[Tuple[int, Union[int, str]]]]) -> bytes:
+    """
+    encode 'DmSegMobileReply' in protobuf wire format,
+    each of elems is the list of (field number, value) of 'DanmakuElem'
+    """
+    return b''.join(
+        _encode_field(1, b''.join(_encode_field(number, value) for number, value in elem))
+        for elem in elems
+    )
+
+
 MOCK_SESS_DATA = 'SESSDATA'
+
+
+def get_mock_nav_response() -> Dict:
+    return {
+        'code': -101,
+        'message': '账号未登录',
+        'ttl': 1,
+        'data': {
+            'isLogin': False,
+            'wbi_img': {
+                'img_url': 'https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png',
+                'sub_url': 'https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png'
+            }
+        }
+    }
+
+
+def get_mock_space_videos_response(bvids: List[str], pn: int, ps: int, count: int) -> Dict:
+    return {
+        'code': 0,
+        'message': '0',
+        'ttl': 1,
+        'data': {
+            'list': {
+                'vlist': [
+                    {
+                        'aid': idx,
+                        'bvid': bvid,
+                        'created': 1660960800,
+                        'length': '01:00',
+                        'pic': 'https://i0.hdslb.com/bfs/archive/dummy.jpg',
+                        'title': f'video {bvid}'
+                    }
+                    for idx, bvid in enumerate(bvids, start=1)
+                ]
+            },
+            'page': {'count': count, 'pn': pn, 'ps': ps}
+        }
+    }